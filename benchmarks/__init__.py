@@ -0,0 +1,6 @@
+"""Benchmarks for the cities server.
+
+The benchmarks drive the application in-process through ASGI, so they
+measure the server and not the network stack. Run them from the project
+root, e.g. ``python -m benchmarks.concurrency``.
+"""
@@ -0,0 +1,87 @@
+"""A minimal in-process ASGI client.
+"""
+import asyncio
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+
+class Response:
+    "The parts of a http response the benchmarks are interested in."
+    # pylint: disable=R0903
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+async def request(
+    app,
+    method: str,
+    url: str,
+    headers: Optional[Iterable[Tuple[str, str]]] = None,
+    body: bytes = b"",
+    on_chunk: Optional[Callable[[bytes], None]] = None,
+) -> Response:
+    """Send a single request to the ASGI app and return the collected response.
+
+    If `on_chunk` is set, it is called with each chunk of the response body
+    instead of collecting the body.
+    """
+    # pylint: disable=R0914
+    path, _, query = url.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in (headers or ())
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    body_sent = False
+    response_complete = asyncio.Event()
+    status = 0
+    response_headers = {}
+    chunks = []
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await response_complete.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            for name, value in message.get("headers", []):
+                response_headers[name.decode("latin-1")] = value.decode("latin-1")
+        elif message["type"] == "http.response.body":
+            if on_chunk is None:
+                chunks.append(message.get("body", b""))
+            else:
+                on_chunk(message.get("body", b""))
+            if not message.get("more_body", False):
+                response_complete.set()
+
+    await app(scope, receive, send)
+    return Response(status, response_headers, b"".join(chunks))
+
+
+def percentile(values, pct: float) -> float:
+    "Return the pct percentile (0..100) of values using the nearest rank."
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
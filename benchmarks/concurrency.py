@@ -0,0 +1,79 @@
+"""Latency under concurrency with and without thread pool offload.
+
+200 concurrent clients (each pausing for a random think time between its
+requests) send a mix of cheap detail requests and expensive substring
+searches without a match, which scan the whole cities table. Without
+offloading, every search blocks the event loop and the p99 latency of the
+cheap requests grows with the number of searches in flight.
+
+    python -m benchmarks.concurrency --cities 100000 --clients 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from cities.config import settings
+from cities.main import app
+
+from .asgi import percentile, request
+from .data import create_database, use_database
+
+
+async def client(
+    rnd: random.Random, requests: int, cities: int, think: float, latencies: dict
+):
+    "Send requests requests and record their latencies by kind."
+    # pylint: disable=R0913
+    for _ in range(requests):
+        await asyncio.sleep(rnd.uniform(0, 2 * think))
+        if rnd.random() < 0.05:
+            kind, url = "search", "/cities/?q=xyz"
+        else:
+            kind, url = "detail", f"/cities/{rnd.randint(1, cities)}"
+        start = time.perf_counter()
+        response = await request(app, "GET", url)
+        latencies[kind].append(time.perf_counter() - start)
+        assert response.status in (200, 404), response.status
+
+
+async def run(clients: int, requests: int, cities: int, think: float) -> dict:
+    "Run all clients concurrently and return latency statistics in ms."
+    latencies = {"detail": [], "search": []}
+    rnd = random.Random(0)
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            client(random.Random(rnd.random()), requests, cities, think, latencies)
+            for _ in range(clients)
+        )
+    )
+    result = {"elapsed_s": round(time.perf_counter() - start, 3)}
+    for kind, values in latencies.items():
+        for pct in (50, 99):
+            result[f"{kind}_p{pct}_ms"] = round(percentile(values, pct) * 1000, 2)
+    return result
+
+
+def main():
+    "Run the benchmark with and without offloading."
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=100_000)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=10, help="requests per client")
+    parser.add_argument("--think", type=float, default=3.0, help="mean think time in s")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        use_database(app, create_database(os.path.join(tmpdir, "bench.db"), args.cities))
+        for offload in (False, True):
+            settings.db_offload = offload
+            result = asyncio.run(run(args.clients, args.requests, args.cities, args.think))
+            print(json.dumps({"benchmark": "concurrency", "db_offload": offload, **result}))
+
+
+if __name__ == "__main__":
+    main()
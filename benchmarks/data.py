@@ -0,0 +1,163 @@
+"""Synthetic data sets for the benchmarks.
+
+The data sets are deterministic: the same sizes and seed give the same
+rows (as long as `GENERATOR_VERSION` is unchanged), so results of
+different commits are comparable. To build one on its own:
+
+    python -m benchmarks.data --cities 1m cities-1m.db
+"""
+import argparse
+import os
+import random
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateTable
+
+from cities import migrations
+from cities.database import Base
+from cities.dependencies import get_db, get_read_db
+
+SYLLABLES = (
+    "al", "an", "bach", "berg", "brunn", "dorf", "eck", "feld", "furt", "gar",
+    "hau", "heim", "hof", "kirch", "lan", "lin", "mar", "mö", "neu", "ried",
+    "sankt", "stein", "tal", "wald", "wei", "zell",
+)
+
+# the named data set sizes (number of cities)
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+# increment when the generated rows change, so cached data sets are rebuilt
+GENERATOR_VERSION = 1
+
+BATCH_SIZE = 50_000
+
+
+def parse_size(value: str) -> int:
+    "Return the number of cities of a named size (e.g. 1m) or a number."
+    return SIZES.get(value.lower()) or int(value.replace("_", ""))
+
+
+def city_name(rnd: random.Random) -> str:
+    "Return a random, city like name."
+    return "".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))).title()
+
+
+def _insert(conn, sql: str, rows):
+    "Insert rows (tuples) with the executemany of the driver."
+    conn.exec_driver_sql(sql, list(rows))
+
+
+def create_database(
+    path: str, cities: int = 10_000, counties: int = 100, countries: int = 10,
+    seed: int = 0,
+):
+    """Create (or replace) a sqlite database at path filled with synthetic data.
+
+    Return the engine connected to the new database.
+    """
+    # pylint: disable=R0913
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    rnd = random.Random(seed)
+    with engine.connect() as conn:
+        # a half written file is useless anyway, so skip the journal
+        conn.exec_driver_sql("PRAGMA journal_mode = OFF")
+        conn.exec_driver_sql("PRAGMA synchronous = OFF")
+        with conn.begin():
+            # without the indexes, which migrate builds after loading in one go
+            for table in Base.metadata.sorted_tables:
+                conn.execute(CreateTable(table))
+            _insert(
+                conn,
+                "INSERT INTO countries (id, name) VALUES (?, ?)",
+                ((i, f"Country {i}") for i in range(1, countries + 1)),
+            )
+            _insert(
+                conn,
+                "INSERT INTO counties (id, name, country_id) VALUES (?, ?, ?)",
+                (
+                    (i, f"County {i}", i % countries + 1)
+                    for i in range(1, counties + 1)
+                ),
+            )
+            for first in range(1, cities + 1, BATCH_SIZE):
+                _insert(
+                    conn,
+                    "INSERT INTO cities (id, name, population, county_id) "
+                    "VALUES (?, ?, ?, ?)",
+                    (
+                        (
+                            i,
+                            city_name(rnd),
+                            rnd.randint(100, 2_000_000),
+                            rnd.randint(1, counties),
+                        )
+                        for i in range(first, min(first + BATCH_SIZE, cities + 1))
+                    ),
+                )
+    migrations.migrate(engine)
+    return engine
+
+
+def cached_database(
+    directory: str, cities: int, counties: int = 100, countries: int = 10,
+    seed: int = 0,
+) -> str:
+    """Return the path of a database in directory created by `create_database`.
+
+    The database is only created if it does not exist yet, as the large
+    ones take minutes. It must not be changed: benchmarks writing to it
+    work on a copy.
+    """
+    # pylint: disable=R0913
+    name = f"cities-{cities}-{counties}-{countries}-{seed}-v{GENERATOR_VERSION}.db"
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        create_database(tmp_path, cities, counties, countries, seed).dispose()
+        os.replace(tmp_path, path)
+    return path
+
+
+def use_database(app, engine):
+    "Make all requests to app use a session connected to engine."
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def _get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = _get_db
+    app.dependency_overrides[get_read_db] = _get_db
+
+
+def main():
+    "Create a database file."
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path")
+    parser.add_argument(
+        "--cities", type=parse_size, default="10k", help=f"any of {', '.join(SIZES)}"
+    )
+    parser.add_argument("--counties", type=int, default=100)
+    parser.add_argument("--countries", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    create_database(
+        args.path, args.cities, args.counties, args.countries, args.seed
+    ).dispose()
+    print(
+        f"{args.cities} cities written to {args.path} "
+        f"in {time.perf_counter() - start:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Memory and throughput of the streaming exports.
+
+The database is created in a child process, so the peak RSS of this
+process is that of the export only:
+
+    python -m benchmarks.export --cities 1000000 --accept text/csv
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from .asgi import request
+from .data import create_database, use_database
+
+
+def export(path: str, accept: str) -> dict:
+    "Stream /cities/export from the database at path and measure it."
+    # pylint: disable=C0415
+    from cities.main import app
+    from cities.database import make_engine
+
+    use_database(app, make_engine(f"sqlite:///{path}"))
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    size = 0
+    lines = 0
+
+    def on_chunk(chunk):
+        nonlocal size, lines
+        size += len(chunk)
+        lines += chunk.count(b"\n")
+
+    start = time.perf_counter()
+    response = asyncio.run(
+        request(app, "GET", "/cities/export", [("Accept", accept)], on_chunk=on_chunk)
+    )
+    seconds = time.perf_counter() - start
+    assert response.status == 200
+    return {
+        "lines": lines,
+        "mib": round(size / 2**20, 1),
+        "seconds": round(seconds, 1),
+        "rows_per_sec": round(lines / seconds),
+        "rss_before_mib": round(rss_before / 1024, 1),
+        "rss_peak_mib": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def main():
+    "Export all cities and report the peak RSS."
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=1_000_000)
+    parser.add_argument("--accept", default="application/x-ndjson")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "bench.db")
+        process = multiprocessing.Process(
+            target=create_database, args=(path, args.cities)
+        )
+        process.start()
+        process.join()
+        result = export(path, args.accept)
+        print(
+            json.dumps(
+                {
+                    "benchmark": "export",
+                    "cities": args.cities,
+                    "accept": args.accept,
+                    **result,
+                }
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""PATCH throughput with and without group commit.
+
+Concurrent clients PATCH the population of random cities as fast as they
+can. Without group commit each request commits (and waits for the disk)
+on its own; with it, the updates arriving together share a commit.
+
+    python -m benchmarks.group_commit --cities 100000 --clients 1,8,32,128
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from cities import writer
+from cities.config import settings
+from cities.main import app
+
+from .asgi import percentile, request
+from .data import create_database, use_database
+
+
+async def client(
+    rnd: random.Random, requests: int, cities: int, latencies: list, errors: list
+):
+    "Send requests PATCH requests and record their latencies and failures."
+    # pylint: disable=R0913
+    headers = [("content-type", "application/json")]
+    for _ in range(requests):
+        body = json.dumps({"population": rnd.randint(100, 2_000_000)}).encode()
+        start = time.perf_counter()
+        try:
+            response = await request(
+                app, "PATCH", f"/cities/{rnd.randint(1, cities)}", headers, body
+            )
+            status = response.status
+        except Exception:  # pylint: disable=W0703
+            # the app raises errors like "database is locked" after the 500
+            status = 500
+        latencies.append(time.perf_counter() - start)
+        if status != 200:
+            errors.append(status)
+
+
+async def run(clients: int, requests: int, cities: int) -> dict:
+    """Run all clients concurrently and return throughput and latencies.
+
+    Failed requests (e.g. SQLite giving up waiting for its write lock)
+    are counted as errors.
+    """
+    latencies, errors = [], []
+    rnd = random.Random(0)
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            client(random.Random(rnd.random()), requests, cities, latencies, errors)
+            for _ in range(clients)
+        )
+    )
+    elapsed = time.perf_counter() - start
+    return {
+        "req_per_s": round(len(latencies) / elapsed),
+        "errors": len(errors),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+    "Run the benchmark with and without group commit for each client count."
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=100_000)
+    parser.add_argument("--clients", default="1,8,32,128")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        use_database(app, create_database(os.path.join(tmpdir, "bench.db"), args.cities))
+        for clients in map(int, args.clients.split(",")):
+            for group_commit in (False, True):
+                settings.group_commit = group_commit
+                batches = writer.BATCH_SIZES.count()
+                result = asyncio.run(
+                    run(clients, max(1, args.requests // clients), args.cities)
+                )
+                print(
+                    json.dumps(
+                        {
+                            "benchmark": "group_commit",
+                            "clients": clients,
+                            "group_commit": group_commit,
+                            **result,
+                            "commits": writer.BATCH_SIZES.count() - batches
+                            if group_commit
+                            else None,
+                        }
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
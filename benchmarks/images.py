@@ -0,0 +1,103 @@
+"""Requests per second for country images.
+
+Compares the in-memory image index of the app with serving the files like
+before (path computation, os.path.exists and a FileResponse per request),
+and measures thumbnails (``?w=64``, needs Pillow): the time to render one
+and the requests per second once it is cached on disk:
+
+    python -m benchmarks.images --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse
+
+from cities import derivatives, images, negotiation
+from cities.main import app
+from cities.routers.country import AVAILABLE_IMAGES
+
+from .asgi import request
+
+file_app = FastAPI()
+
+
+@file_app.get("/countries/{country_id}")
+async def get_image_from_file(request: Request, country_id: int):
+    "The image handler as it was before the image index."
+    # pylint: disable=W0621
+    img_type = negotiation.negotiate(
+        request.headers.get("accept", ""), tuple(AVAILABLE_IMAGES)
+    )
+    img_file = os.path.join(
+        images.DATA_DIR, f"{country_id}.{AVAILABLE_IMAGES[img_type]}"
+    )
+    if not os.path.exists(img_file):
+        raise HTTPException(status_code=404, detail="No such image")
+    return FileResponse(img_file, media_type=img_type)
+
+
+async def measure(
+    asgi_app, media_type: str, requests: int, etag: bool, url: str = "/countries/1"
+) -> float:
+    "Return the requests per second for GET url of media_type."
+    headers = [("Accept", media_type)]
+    response = await request(asgi_app, "GET", url, headers)
+    assert response.status == 200
+    if etag:
+        headers.append(("If-None-Match", response.headers["etag"]))
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = await request(asgi_app, "GET", url, headers)
+    assert response.status == (304 if etag else 200)
+    return requests / (time.perf_counter() - start)
+
+
+async def measure_thumbnails(requests: int) -> dict:
+    "Return the time to render thumbnails and the requests per second after."
+    result = {}
+    for media_type in derivatives.RENDERABLE:
+        url = "/countries/1?w=64"
+        headers = [("Accept", media_type)]
+        await request(app, "GET", "/countries/2?w=64", headers)  # start the pool
+        start = time.perf_counter()
+        response = await request(app, "GET", url, headers)
+        assert response.status == 200, response.body
+        key = media_type.split("/")[1]
+        result[f"{key}_64_render_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        result[f"{key}_64_bytes"] = len(response.body)
+        result[f"{key}_64_cached_rps"] = round(
+            await measure(app, media_type, requests, False, url)
+        )
+    return result
+
+
+def main():
+    "Measure image requests per second from files and from memory."
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    result = {}
+    for media_type in ("image/png", "image/svg+xml"):
+        for variant, asgi_app, etag in (
+            ("file", file_app, False),
+            ("memory", app, False),
+            ("memory_304", app, True),
+        ):
+            rps = asyncio.run(measure(asgi_app, media_type, args.requests, etag))
+            result[f"{media_type.split('/')[1]}_{variant}"] = round(rps)
+    print(json.dumps({"benchmark": "images", "requests_per_second": result}))
+    if derivatives.RENDERABLE:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            derivatives.CACHE = derivatives.DiskCache(tmpdir, 64 * 1024 * 1024)
+            thumbnails = asyncio.run(measure_thumbnails(args.requests))
+        print(json.dumps({"benchmark": "thumbnails", **thumbnails}))
+
+
+if __name__ == "__main__":
+    main()
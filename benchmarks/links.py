@@ -0,0 +1,59 @@
+"""Serialization of a listing with request.url_for and with cities.links.
+
+    python -m benchmarks.links --items 100
+"""
+import argparse
+import json
+import timeit
+
+from starlette.requests import Request
+
+from cities import links, models, schemas
+from cities.main import app
+
+
+def starlette_url_for(request, name, **path_params):
+    "Link generation as before: search the route table for every link."
+    return request.url_for(name, **path_params)
+
+
+def main():
+    "Compare the time to serialize a listing and a CountyDetails."
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    country = models.Country(id=1, name="Austria")
+    county = models.County(id=1, name="Mödling", country=country)
+    for i in range(1, args.items + 1):
+        models.City(id=i, name=f"City {i}", population=i, county=county)
+    scope = {
+        "type": "http", "method": "GET", "scheme": "http", "path": "/cities/",
+        "root_path": "", "query_string": b"", "headers": [],
+        "server": ("testserver", 80), "router": app.router,
+    }
+
+    def listing():
+        request = Request(dict(scope))
+        return [schemas.City.from_model(request, city) for city in county.cities]
+
+    def details():
+        return schemas.CountyDetails.from_model(
+            Request(dict(scope)), county, county.cities
+        )
+
+    result = {}
+    for variant, url_for in (("url_for", starlette_url_for), ("links", links.url_for)):
+        links.url_for, original = url_for, links.url_for
+        try:
+            for key, func in (("listing", listing), ("county_details", details)):
+                seconds = min(timeit.repeat(func, number=args.repeat, repeat=5))
+                result[f"{key}_{variant}"] = round(seconds / args.repeat * 1000, 3)
+        finally:
+            links.url_for = original
+    print(json.dumps({"benchmark": "links", "items": args.items, "ms": result}))
+
+
+if __name__ == "__main__":
+    main()
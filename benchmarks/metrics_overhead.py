@@ -0,0 +1,71 @@
+"""Overhead of the request and database metrics.
+
+Runs the same requests with CITIES_METRICS_ENABLED on and off, alternating
+between the two to cancel out drift:
+
+    python -m benchmarks.metrics_overhead --cities 100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from cities.config import settings
+from cities.instrumentation import instrument_engine
+from cities.main import app
+
+from .asgi import percentile, request
+from .data import create_database, use_database
+
+
+async def measure(url: str, repeat: int, rounds: int) -> dict:
+    "Return the median latency of GET url in µs with and without metrics."
+    latencies = {True: [], False: []}
+    await request(app, "GET", url)  # warm up caches
+    for _ in range(rounds):
+        for enabled in (True, False):
+            settings.metrics_enabled = enabled
+            for _ in range(repeat):
+                start = time.perf_counter()
+                response = await request(app, "GET", url)
+                latencies[enabled].append(time.perf_counter() - start)
+                assert response.status == 200, response.body
+    settings.metrics_enabled = True
+    on = percentile(latencies[True], 50) * 1_000_000
+    off = percentile(latencies[False], 50) * 1_000_000
+    return {"on": round(on, 1), "off": round(off, 1), "overhead": round(on - off, 1)}
+
+
+def main():
+    "Compare the latency with and without metrics."
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_database(os.path.join(tmpdir, "bench.db"), args.cities)
+        instrument_engine(engine, "bench")
+        use_database(app, engine)
+        urls = {
+            # served from the response cache, no SQL: the worst case
+            "city_cached": "/cities/1",
+            "cities_page": "/cities/?size=20",
+            "cities_search": "/cities/?q=bergdorf&size=20",
+        }
+        result = {
+            key: asyncio.run(measure(url, args.repeat, args.rounds))
+            for key, url in urls.items()
+        }
+        print(
+            json.dumps(
+                {"benchmark": "metrics_overhead", "cities": args.cities, "us": result}
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Latency of the first and a deep page with offset and cursor paging.
+
+    python -m benchmarks.paging --cities 1000000 --page 10000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from cities.main import app
+from cities.pagination import encode_cursor
+
+from .asgi import percentile, request
+from .data import create_database, use_database
+
+
+async def measure(url: str, repeat: int) -> float:
+    "Return the median latency of GET url in ms."
+    await request(app, "GET", url)  # warm up caches
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await request(app, "GET", url)
+        latencies.append(time.perf_counter() - start)
+        assert response.status == 200, response.body
+    return round(percentile(latencies, 50) * 1000, 2)
+
+
+def main():
+    "Compare page 1 with a deep page."
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=1_000_000)
+    parser.add_argument("--page", type=int, default=10_000, help="the deep page")
+    parser.add_argument("--size", type=int, default=20, help="page size")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_database(os.path.join(tmpdir, "bench.db"), args.cities)
+        use_database(app, engine)
+        start = (args.page - 1) * args.size
+        with engine.connect() as conn:
+            # the last city of the page before the deep page
+            name, city_id = conn.execute(
+                text("SELECT name, id FROM cities ORDER BY name, id LIMIT 1 OFFSET :n"),
+                {"n": start - 1},
+            ).one()
+        urls = {
+            "offset_page_1": f"/cities/?size={args.size}",
+            f"offset_page_{args.page}": f"/cities/?size={args.size}&start={start + 1}",
+            "cursor_page_1": f"/cities/?size={args.size}",
+            f"cursor_page_{args.page}": (
+                f"/cities/?size={args.size}&after={encode_cursor(name, city_id)}"
+            ),
+        }
+        result = {
+            key: asyncio.run(measure(url, args.repeat)) for key, url in urls.items()
+        }
+        print(json.dumps({"benchmark": "paging", "cities": args.cities, "ms": result}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Rows per second of the list endpoints with and without the fast serializer.
+
+    python -m benchmarks.serialization --cities 100000 --sizes 1000 10000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from cities.config import settings
+from cities.main import app
+
+from .asgi import percentile, request
+from .data import create_database, use_database
+
+
+async def measure(url: str, repeat: int) -> float:
+    "Return the median latency of GET url in seconds."
+    await request(app, "GET", url)  # warm up caches
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await request(app, "GET", url)
+        latencies.append(time.perf_counter() - start)
+        assert response.status == 200, response.body
+    return percentile(latencies, 50)
+
+
+def main():
+    "Compare pydantic and the fast serializer for some page sizes."
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=100_000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_database(os.path.join(tmpdir, "bench.db"), args.cities)
+        use_database(app, engine)
+        for size in args.sizes:
+            result = {}
+            for variant, fast in (("pydantic", False), ("fast", True)):
+                settings.fast_serializer = fast
+                seconds = asyncio.run(measure(f"/cities/?size={size}", args.repeat))
+                result[variant] = {
+                    "ms": round(seconds * 1000, 1),
+                    "rows_per_sec": round(size / seconds),
+                }
+            settings.fast_serializer = False
+            print(
+                json.dumps(
+                    {"benchmark": "serialization", "size": size, "result": result}
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
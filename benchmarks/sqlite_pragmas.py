@@ -0,0 +1,96 @@
+"""Reader/writer throughput with the default and the production sqlite profile.
+
+Reader threads fetch city details while writer threads update populations,
+each operation in its own transaction, like concurrent requests would.
+
+    python -m benchmarks.sqlite_pragmas --readers 8 --writers 2 --seconds 10
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+import sqlalchemy.exc
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from cities import crud
+from cities.config import settings
+
+from .data import create_database
+
+
+def worker(session_factory, write: bool, cities: int, stop: threading.Event, stats):
+    "Read or write random cities until stop is set."
+    # pylint: disable=R0913
+    rnd = random.Random()
+    ops = errors = 0
+    while not stop.is_set():
+        with session_factory() as db:
+            try:
+                city_id = rnd.randint(1, cities)
+                if write:
+                    crud.update_city(db, city_id, population=rnd.randint(1, 10**6))
+                else:
+                    crud.get_city(db, city_id, options=crud.CITY_DETAILS)
+                ops += 1
+            except sqlalchemy.exc.OperationalError:  # database is locked
+                errors += 1
+    stats.append((write, ops, errors))
+
+
+def run(path: str, profile: str, args) -> dict:
+    "Run readers and writers against the database at path using profile."
+    settings.sqlite_profile = profile
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False, "timeout": 1},
+    )
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    stop = threading.Event()
+    stats = []
+    threads = [
+        threading.Thread(
+            target=worker, args=(session_factory, write, args.cities, stop, stats)
+        )
+        for write in [False] * args.readers + [True] * args.writers
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    result = {"benchmark": "sqlite_pragmas", "profile": profile}
+    for write, kind in ((False, "reads"), (True, "writes")):
+        result[f"{kind}_per_s"] = round(
+            sum(ops for is_write, ops, _ in stats if is_write == write) / args.seconds
+        )
+        result[f"{kind}_locked"] = sum(
+            errors for is_write, _, errors in stats if is_write == write
+        )
+    return result
+
+
+def main():
+    "Compare the profiles."
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=100_000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "bench.db")
+        create_database(path, args.cities).dispose()
+        for profile in ("default", "production"):
+            print(json.dumps(run(path, profile, args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""Reproducible scenarios on large synthetic data sets.
+
+    python -m benchmarks.suite --cities 1m --output before.json
+    ... change the code ...
+    python -m benchmarks.suite --cities 1m --compare before.json
+
+Each scenario sends `--repeat` times `--requests` requests (after
+`--warmup` ones) from `--concurrency` concurrent clients through ASGI:
+
+* detail: GET /cities/{id} of random cities
+* filtered_list: GET /cities/ filtered by county or country and population
+* deep_offset: GET /cities/?start=... of pages in the second half of the list
+* deep_cursor: the same pages, requested with the `after` cursor
+* search: GET /cities/?q=... with substrings of city names
+* write_mix: PATCH (50 %), PUT to existing (25 %) and new cities (25 %)
+
+The requests depend only on the data set and `--seed`, so the results of
+different commits are comparable; the median throughput of the
+repetitions is reported. The data set is built once per size in
+`--data-dir`; every run works on a fresh copy of it, as write_mix changes
+the data. The results (with commit, data set and settings) are printed as
+one JSON line and written to `--output`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from cities import cache
+from cities.config import settings
+from cities.database import make_engine
+from cities.main import app
+from cities.pagination import encode_cursor
+
+from .asgi import percentile, request
+from .data import (
+    GENERATOR_VERSION, SIZES, SYLLABLES, cached_database, city_name, parse_size,
+    use_database,
+)
+
+PAGE_SIZE = 20
+# number of distinct deep pages requested by deep_offset and deep_cursor
+DEEP_PAGES = 10
+
+# method, url and (json) body of a request
+Request = Tuple[str, str, Optional[dict]]
+
+
+@dataclass
+class Dataset:
+    "The sizes of a data set and the (name, id) keys of some deep pages."
+    cities: int
+    counties: int
+    countries: int
+    deep_pages: List[Tuple[int, str, int]]  # offset, name, id of the previous city
+
+
+def detail(rnd: random.Random, data: Dataset, _) -> Request:
+    "Get a random city."
+    return "GET", f"/cities/{rnd.randint(1, data.cities)}", None
+
+
+def filtered_list(rnd: random.Random, data: Dataset, _) -> Request:
+    "List the cities of a county or country above a minimum population."
+    minpop = rnd.randint(100_000, 1_500_000)
+    if rnd.random() < 0.5:
+        where = f"county_id={rnd.randint(1, data.counties)}"
+    else:
+        where = f"country=Country%20{rnd.randint(1, data.countries)}"
+    return "GET", f"/cities/?{where}&minpop={minpop}&size={PAGE_SIZE}", None
+
+
+def deep_offset(rnd: random.Random, data: Dataset, _) -> Request:
+    "Get a deep page by offset."
+    offset, _, _ = rnd.choice(data.deep_pages)
+    return "GET", f"/cities/?start={offset + 1}&size={PAGE_SIZE}", None
+
+
+def deep_cursor(rnd: random.Random, data: Dataset, _) -> Request:
+    "Get a deep page by cursor."
+    _, name, city_id = rnd.choice(data.deep_pages)
+    return (
+        "GET",
+        f"/cities/?after={encode_cursor(name, city_id)}&size={PAGE_SIZE}",
+        None,
+    )
+
+
+def search(rnd: random.Random, *_) -> Request:
+    "Search for two syllables of city names."
+    q = f"{rnd.choice(SYLLABLES)}{rnd.choice(SYLLABLES)}"
+    return "GET", f"/cities/?q={q}&size={PAGE_SIZE}", None
+
+
+def write_mix(rnd: random.Random, data: Dataset, i: int) -> Request:
+    "PATCH or PUT a random city, or PUT a new one."
+    kind = rnd.random()
+    if kind < 0.5:
+        body = {"population": rnd.randint(100, 2_000_000)}
+        return "PATCH", f"/cities/{rnd.randint(1, data.cities)}", body
+    city_id = rnd.randint(1, data.cities) if kind < 0.75 else data.cities + i + 1
+    body = {
+        "name": city_name(rnd),
+        "population": rnd.randint(100, 2_000_000),
+        "county_id": rnd.randint(1, data.counties),
+    }
+    return "PUT", f"/cities/{city_id}", body
+
+
+SCENARIOS: Dict[str, Callable[[random.Random, Dataset, int], Request]] = {
+    "detail": detail,
+    "filtered_list": filtered_list,
+    "deep_offset": deep_offset,
+    "deep_cursor": deep_cursor,
+    "search": search,
+    # last, so the other scenarios read the unchanged data set
+    "write_mix": write_mix,
+}
+
+
+def deep_pages(engine, cities: int, rnd: random.Random) -> list:
+    "Return offset and key of the city before DEEP_PAGES pages in the second half."
+    pages = []
+    with engine.connect() as conn:
+        for _ in range(DEEP_PAGES):
+            offset = rnd.randint(cities // 2, max(cities // 2, cities - PAGE_SIZE))
+            name, city_id = conn.execute(
+                text("SELECT name, id FROM cities ORDER BY name, id LIMIT 1 OFFSET :n"),
+                {"n": offset - 1},
+            ).one()
+            pages.append((offset, name, city_id))
+    return pages
+
+
+async def run(requests: List[Request], concurrency: int) -> Tuple[float, list, int]:
+    """Send the requests from concurrency clients.
+
+    Return the elapsed seconds, the latencies and the number of errors.
+    Responses with an error status and requests raising an exception
+    (which the app does after some 500 responses) are errors.
+    """
+    pending = iter(requests)
+    latencies, errors = [], []
+
+    async def client():
+        for method, url, body in pending:
+            headers, content = [], b""
+            if body is not None:
+                headers = [("content-type", "application/json")]
+                content = json.dumps(body).encode()
+            start = time.perf_counter()
+            try:
+                status = (await request(app, method, url, headers, content)).status
+            except Exception:  # pylint: disable=W0703
+                status = 500
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors.append(status)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies, len(errors)
+
+
+def summarize(runs: List[Tuple[float, list, int]]) -> dict:
+    "Return the median throughput and the latency percentiles of all runs."
+    throughputs = sorted(len(latencies) / elapsed for elapsed, latencies, _ in runs)
+    latencies = [latency for _, run_latencies, _ in runs for latency in run_latencies]
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors for _, _, errors in runs),
+        "req_per_s": round(throughputs[len(throughputs) // 2], 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def git_commit() -> Optional[str]:
+    "Return the current commit, with '-dirty' if there are uncommitted changes."
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, check=True, text=True,
+        ).stdout.strip()
+        changes = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True, check=True, text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if changes else commit
+
+
+def compare(base: dict, result: dict) -> str:
+    "Return a table comparing the scenarios of two results."
+    lines = [
+        f"base: {base.get('commit')}, new: {result.get('commit')}",
+        f"{'scenario':<14} {'req/s':>17} {'change':>8} {'p50 ms':>17} {'p99 ms':>17}",
+    ]
+    if base["dataset"] != result["dataset"]:
+        lines.insert(1, "WARNING: the data sets differ")
+    for name, new in result["results"].items():
+        old = base["results"].get(name)
+        if old is None:
+            continue
+        change = (new["req_per_s"] / old["req_per_s"] - 1) * 100
+        lines.append(
+            f"{name:<14} {old['req_per_s']:>8} {new['req_per_s']:>8} {change:>+7.1f}%"
+            f" {old['p50_ms']:>8} {new['p50_ms']:>8}"
+            f" {old['p99_ms']:>8} {new['p99_ms']:>8}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    "Run the selected scenarios on a copy of the data set."
+    # pylint: disable=R0914
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--cities", type=parse_size, default="1m", help=f"any of {', '.join(SIZES)}"
+    )
+    parser.add_argument("--counties", type=int, default=100)
+    parser.add_argument("--countries", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=1000, help="per repetition")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scenario")
+    parser.add_argument("--warmup", type=int, default=100, help="per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--data-dir",
+        default=os.path.join(tempfile.gettempdir(), "cities-benchmarks"),
+        help="where the data sets are kept between runs",
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare with the results in this file")
+    args = parser.parse_args()
+    selected = args.scenarios.split(",")
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    source = cached_database(
+        args.data_dir, args.cities, args.counties, args.countries, args.seed
+    )
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "bench.db")
+        shutil.copyfile(source, path)
+        engine = make_engine(f"sqlite:///{path}")
+        use_database(app, engine)
+        data = Dataset(
+            args.cities,
+            args.counties,
+            args.countries,
+            deep_pages(engine, args.cities, random.Random(args.seed)),
+        )
+        for name, scenario in SCENARIOS.items():
+            if name not in selected:
+                continue
+            # the same requests for every run
+            rnd = random.Random(f"{args.seed}-{name}")
+            requests = [
+                scenario(rnd, data, i)
+                for i in range(args.warmup + args.repeat * args.requests)
+            ]
+            cache.RESPONSE_CACHE.clear()
+            asyncio.run(run(requests[: args.warmup], args.concurrency))
+            results[name] = summarize(
+                [
+                    asyncio.run(
+                        run(requests[first : first + args.requests], args.concurrency)
+                    )
+                    for first in range(args.warmup, len(requests), args.requests)
+                ]
+            )
+        engine.dispose()
+
+    result = {
+        "benchmark": "suite",
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "cpus": os.cpu_count(),
+        "dataset": {
+            "cities": args.cities,
+            "counties": args.counties,
+            "countries": args.countries,
+            "seed": args.seed,
+            "version": GENERATOR_VERSION,
+        },
+        "requests": args.requests,
+        "repeat": args.repeat,
+        "concurrency": args.concurrency,
+        "settings": json.loads(
+            settings.json(exclude={"database_url", "replica_url", "image_cache_dir"})
+        ),
+        "results": results,
+    }
+    print(json.dumps(result))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(result, file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            print(compare(json.load(file), result))
+
+
+if __name__ == "__main__":
+    main()
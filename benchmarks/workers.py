@@ -0,0 +1,166 @@
+"""Read throughput of the server by number of worker processes.
+
+Unlike the other benchmarks, this one starts real servers
+(``python -m cities.serve``) on a synthetic database and loads them over
+HTTP from several client processes, each with many keep-alive
+connections, sending GET /cities/{id} for random ids. Each run is
+preceded by a short warm up.
+
+    python -m benchmarks.workers --workers 1,2,4 --clients 4 --duration 10
+
+The clients share the machine with the server, so give them enough cores:
+the scaling is only meaningful while they are not the bottleneck.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from .asgi import percentile
+from .data import create_database
+
+
+async def get(reader, writer, path: str) -> int:
+    "Send a GET request on a keep-alive connection and return the status."
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def connection(port: int, cities: int, until: float, seed: int) -> list:
+    "Send requests over one connection until `until`; return their latencies."
+    rnd = random.Random(seed)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    latencies = []
+    try:
+        while time.monotonic() < until:
+            start = time.perf_counter()
+            status = await get(reader, writer, f"/cities/{rnd.randint(1, cities)}")
+            assert status == 200, status
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+    return latencies
+
+
+def client(port: int, cities: int, connections: int, duration: float, seed: int):
+    "Load the server from one process; return the latencies of all requests."
+
+    async def _run():
+        until = time.monotonic() + duration
+        results = await asyncio.gather(
+            *(
+                connection(port, cities, until, seed * 1000 + i)
+                for i in range(connections)
+            )
+        )
+        return [latency for latencies in results for latency in latencies]
+
+    return asyncio.run(_run())
+
+
+def load(port: int, cities: int, clients: int, connections: int, duration: float):
+    "Load the server from `clients` processes and return the statistics."
+    # pylint: disable=R0913
+    with multiprocessing.Pool(clients) as pool:
+        results = pool.starmap(
+            client,
+            [(port, cities, connections, duration, seed) for seed in range(clients)],
+        )
+    latencies = [latency for latencies in results for latency in latencies]
+    return {
+        "req_per_s": round(len(latencies) / duration),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def wait_for(port: int, timeout: float = 60):
+    "Wait until the server accepts connections on port."
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"The server did not start on port {port}")
+
+
+def free_port() -> int:
+    "Return a free TCP port."
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    "Run the benchmark for each number of workers."
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=100_000)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--clients", type=int, default=4, help="client processes")
+    parser.add_argument(
+        "--connections", type=int, default=16, help="connections per client"
+    )
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "bench.db")
+        create_database(path, args.cities).dispose()
+        env = {
+            **os.environ,
+            "CITIES_DATABASE_URL": f"sqlite:///{path}",
+            "CITIES_SQLITE_PROFILE": "production",
+        }
+        for workers in map(int, args.workers.split(",")):
+            port = free_port()
+            server = subprocess.Popen(  # pylint: disable=R1732
+                [sys.executable, "-m", "cities.serve", "--port", str(port),
+                 "--workers", str(workers)],
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                wait_for(port)
+                load(port, args.cities, args.clients, args.connections, 1.0)
+                result = load(
+                    port, args.cities, args.clients, args.connections, args.duration
+                )
+            finally:
+                server.terminate()
+                server.wait()
+            print(
+                json.dumps(
+                    {
+                        "benchmark": "workers",
+                        "workers": workers,
+                        "cpus": os.cpu_count(),
+                        "clients": args.clients,
+                        "connections": args.clients * args.connections,
+                        **result,
+                    }
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Write throughput of PUT /cities/{id}, /counties/{id} and /countries/{id}.
+
+Each variant sends sequential PUT requests, half of them updating existing
+entries and half of them creating new ones, and reports the requests per
+second and the SQL statements executed per request. With the default
+``--synchronous full`` each commit waits for the disk; ``--synchronous
+off`` shows the cost of the statements alone.
+
+    python -m benchmarks.writes --cities 100000 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy import event
+
+from cities.main import app
+
+from .asgi import request
+from .data import create_database, use_database
+
+
+def put_body(kind: str, i: int, counties: int, countries: int) -> bytes:
+    "Return the body of the i-th PUT of kind, changing the name of the entry."
+    if kind == "cities":
+        body = {"name": f"Town {i}", "population": i, "county_id": i % counties + 1}
+    elif kind == "counties":
+        body = {"name": f"District {i}", "country_id": i % countries + 1}
+    else:
+        body = {"name": f"State {i}"}
+    return json.dumps(body).encode()
+
+
+async def run(kind: str, ids, counties: int, countries: int) -> float:
+    "PUT to /kind/{id} for all ids and return the elapsed seconds."
+    headers = [("content-type", "application/json")]
+    start = time.perf_counter()
+    for i in ids:
+        body = put_body(kind, i, counties, countries)
+        response = await request(app, "PUT", f"/{kind}/{i}", headers, body)
+        assert response.status in (200, 201), (response.status, response.body)
+    return time.perf_counter() - start
+
+
+def main():
+    "Measure the write throughput of each endpoint."
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=100_000)
+    parser.add_argument("--counties", type=int, default=1000)
+    parser.add_argument("--countries", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--synchronous", default="full", choices=("full", "off"))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_database(
+            os.path.join(tmpdir, "bench.db"), args.cities, args.counties, args.countries
+        )
+        engine.dispose()
+        event.listen(
+            engine,
+            "connect",
+            lambda conn, _: conn.execute(f"PRAGMA synchronous={args.synchronous}"),
+        )
+        use_database(app, engine)
+        statements = []
+        event.listen(
+            engine, "before_cursor_execute", lambda *_: statements.append(None)
+        )
+        totals = {"cities": args.cities, "counties": args.counties}
+        for kind in ("cities", "counties", "countries"):
+            existing = totals.get(kind, args.countries)
+            half = args.requests // 2
+            # updates of existing entries, then creations of new ones
+            for operation, ids in (
+                ("update", range(1, min(half, existing) + 1)),
+                ("create", range(existing + 1, existing + half + 1)),
+            ):
+                statements.clear()
+                seconds = asyncio.run(run(kind, ids, args.counties, args.countries))
+                print(
+                    json.dumps(
+                        {
+                            "benchmark": "writes",
+                            "endpoint": f"PUT /{kind}/{{id}}",
+                            "operation": operation,
+                            "synchronous": args.synchronous,
+                            "requests": len(ids),
+                            "req_per_s": round(len(ids) / seconds),
+                            "statements_per_request": round(
+                                len(statements) / len(ids), 2
+                            ),
+                        }
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,33 @@
 #!/usr/bin/env python
+"""Fill the cities database with the data from the csv files.
+
+There are three modes:
+
+put      send one PUT request per entry (slow, but shows the REST interface)
+bulk     stream each file to the bulk endpoints (POST /cities:bulk, ...)
+offline  write directly into the database, no server needed
+"""
+import argparse
 import csv
-import requests
+import os
 import sys
 
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(HERE)
+BATCH_SIZE = 10_000
+
 
-def populate_countries(base_url):
+def populate_countries(session, base_url, filename):
     "Push lines from countries.csv to data base."
-    with open("countries.csv", encoding="utf-8") as fh:
+    with open(filename, encoding="utf-8") as fh:
         reader = csv.DictReader(fh)
         success_counter = 0
         for row in reader:
             country_id = int(row["id"])
             del row["id"]
-            r = requests.put(f"{base_url}/countries/{country_id}", json=row)
+            r = session.put(f"{base_url}/countries/{country_id}", json=row)
             if r.status_code >= 400:
                 raise Exception(f"Error {r.status_code}: {r.text}")
             else:
@@ -20,31 +35,31 @@ def populate_countries(base_url):
         print(f"Created {success_counter} countries")
 
 
-def populate_counties(base_url):
+def populate_counties(session, base_url, filename):
     "Push lines from counties.csv to data base."
-    with open("counties.csv", encoding="utf-8") as fh:
+    with open(filename, encoding="utf-8") as fh:
         reader = csv.DictReader(fh)
         success_counter = 0
         for row in reader:
             county_id = int(row["id"])
             row["country_id"] = int(row["country_id"])
-            r = requests.put(f"{base_url}/counties/{county_id}", json=row)
+            r = session.put(f"{base_url}/counties/{county_id}", json=row)
             if r.status_code >= 400:
                 raise Exception(f"Error {r.status_code}: {r.text}")
             else:
                 success_counter += 1
         print(f"Created {success_counter} counties")
 
-def populate_cities(base_url):
+def populate_cities(session, base_url, filename):
     "Push lines from cities.csv to data base."
-    with open("cities.csv", encoding="utf-8") as fh:
+    with open(filename, encoding="utf-8") as fh:
         reader = csv.DictReader(fh)
         success_counter = 0
         for row in reader:
             row["id"] = int(row["id"])
             row["population"] = int(row["population"])
             row["county_id"] = int(row["county_id"])
-            r = requests.put(f"{base_url}/cities/{row['id']}", json=row)
+            r = session.put(f"{base_url}/cities/{row['id']}", json=row)
             if r.status_code >= 400:
                 raise Exception(f"Error {r.status_code}: {r.text}")
             else:
@@ -52,12 +67,83 @@ def populate_cities(base_url):
         print(f"Created {success_counter} cities")
 
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        base_url = 'http://127.0.0.1:8000'
-    else:
-        base_url = sys.argv[1]
-    populate_countries(base_url)
-    populate_counties(base_url)
-    populate_cities(base_url)
+def bulk_upload(session, base_url, collection, filename):
+    "Stream a csv file to the bulk endpoint of collection."
+    with open(filename, "rb") as fh:
+        r = session.post(
+            f"{base_url}/{collection}:bulk",
+            data=fh,
+            headers={"Content-Type": "text/csv"},
+        )
+    if r.status_code >= 400:
+        raise Exception(f"Error {r.status_code}: {r.text}")
+    print(f"Created or updated {r.json()['imported']} {collection}")
+
 
+def offline_import(database_url, files):
+    "Write the csv files directly into the database at database_url."
+    sys.path.insert(0, PROJECT_DIR)
+    # pylint: disable=C0415
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from cities import bulk, crud, migrations, schemas
+
+    engine = create_engine(database_url)
+    migrations.migrate(engine)
+    imports = (
+        ("countries", schemas.CountryCreate, crud.upsert_countries),
+        ("counties", schemas.CountyCreate, crud.upsert_counties),
+        ("cities", schemas.CityCreate, crud.upsert_cities),
+    )
+    with Session(engine) as db:
+        for collection, schema, upsert in imports:
+            parser = bulk.RecordParser(bulk.CSV, schema)
+            with open(files[collection], encoding="utf-8") as fh:
+                count = sum(
+                    upsert(db, batch)
+                    for batch in bulk.iter_batches(fh, parser, BATCH_SIZE)
+                )
+            print(f"Created or updated {count} {collection}")
+        db.commit()
+
+
+def main():
+    "Parse the command line and run the import."
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "base_url", nargs="?", default="http://127.0.0.1:8000",
+        help="Base url of the server (put and bulk mode)",
+    )
+    parser.add_argument("--mode", choices=("put", "bulk", "offline"), default="put")
+    parser.add_argument(
+        "--database", default=f"sqlite:///{os.path.join(PROJECT_DIR, 'cities.db')}",
+        help="SQLAlchemy database url (offline mode)",
+    )
+    for collection in ("countries", "counties", "cities"):
+        parser.add_argument(
+            f"--{collection}", default=os.path.join(HERE, f"{collection}.csv"),
+            help=f"csv file with the {collection}",
+        )
+    args = parser.parse_args()
+    files = {
+        "countries": args.countries, "counties": args.counties, "cities": args.cities
+    }
+
+    if args.mode == "offline":
+        offline_import(args.database, files)
+        return
+    with requests.Session() as session:
+        if args.mode == "bulk":
+            for collection in ("countries", "counties", "cities"):
+                bulk_upload(session, args.base_url, collection, files[collection])
+        else:
+            populate_countries(session, args.base_url, files["countries"])
+            populate_counties(session, args.base_url, files["counties"])
+            populate_cities(session, args.base_url, files["cities"])
+
+
+if __name__ == "__main__":
+    main()
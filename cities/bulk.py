@@ -0,0 +1,187 @@
+"""Parse and write streamed NDJSON or CSV data for bulk imports and exports.
+
+The data is read line by line and handed out in batches of validated
+schema objects, so an import of any size needs only constant memory.
+Exports are written in chunks of lines in the same way.
+NDJSON has one JSON object per line, CSV a header line with the field
+names followed by one line per record; quoted CSV fields may contain line
+breaks, so a record may span several lines.
+"""
+import codecs
+import csv
+import io
+import json
+from typing import (
+    AsyncIterable, AsyncIterator, Iterable, Iterator, List, Sequence, Type
+)
+
+from pydantic import BaseModel, ValidationError
+
+from .serialization import dumps
+
+NDJSON = "application/x-ndjson"
+CSV = "text/csv"
+MEDIA_TYPES = (NDJSON, CSV)
+
+
+class BulkImportError(Exception):
+    "Exception raised for a record which cannot be imported."
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"Line {line}: {message}")
+        self.line = line
+
+
+class RecordParser:
+    "Turn lines of NDJSON or CSV into validated schema objects."
+
+    def __init__(self, media_type: str, schema: Type[BaseModel]):
+        if media_type not in MEDIA_TYPES:
+            raise ValueError(
+                f"Unsupported media type '{media_type}'. "
+                f"Use one of {', '.join(MEDIA_TYPES)}."
+            )
+        self.media_type = media_type
+        self.schema = schema
+        self.fieldnames = None
+        self.line = 0
+        # the first line of the current record
+        self.start = 0
+        # the lines of a CSV record ending within a quoted field so far
+        self._pending: List[str] = []
+        self._quotes = 0
+
+    def parse(self, line: str):
+        """Return the schema object for `line`.
+
+        Return None for header and empty lines and for lines ending within a
+        quoted CSV field: their record is returned with its last line.
+        """
+        self.line += 1
+        if not self._pending:
+            self.start = self.line
+        line = line.rstrip("\n")
+        if self.media_type == CSV:
+            # quotes within quoted fields are doubled, so a record is complete
+            # when the number of its quotes is even
+            self._pending.append(line)
+            self._quotes += line.count('"')
+            if self._quotes % 2:
+                return None
+            line = "\n".join(self._pending)
+            self._pending, self._quotes = [], 0
+        line = line.rstrip("\r")
+        if not line.strip():
+            return None
+        try:
+            if self.media_type == NDJSON:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("Each line must contain a JSON object.")
+            else:
+                values = next(csv.reader([line]))
+                if self.fieldnames is None:
+                    self.fieldnames = values
+                    return None
+                if len(values) != len(self.fieldnames):
+                    raise ValueError(
+                        f"Expected {len(self.fieldnames)} fields, got {len(values)}."
+                    )
+                record = dict(zip(self.fieldnames, values))
+            return self.schema(**record)
+        except (ValueError, ValidationError) as err:
+            raise BulkImportError(self.start, f"{err}") from err
+
+    def close(self):
+        "Raise a BulkImportError if the data ended within a quoted CSV field."
+        if self._pending:
+            raise BulkImportError(
+                self.start, "Unexpected end of data in a quoted field."
+            )
+
+
+def iter_batches(
+    lines: Iterable[str], parser: RecordParser, batch_size: int
+) -> Iterator[List[BaseModel]]:
+    "Yield lists of at most `batch_size` schema objects parsed from `lines`."
+    batch = []
+    for line in lines:
+        item = parser.parse(line)
+        if item is not None:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    parser.close()
+    if batch:
+        yield batch
+
+
+async def aiter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    "Yield the lines of the UTF-8 encoded byte stream `chunks`."
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    rest = ""
+    async for chunk in chunks:
+        lines = (rest + decoder.decode(chunk)).split("\n")
+        rest = lines.pop()
+        for line in lines:
+            yield line
+    rest += decoder.decode(b"", final=True)
+    if rest:
+        yield rest
+
+
+async def aiter_batches(
+    chunks: AsyncIterable[bytes], parser: RecordParser, batch_size: int
+) -> AsyncIterator[List[BaseModel]]:
+    "Yield lists of at most `batch_size` schema objects parsed from `chunks`."
+    batch = []
+    async for line in aiter_lines(chunks):
+        item = parser.parse(line)
+        if item is not None:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    parser.close()
+    if batch:
+        yield batch
+
+
+def iter_export(
+    rows: Iterable[Sequence], fieldnames: Sequence[str], media_type: str,
+    batch_size: int,
+) -> Iterator[bytes]:
+    """Yield `rows` encoded as NDJSON or CSV in chunks of `batch_size` lines.
+
+    The values of each row are in the order of `fieldnames`. The CSV chunks
+    start with a header line and can be read by RecordParser again.
+    """
+    if media_type == NDJSON:
+        lines = []
+        for row in rows:
+            lines.append(dumps(dict(zip(fieldnames, row))))
+            if len(lines) >= batch_size:
+                lines.append(b"")
+                yield b"\n".join(lines)
+                lines = []
+        if lines:
+            lines.append(b"")
+            yield b"\n".join(lines)
+        return
+    if media_type != CSV:
+        raise ValueError(f"Unsupported media type '{media_type}'.")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(fieldnames)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count >= batch_size:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
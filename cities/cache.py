@@ -0,0 +1,245 @@
+"""In-process response cache for the detail endpoints.
+
+Responses are cached as serialized JSON together with a strong ETag (a
+hash of the body), keyed by the negotiated media type and the full URL
+with a normalized query string, and evicted least recently used first or
+when older than the TTL. The responses carry ``Vary: Accept``.
+
+Each entry carries tags naming the rows it was built from, e.g.
+``("city", 1)``. The crud functions register the tags of the rows they
+change with `invalidate_on_commit`; the entries are dropped when the
+session commits, so no request after a write sees stale data. With a
+read replica, which might not have the changes yet, responses read within
+``CITIES_REPLICA_MAX_LAG`` seconds after an invalidation are not cached.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .metrics import REGISTRY, Counter
+from .negotiation import JSON
+
+Tag = Tuple[Hashable, ...]
+
+REQUESTS = REGISTRY.register(
+    Counter(
+        "cities_response_cache_requests_total",
+        "Lookups in the response cache by result (hit or miss).",
+        ("result",),
+    )
+)
+EVICTIONS = REGISTRY.register(
+    Counter(
+        "cities_response_cache_evictions_total",
+        "Entries removed from the response cache by reason.",
+        ("reason",),
+    )
+)
+
+INVALIDATIONS = "cache_invalidations"
+# Tag set in INVALIDATIONS which clears the whole cache.
+ALL = ("*",)
+
+
+@dataclass
+class Entry:
+    "A cached response."
+    body: bytes
+    etag: str
+    tags: Set[Tag]
+    expires: float
+
+
+class ResponseCache:
+    "A thread safe LRU cache with TTL and tag based invalidation."
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._keys_by_tag: Dict[Tag, Set[str]] = {}
+        self._lock = threading.Lock()
+        # incremented by every invalidation, see `put`
+        self.generation = 0
+        # time.monotonic() of the last invalidation
+        self.invalidated = float("-inf")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Entry]:
+        "Return the fresh entry for key or None."
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= time.monotonic():
+                self._remove(key)
+                EVICTIONS.inc("expired")
+                entry = None
+            if entry is None:
+                REQUESTS.inc("miss")
+                return None
+            self._entries.move_to_end(key)
+        REQUESTS.inc("hit")
+        return entry
+
+    def put(
+        self, key: str, body: bytes, tags: Iterable[Tag], generation: Optional[int]
+    ) -> Entry:
+        """Add the response body for key and return its entry.
+
+        `generation` is the value of self.generation before the data was read
+        from the database. If anything was invalidated since, the data might
+        be outdated already and is not stored; neither is it if generation
+        is None.
+        """
+        entry = Entry(body, make_etag(body), set(tags), time.monotonic() + self.ttl)
+        if self.maxsize <= 0:
+            return entry
+        with self._lock:
+            if generation != self.generation:
+                return entry
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            for tag in entry.tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                EVICTIONS.inc("size")
+        return entry
+
+    def invalidate(self, tags: Iterable[Tag]):
+        "Remove all entries tagged with any of tags."
+        with self._lock:
+            self.generation += 1
+            self.invalidated = time.monotonic()
+            for tag in tags:
+                for key in self._keys_by_tag.pop(tag, ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        EVICTIONS.inc("invalidated")
+
+    def clear(self):
+        "Remove all entries."
+        with self._lock:
+            self.generation += 1
+            self.invalidated = time.monotonic()
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def _remove(self, key: str):
+        "Remove the entry for key. The lock must be held."
+        entry = self._entries.pop(key)
+        for tag in entry.tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+
+RESPONSE_CACHE = ResponseCache(settings.response_cache_size, settings.response_cache_ttl)
+
+
+def make_etag(body: bytes) -> str:
+    "Return a strong ETag for body."
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def cache_key(request: Request, media_type: str = JSON) -> str:
+    """Return the cache key of request negotiated to media_type.
+
+    The key contains scheme and host, as the responses contain absolute
+    links, and the query parameters in sorted order.
+    """
+    url = request.url
+    query = "&".join(sorted(url.query.split("&"))) if url.query else ""
+    return f"{media_type} {url.scheme}://{url.netloc}{url.path}?{query}"
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    "Return True if the If-None-Match header of request matches etag."
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def respond(request: Request, entry: Entry) -> Response:
+    "Return the response for entry, 304 Not Modified if the client has it."
+    headers = {"ETag": entry.etag, "Vary": "Accept"}
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+
+def lookup(
+    request: Request, media_type: str = JSON
+) -> Tuple[str, Optional[Entry], Optional[int]]:
+    """Look up the response for request negotiated to media_type.
+
+    Return the cache key, the entry (or None) and the cache generation to be
+    passed to `store` if there is no entry.
+    """
+    key = cache_key(request, media_type)
+    generation = RESPONSE_CACHE.generation
+    if settings.replica_url and (
+        time.monotonic() - RESPONSE_CACHE.invalidated < settings.replica_max_lag
+    ):
+        # the replica might not have the changes yet: respond, but do not cache
+        generation = None
+    return key, RESPONSE_CACHE.get(key), generation
+
+
+def store(
+    request: Request,
+    key: str,
+    data: BaseModel,
+    tags: Iterable[Tag],
+    generation: Optional[int],
+) -> Response:
+    "Serialize data, cache it under key and return the response."
+    # pylint: disable=R0913
+    body = JSONResponse(jsonable_encoder(data)).body
+    return respond(request, RESPONSE_CACHE.put(key, body, tags, generation))
+
+
+def invalidate_on_commit(db: Session, tags: Iterable[Tag]):
+    "Remove the entries tagged with any of tags as soon as db commits."
+    db.info.setdefault(INVALIDATIONS, set()).update(tags)
+
+
+def clear_on_commit(db: Session):
+    "Remove all entries as soon as db commits."
+    invalidate_on_commit(db, [ALL])
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session, *_):
+    "Apply the invalidations registered by `invalidate_on_commit`."
+    tags = session.info.pop(INVALIDATIONS, None)
+    if tags and ALL in tags:
+        RESPONSE_CACHE.clear()
+    elif tags:
+        RESPONSE_CACHE.invalidate(tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session, *_):
+    "Nothing changed, so drop the invalidations registered so far."
+    session.info.pop(INVALIDATIONS, None)
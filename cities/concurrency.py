@@ -0,0 +1,21 @@
+"""Helpers to keep blocking database work off the event loop.
+"""
+from typing import Any, Callable, TypeVar
+
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+
+T = TypeVar("T")
+
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Call the blocking database function `func` with args and kwargs.
+
+    The call is run in the thread pool, so a slow query does not stall all
+    other requests handled by the same worker. Set ``CITIES_DB_OFFLOAD=false``
+    to call `func` directly on the event loop.
+    """
+    if settings.db_offload:
+        return await run_in_threadpool(func, *args, **kwargs)
+    return func(*args, **kwargs)
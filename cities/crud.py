@@ -1,9 +1,15 @@
 "CRUD function for Country, County and City."
+from functools import lru_cache
+from typing import List, Tuple
+
 import sqlalchemy
-from sqlalchemy.orm import Session
+from pydantic import BaseModel
+from sqlalchemy.orm import Session, joinedload
 import sqlalchemy.exc
+from sqlalchemy import or_, select, tuple_, union_all
+from sqlalchemy.dialects import postgresql, sqlite
 
-from . import schemas
+from . import cache, schemas, search, stats
 from .models import Country, County, City
 
 
@@ -20,38 +26,230 @@ class ItemNotFoundException(CRUDException):
     "Excepetion raised when object to update does not exist."
 
 
+# Loader options for the detail endpoints. Each tuple eagerly loads everything
+# the corresponding *Details schema serializes, so building the response does
+# not trigger any lazy loads. The embedded counties and cities are not loaded
+# as relationships, which might be huge, but capped with
+# get_counties_of_countries and get_cities_of_counties.
+COUNTRY_DETAILS = ()
+COUNTY_DETAILS = (joinedload(County.country),)
+CITY_DETAILS = (joinedload(City.county).joinedload(County.country),)
+
+# Columns selected by the list functions for the fast serializer (see
+# cities.serialization) instead of whole ORM objects.
+COUNTRY_LIST_COLUMNS = (Country.id, Country.name)
+COUNTY_LIST_COLUMNS = (County.id, County.name)
+CITY_LIST_COLUMNS = (City.id, City.name)
+
+
+# The list functions filter by the name of a parent with a subquery on the
+# foreign key column instead of joining the parent tables. An unfiltered
+# listing thus reads a single table, and a filtered one can use the
+# (county_id, name) and (country_id, name) indexes.
+
+
+def _first_children(
+    db: Session, model, parent_column, parent_ids: List[int], limit: int
+):
+    """Return up to `limit` rows (id, name, parent id) of `model` per parent.
+
+    The rows are returned in lists by parent id, ordered by (name, id) like
+    the listings. Each parent gets its own LIMITed query, all combined
+    into one statement, so the database reads at most `limit` index
+    entries per parent however many children it has.
+    """
+    queries = [
+        select(model.id, model.name, parent_column)
+        .where(parent_column == parent_id)
+        .order_by(model.name, model.id)
+        .limit(limit)
+        .subquery()
+        for parent_id in parent_ids
+    ]
+    children = {parent_id: [] for parent_id in parent_ids}
+    if not queries:
+        return children
+    stmt = union_all(*(select(query) for query in queries)).subquery()
+    rows = db.execute(
+        select(stmt).order_by(stmt.c[parent_column.key], stmt.c.name, stmt.c.id)
+    )
+    for row in rows:
+        children[row[2]].append(row)
+    return children
+
+
+def _country_ids(country_name: str):
+    "Return a subquery selecting the id of the Country named country_name."
+    return select(Country.id).where(Country.name == country_name)
+
+
+def _county_ids(county_name: str = None, country_name: str = None):
+    "Return a subquery selecting the ids of Counties by county and country name."
+    conditions = []
+    if county_name:
+        conditions.append(County.name == county_name)
+    if country_name:
+        conditions.append(County.country_id.in_(_country_ids(country_name)))
+    return select(County.id).where(*conditions)
+
+
+# PUT creates or updates an entry with a single INSERT ... ON CONFLICT(id) DO
+# UPDATE statement instead of loading, changing and flushing an ORM object.
+# The statement is preceded by one SELECT of the columns whose old values are
+# needed to invalidate the cache and to adjust the population statistics;
+# it also tells whether the entry is created or updated. (RETURNING could
+# tell that, too, but not the old values, and SQLAlchemy 1.4 does not
+# support RETURNING with SQLite.)
+
+
+def _upsert_statement(db: Session, model, names: List[str]):
+    """Return an INSERT ... ON CONFLICT(id) DO UPDATE of the columns `names`.
+
+    Rows whose values do not change are not written at all.
+    """
+    return _build_upsert_statement(db.get_bind().dialect.name, model, tuple(names))
+
+
+@lru_cache(maxsize=32)
+def _build_upsert_statement(dialect_name: str, model, names: Tuple[str, ...]):
+    "Build the statement of `_upsert_statement` once, so its compiled form is cached."
+    # a new statement would get new `excluded` columns and be compiled again
+    table = model.__table__
+    dialect = postgresql if dialect_name == "postgresql" else sqlite
+    stmt = dialect.insert(table)
+    names = [name for name in names if name != "id"]
+    changed = [table.c[name].is_distinct_from(stmt.excluded[name]) for name in names]
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.id],
+        set_={name: stmt.excluded[name] for name in names},
+        where=or_(*changed),
+    )
+
+
+def _lock_for_write(db: Session):
+    """Take the write lock of a SQLite database for the rest of the transaction.
+
+    SQLite ignores FOR UPDATE, and pysqlite begins a transaction only with
+    the first change, so another connection could change the rows read
+    before it. BEGIN IMMEDIATE starts the transaction with the write lock.
+    """
+    if db.get_bind().dialect.name != "sqlite":
+        return
+    connection = db.connection()
+    if not connection.connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def _before_image(db: Session, model, item_id: int, columns=()):
+    """Return the row (id, *columns) of the entry item_id or None.
+
+    The row stays as read until the transaction ends: it is locked with
+    SELECT ... FOR UPDATE, or on SQLite with the whole database (see
+    `_lock_for_write`).
+    """
+    _lock_for_write(db)
+    return db.execute(
+        select(model.id, *columns).where(model.id == item_id).with_for_update()
+    ).first()
+
+
+def _get_for_update(db: Session, model, item_id: int):
+    "Return the entry item_id, locked like the row of `_before_image`, or None."
+    _lock_for_write(db)
+    return (
+        db.query(model)
+        .filter(model.id == item_id)
+        .with_for_update()
+        .populate_existing()
+        .first()
+    )
+
+
+def _upsert_one(db: Session, model, item_id: int, values: dict, created: bool):
+    "Create or update the entry item_id with values, raising CRUDExceptions."
+    stmt = _upsert_statement(db, model, list(values))
+    try:
+        db.execute(stmt, {"id": item_id, **values})
+    except sqlalchemy.exc.IntegrityError as err:
+        exception = CreationException if created else UpdateException
+        raise exception(f"Invalid {model.__name__}: {err.orig}") from err
+
+
+def _commit(db: Session, db_obj, commit: bool = True):
+    """Commit db or, if commit is False, only flush it.
+
+    The group commit writer (see cities.writer) commits many updates at
+    once. db_obj is expired instead, so it is reloaded like after a commit.
+    """
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+        db.expire(db_obj)
+
+
+def _check_id(model, item_id: int, body_id: int):
+    "Raise an UpdateException if body_id would change the id of item_id."
+    if body_id and body_id != item_id:
+        raise UpdateException(f"Changing the id of a {model.__name__} is not allowed")
+
+
 ## ----- Countries
 
 
-def get_country(db: Session, country_id: int):
-    "Get Country by id."
-    return db.query(Country).filter(Country.id == country_id).first()
+def get_country(db: Session, country_id: int, options=()):
+    "Get Country by id. `options` are applied as loader options."
+    return db.query(Country).options(*options).filter(Country.id == country_id).first()
 
 
-def get_countries(db: Session, skip: int = 0, limit: int = 100, q=None):
-    "Get list of Countries."
+def get_countries(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    q=None,
+    after: Tuple[str, int] = None,
+    columns=None,
+):
+    """Get list of Countries.
+
+    If `after` is set, the list starts behind the sort key (name, id) `after`.
+    If `columns` are set, rows of these columns are returned instead of
+    Country objects.
+    """
+    # pylint: disable=R0913
     conditions = []
     if q:
-        conditions.append(Country.name.ilike(f"%{q}%"))
+        conditions.append(search.name_contains(db, Country, q))
+    if after:
+        conditions.append(tuple_(Country.name, Country.id) > tuple_(*after))
     return (
-        db.query(Country)
+        db.query(*columns or (Country,))
         .filter(*conditions)
-        .order_by(Country.name)
+        .order_by(Country.name, Country.id)
         .offset(skip)
         .limit(limit)
         .all()
     )
 
 
+def get_countries_by_ids(db: Session, country_ids: List[int], options=()):
+    "Get the Countries with `country_ids` in one query, by id."
+    query = db.query(Country).options(*options).filter(Country.id.in_(country_ids))
+    return {country.id: country for country in query}
+
+
 def get_country_by_name(db: Session, country_name: str):
     "Get Country by name."
     return db.query(Country).filter(Country.name == country_name).first()
 
 
-def create_country(db: Session, country: schemas.CountyCreate, country_id: int = None):
+def create_country(
+    db: Session, country: schemas.CountyCreate, country_id: int = None, options=()
+):
     """Add a new Country.
 
     if country_id is None, database will create the id automatcally.
+    The new Country is loaded using the loader `options`.
     """
     # This is handled by the database anyhow, but we want a nicer error message
     # and avoid a warning from sqlalchemy
@@ -59,92 +257,190 @@ def create_country(db: Session, country: schemas.CountyCreate, country_id: int =
         raise CreationException(f"A country with id '{country_id}' already exists.")
     db_country = Country(name=country.name, id=country_id)
     db.add(db_country)
+    if country_id:
+        cache.invalidate_on_commit(db, [("country", country_id)])
     db.commit()
-    db.refresh(db_country)
-    return db_country
+    return get_country(db, db_country.id, options)
 
 
-def update_country(db: Session, country_id: int, country_name=None):
-    """Update an existing Country."""
+def update_country(
+    db: Session, country_id: int, country_name=None, options=(), commit=True
+):
+    """Update an existing Country.
+
+    The updated Country is loaded using the loader `options`. If commit is
+    False, the change is only flushed.
+    """
     db_country = get_country(db, country_id)
     if db_country:
         if country_name:
             db_country.name = country_name
-            db.commit()
-            db.refresh(db_country)
+            cache.invalidate_on_commit(db, [("country", country_id)])
+            _commit(db, db_country, commit)
     else:
         raise ItemNotFoundException(f"Country with id {country_id} does not exist.")
-    return db_country
+    return get_country(db, country_id, options)
+
+
+def upsert_country(
+    db: Session, country_id: int, country: schemas.CountryCreate, options=()
+) -> Tuple[Country, bool]:
+    """Create or update the Country country_id with a single statement.
+
+    Return the Country, loaded using the loader `options`, and whether it
+    was created.
+    """
+    created = _before_image(db, Country, country_id) is None
+    if not created:
+        _check_id(Country, country_id, country.id)
+    _upsert_one(db, Country, country_id, {"name": country.name}, created)
+    cache.invalidate_on_commit(db, [("country", country_id)])
+    db.commit()
+    return get_country(db, country_id, options), created
 
 
 ## ------ Counties ----------------
 
 
-def get_county(db: Session, county_id: int):
-    "Get County by id."
-    return db.query(County).filter(County.id == county_id).first()
+def get_county(db: Session, county_id: int, options=()):
+    "Get County by id. `options` are applied as loader options."
+    return db.query(County).options(*options).filter(County.id == county_id).first()
 
 
-def get_counties(db: Session, skip: int = 0, limit: int = 100, q=None, country=None):
-    "Get a list of countries."
+def get_counties(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    q=None,
+    country=None,
+    after: Tuple[str, int] = None,
+    columns=None,
+    country_id: int = None,
+):
+    """Get a list of countries.
+
+    If `after` is set, the list starts behind the sort key (name, id) `after`.
+    If `columns` are set, rows of these columns are returned instead of
+    County objects.
+    """
+    # pylint: disable=R0913
     conditions = []
     if q:
-        conditions.append(County.name.ilike(f"%{q}%"))
+        conditions.append(search.name_contains(db, County, q))
     if country:
-        conditions.append(Country.name == country)
+        conditions.append(County.country_id.in_(_country_ids(country)))
+    if country_id is not None:
+        conditions.append(County.country_id == country_id)
+    if after:
+        conditions.append(tuple_(County.name, County.id) > tuple_(*after))
     return (
-        db.query(County)
-        .join(Country)
+        db.query(*columns or (County,))
         .filter(*conditions)
-        .order_by(County.name)
+        .order_by(County.name, County.id)
         .offset(skip)
         .limit(limit)
         .all()
     )
 
 
+def get_counties_by_ids(db: Session, county_ids: List[int], options=()):
+    "Get the Counties with `county_ids` in one query, by id."
+    query = db.query(County).options(*options).filter(County.id.in_(county_ids))
+    return {county.id: county for county in query}
+
+
+def get_counties_of_countries(db: Session, country_ids: List[int], limit: int):
+    """Return the first `limit` Counties (id, name) of each country by country id.
+
+    The Counties are ordered like the listing of Counties.
+    """
+    return _first_children(db, County, County.country_id, country_ids, limit)
+
+
 def get_county_by_name(db: Session, county_name: str):
     "Find County by county name."
     return db.query(County).filter(County.name == county_name).first()
 
 
-def create_county(db: Session, county: schemas.CountyCreate, county_id=None):
-    "Create a new county."
+def create_county(
+    db: Session, county: schemas.CountyCreate, county_id=None, options=()
+):
+    "Create a new county, which is returned loaded using the loader `options`."
     # This is handled by the database anyhow, but we want a nicer error message
     # and avoid a warning from sqlalchemy
     if county_id and get_county(db, county_id):
         raise CreationException(f"A county with id '{county_id}' already exists.")
     db_county = County(id=county_id, name=county.name, country_id=county.country_id)
     db.add(db_county)
+    cache.invalidate_on_commit(db, [("country_counties", county.country_id)])
     db.commit()
-    db.refresh(db_county)
-    return db_county
+    return get_county(db, db_county.id, options)
 
 
-def update_county(db: Session, county_id: int, county_name: str = None, country_id: int = None):
-    "Create a new or update an exisisting County."
+def update_county(
+    db: Session,
+    county_id: int,
+    county_name: str = None,
+    country_id: int = None,
+    options=(),
+    commit=True,
+):
+    """Create a new or update an exisisting County.
+
+    The updated County is loaded using the loader `options`. If commit is
+    False, the changes are only flushed.
+    """
+    # pylint: disable=R0913
     db_county = get_county(db, county_id)
     if db_county:
+        cache.invalidate_on_commit(
+            db,
+            [
+                ("county", county_id),
+                ("country_counties", db_county.country_id),
+                ("country_counties", country_id),
+            ],
+        )
         if county_name:
             db_county.name = county_name
         if country_id:
             db_county.country_id = country_id
         try:
-            db.commit()
-            db.refresh(db_county)
-            return db_county
+            _commit(db, db_county, commit)
+            return get_county(db, county_id, options)
         except sqlalchemy.exc.IntegrityError as err:
             raise UpdateException(f"There is no country with id {country_id}.") from err
     else:
         raise ItemNotFoundException(f"County with id {county_id} does not exist.")
 
 
+def upsert_county(
+    db: Session, county_id: int, county: schemas.CountyCreate, options=()
+) -> Tuple[County, bool]:
+    """Create or update the County county_id with a single statement.
+
+    Return the County, loaded using the loader `options`, and whether it
+    was created.
+    """
+    old = _before_image(db, County, county_id, (County.country_id,))
+    if old:
+        _check_id(County, county_id, county.id)
+    values = {"name": county.name, "country_id": county.country_id}
+    _upsert_one(db, County, county_id, values, old is None)
+    tags = [("county", county_id), ("country_counties", county.country_id)]
+    if old:
+        tags.append(("country_counties", old.country_id))
+    cache.invalidate_on_commit(db, tags)
+    db.commit()
+    return get_county(db, county_id, options), old is None
+
+
 ## ----- cities ----
 
 
-def get_city(db: Session, city_id: int):
-    "Get City by id."
-    return db.query(City).filter(City.id == city_id).first()
+def get_city(db: Session, city_id: int, options=()):
+    "Get City by id. `options` are applied as loader options."
+    return db.query(City).options(*options).filter(City.id == city_id).first()
 
 
 def get_cities(
@@ -156,6 +452,9 @@ def get_cities(
     maxpop: int = None,
     county: int = None,
     country: int = None,
+    after: Tuple[str, int] = None,
+    columns=None,
+    county_id: int = None,
 ):
     """Get a list of cities.
 
@@ -168,23 +467,27 @@ def get_cities(
     :param maxpop: Filter cities for a maximal population
     :param county: Filter search for cities located in county
     :param country: Filter search for cities located in country
+    :param after: Start the list behind this sort key (name, id)
+    :param columns: Return rows of these columns instead of City objects
+    :param county_id: Filter search for cities located in the county with this id
     """
+    # pylint: disable=R0913
     conditions = []
     if q:
-        conditions.append(City.name.ilike(f"%{q}%"))
+        conditions.append(search.name_contains(db, City, q))
     if minpop:
         conditions.append(City.population >= minpop)
     if maxpop:
         conditions.append(City.population <= maxpop)
-    if county:
-        conditions.append(County.name == county)
-    if country:
-        conditions.append(Country.name == country)
+    if county or country:
+        conditions.append(City.county_id.in_(_county_ids(county, country)))
+    if county_id is not None:
+        conditions.append(City.county_id == county_id)
+    if after:
+        conditions.append(tuple_(City.name, City.id) > tuple_(*after))
     return (
-        db.query(City)
-        .join(County)
-        .join(Country)
-        .order_by(City.name)
+        db.query(*columns or (City,))
+        .order_by(City.name, City.id)
         .filter(*conditions)
         .offset(skip)
         .limit(limit)
@@ -192,6 +495,20 @@ def get_cities(
     )
 
 
+def get_cities_by_ids(db: Session, city_ids: List[int], options=()):
+    "Get the Cities with `city_ids` in one query, by id."
+    query = db.query(City).options(*options).filter(City.id.in_(city_ids))
+    return {city.id: city for city in query}
+
+
+def get_cities_of_counties(db: Session, county_ids: List[int], limit: int):
+    """Return the first `limit` Cities (id, name) of each county by county id.
+
+    The Cities are ordered like the listing of Cities.
+    """
+    return _first_children(db, City, City.county_id, county_ids, limit)
+
+
 def get_city_by_name(db: Session, city_name: str):
     "Get City with name city_name."
     return db.query(City).filter(City.name == city_name).first()
@@ -199,8 +516,11 @@ def get_city_by_name(db: Session, city_name: str):
 
 
 
-def create_city(db: Session, city: schemas.CityCreate, city_id=None):
-    "Create a new City. Id will be chosen by data base if None."
+def create_city(db: Session, city: schemas.CityCreate, city_id=None, options=()):
+    """Create a new City. Id will be chosen by data base if None.
+
+    The new City is loaded using the loader `options`.
+    """
     # This is handled by the database anyhow, but we want a nicer error message
     # and avoid a warning from sqlalchemy
     if city_id and get_city(db, city_id):
@@ -209,9 +529,11 @@ def create_city(db: Session, city: schemas.CityCreate, city_id=None):
         name=city.name, population=city.population, county_id=city.county_id, id=city_id
     )
     db.add(db_city)
+    cache.invalidate_on_commit(db, [("county_cities", city.county_id)])
+    db.flush()
+    stats.add_city(db, db_city.county_id, db_city.population)
     db.commit()
-    db.refresh(db_city)
-    return db_city
+    return get_city(db, db_city.id, options)
 
 
 def update_city(
@@ -220,10 +542,27 @@ def update_city(
     city_name: str = None,
     population: int = -1,  # we might want to set it to None
     county_id: int = None,
+    options=(),
+    commit=True,
 ):
-    "Update an existing City."
-    db_city = get_city(db, city_id)
+    """Update an existing City.
+
+    The updated City is loaded using the loader `options`. If commit is
+    False, the changes are only flushed.
+    """
+    # pylint: disable=R0913
+    # locked, so the statistics are adjusted by the values actually replaced
+    db_city = _get_for_update(db, City, city_id)
     if db_city:
+        cache.invalidate_on_commit(
+            db,
+            [
+                ("city", city_id),
+                ("county_cities", db_city.county_id),
+                ("county_cities", county_id),
+            ],
+        )
+        old_stats = (db_city.county_id, db_city.population)
         if city_name:
             db_city.name = city_name
         if population > -1:
@@ -231,19 +570,132 @@ def update_city(
         if county_id:
             db_city.county_id = county_id
         try:
-            db.commit()
-            db.refresh(db_city)
-            return db_city
+            db.flush()
+            if (db_city.county_id, db_city.population) != old_stats:
+                stats.remove_city(db, *old_stats)
+                stats.add_city(db, db_city.county_id, db_city.population)
+            _commit(db, db_city, commit)
+            return get_city(db, city_id, options)
         except sqlalchemy.exc.IntegrityError as err:
             raise UpdateException(f"There is no county with id {county_id}.") from err
     else:
         raise ItemNotFoundException(f"City with id {city_id} does not exist.")
 
 
+def upsert_city(
+    db: Session, city_id: int, city: schemas.CityCreate, options=()
+) -> Tuple[City, bool]:
+    """Create or update the City city_id with a single statement.
+
+    Return the City, loaded using the loader `options`, and whether it
+    was created.
+    """
+    old = _before_image(db, City, city_id, (City.county_id, City.population))
+    if old:
+        _check_id(City, city_id, city.id)
+    values = {
+        "name": city.name,
+        "population": city.population,
+        "county_id": city.county_id,
+    }
+    _upsert_one(db, City, city_id, values, old is None)
+    tags = [("city", city_id), ("county_cities", city.county_id)]
+    if old is None:
+        stats.add_city(db, city.county_id, city.population)
+    else:
+        tags.append(("county_cities", old.county_id))
+        if (old.county_id, old.population) != (city.county_id, city.population):
+            stats.remove_city(db, old.county_id, old.population)
+            stats.add_city(db, city.county_id, city.population)
+    cache.invalidate_on_commit(db, tags)
+    db.commit()
+    return get_city(db, city_id, options), old is None
+
+
 def delete_city(db: Session, city_id: int):
     "Delete city with id city_id."
-    db_city = get_city(db, city_id)
+    db_city = _get_for_update(db, City, city_id)
     if db_city:
+        cache.invalidate_on_commit(
+            db, [("city", city_id), ("county_cities", db_city.county_id)]
+        )
         db.delete(db_city)
+        db.flush()
+        stats.remove_city(db, db_city.county_id, db_city.population)
         db.commit()
     return db_city
+
+
+def get_population_stats(db: Session, county_id: int = None, country_id: int = None):
+    """Return the population statistics of a county, a country or all cities.
+
+    See `stats.population_stats`.
+    """
+    return stats.population_stats(db, county_id=county_id, country_id=country_id)
+
+
+## ----- bulk imports and exports
+
+
+# Columns of the exports, the same fields as used by the bulk imports.
+COUNTRY_EXPORT_COLUMNS = (Country.id, Country.name)
+COUNTY_EXPORT_COLUMNS = (County.id, County.name, County.country_id)
+CITY_EXPORT_COLUMNS = (City.id, City.name, City.population, City.county_id)
+
+
+def iter_rows(db: Session, columns, batch_size: int = 1000):
+    """Return an iterator over the rows of `columns` ordered by the first column.
+
+    The rows are fetched `batch_size` at a time with a server side cursor
+    where the database supports it, so the whole table can be read in
+    constant memory.
+    """
+    return (
+        db.query(*columns)
+        .order_by(columns[0])
+        .yield_per(batch_size)
+    )
+
+
+def _upsert(db: Session, model, items: List[BaseModel]) -> int:
+    """Insert `items` into the table of `model` with a single executemany.
+
+    Rows with an existing id are updated instead (INSERT ... ON CONFLICT).
+    """
+    rows = [item.dict() for item in items]
+    if any(row["id"] is None for row in rows):
+        raise CreationException(
+            f"Every {model.__name__} needs an id for a bulk import."
+        )
+    db.execute(_upsert_statement(db, model, list(rows[0])), rows)
+    cache.clear_on_commit(db)
+    return len(rows)
+
+
+def upsert_countries(db: Session, countries: List[schemas.CountryCreate]) -> int:
+    """Create or update a batch of Countries. Return the number of Countries.
+
+    Unlike the other functions, this does not commit, so many batches can
+    be imported in one transaction.
+    """
+    return _upsert(db, Country, countries)
+
+
+def upsert_counties(db: Session, counties: List[schemas.CountyCreate]) -> int:
+    """Create or update a batch of Counties. Return the number of Counties.
+
+    Unlike the other functions, this does not commit, so many batches can
+    be imported in one transaction.
+    """
+    return _upsert(db, County, counties)
+
+
+def upsert_cities(db: Session, cities: List[schemas.CityCreate]) -> int:
+    """Create or update a batch of Cities. Return the number of Cities.
+
+    Unlike the other functions, this does not commit, so many batches can
+    be imported in one transaction. The population statistics are
+    recomputed once when the transaction commits.
+    """
+    stats.rebuild_on_commit(db)
+    return _upsert(db, City, cities)
@@ -1,12 +1,35 @@
 """Function used in dependency injections.
 """
-from . database import SessionLocal
+from . database import ReadSessionLocal, SessionLocal
 
 
 def get_db():
-    "Function used for dependency injection of db connection."
+    """Function used for dependency injection of db connection.
+
+    FastAPI caches dependencies per request, so all consumers of `get_db`
+    within a request share one session. Declare it only on handlers which
+    actually need the database: handlers like the OPTIONS endpoints then
+    never create a session at all.
+
+    The session is lazy: it checks out a connection from the pool on the
+    first query and returns it when it is closed after the request.
+    """
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    """Function used for dependency injection of a read only db connection.
+
+    Like `get_db`, but the session is bound to the read replica if one is
+    configured (settings.replica_url). Use it only for handlers which never
+    write: a replica may lag behind the primary database.
+    """
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,266 @@
+"""Resized and transcoded variants of the country images.
+
+``GET /countries/{id}?w=64`` scales a country image down to a width of 64
+pixels; with ``Accept: image/webp`` (or ``image/avif``) it is transcoded,
+too. The variants are rendered with Pillow, which is optional (``pip
+install Pillow``), in a pool of ``CITIES_IMAGE_WORKERS`` processes, so the
+event loop and the threads serving other requests are not blocked.
+
+Each rendered variant is written to a directory bounded to
+``CITIES_IMAGE_CACHE_SIZE`` bytes, evicting the least recently used files
+first. The files are named after (id, width, format) and the ETag of the
+original, so repeat requests are served as static files and a replaced
+original is rendered anew. Without Pillow the width is ignored and only
+the original images are available.
+
+Several server processes may share the directory, but each of them
+bounds only the files it knows of: the directory can grow up to
+``CITIES_IMAGE_CACHE_SIZE`` per process. A file evicted by another
+process is rendered again.
+"""
+import asyncio
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+from . import images
+from .cache import etag_matches, make_etag
+from .config import settings
+
+try:
+    from PIL import Image as PILImage
+except ImportError:  # pragma: no cover
+    PILImage = None
+
+# Pillow format by media type
+FORMATS = {
+    "image/png": "PNG",
+    "image/jpeg": "JPEG",
+    "image/gif": "GIF",
+    "image/webp": "WEBP",
+    "image/avif": "AVIF",
+}
+EXTENSIONS = {"PNG": "png", "JPEG": "jpg", "GIF": "gif", "WEBP": "webp", "AVIF": "avif"}
+# rendered from the first of these originals which exists
+SOURCES = ("image/png", "image/jpeg", "image/gif")
+
+
+def writable_media_types() -> Tuple[str, ...]:
+    "Return the media types of FORMATS Pillow can write."
+    if PILImage is None:
+        return ()
+    PILImage.init()
+    return tuple(
+        media_type for media_type, fmt in FORMATS.items() if fmt in PILImage.SAVE
+    )
+
+
+RENDERABLE = writable_media_types()
+# media types offered only as derivatives
+TRANSCODED = tuple(
+    media_type for media_type in RENDERABLE if media_type not in SOURCES
+)
+
+
+def render(source: str, fmt: str, width: Optional[int]) -> bytes:
+    """Return the image file source as fmt, scaled down to width.
+
+    The aspect ratio is kept, images are never scaled up.
+    """
+    with PILImage.open(source) as image:
+        image.load()
+    if width and width < image.width:
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), PILImage.LANCZOS)
+    if fmt == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    elif fmt in ("WEBP", "AVIF") and image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+    output = io.BytesIO()
+    image.save(output, fmt)
+    return output.getvalue()
+
+
+class DiskCache:
+    """Files in a directory bounded in total size.
+
+    The least recently used files are removed first. Files already in
+    the directory are taken over, oldest first.
+    """
+
+    def __init__(self, directory: str, maxsize: int):
+        self.directory = directory
+        self.maxsize = maxsize
+        self.size = 0
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        entries = [entry for entry in os.scandir(directory) if entry.is_file()]
+        for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+            if not entry.name.startswith("."):
+                self._files[entry.name] = entry.stat().st_size
+                self.size += entry.stat().st_size
+        with self._lock:
+            self._evict()
+
+    def path(self, name: str) -> str:
+        "Return the path of the file name."
+        return os.path.join(self.directory, name)
+
+    def get(self, name: str) -> Optional[str]:
+        """Return the path of the cached file name or None.
+
+        Files removed by another process sharing the directory are dropped.
+        """
+        with self._lock:
+            if name not in self._files:
+                return None
+            if not os.path.exists(self.path(name)):
+                self.size -= self._files.pop(name)
+                return None
+            self._files.move_to_end(name)
+        return self.path(name)
+
+    def put(self, name: str, data: bytes) -> str:
+        "Store data as file name and return its path."
+        # written under a temporary name, so readers never see partial files
+        with tempfile.NamedTemporaryFile(
+            dir=self.directory, prefix=".", delete=False
+        ) as file:
+            file.write(data)
+        os.replace(file.name, self.path(name))
+        with self._lock:
+            self.size += len(data) - self._files.pop(name, 0)
+            self._files[name] = len(data)
+            self._evict()
+        return self.path(name)
+
+    def _evict(self):
+        "Remove files until the size limit is met. The lock must be held."
+        while self.size > self.maxsize and self._files:
+            name, size = self._files.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(self.path(name))
+            except FileNotFoundError:
+                pass
+
+
+CACHE: Optional[DiskCache] = None
+# held while CACHE is created, which happens in the threads of the event loop
+_cache_lock = threading.Lock()
+_POOL: Optional[ProcessPoolExecutor] = None
+# renderings in progress by file name, so each variant is rendered once
+_pending: Dict[str, "asyncio.Future[str]"] = {}
+
+
+def disk_cache() -> DiskCache:
+    "Return the cache of the derivatives, which is created on first use."
+    global CACHE  # pylint: disable=W0603
+    with _cache_lock:
+        if CACHE is None:
+            directory = settings.image_cache_dir or os.path.join(
+                tempfile.gettempdir(), "cities-images"
+            )
+            CACHE = DiskCache(directory, settings.image_cache_size)
+    return CACHE
+
+
+def pool() -> ProcessPoolExecutor:
+    "Return the process pool rendering the derivatives."
+    global _POOL  # pylint: disable=W0603
+    if _POOL is None:
+        _POOL = ProcessPoolExecutor(
+            max_workers=settings.image_workers, mp_context=get_context("spawn")
+        )
+    return _POOL
+
+
+def drop_pool(executor: ProcessPoolExecutor):
+    "Shut down the broken executor, so the next rendering starts a new pool."
+    global _POOL  # pylint: disable=W0603
+    if _POOL is executor:
+        _POOL = None
+    executor.shutdown(wait=False)
+
+
+def file_name(
+    country_id: int, source: images.Image, fmt: str, width: Optional[int]
+) -> str:
+    "Return the name of the file of a derivative of source."
+    digest = source.etag.strip('"')[:16]
+    return f"{country_id}-{width or 0}-{digest}.{EXTENSIONS[fmt]}"
+
+
+async def derivative(source: images.Image, name: str, fmt: str, width) -> str:
+    """Return the path of the derivative name, rendering it if necessary.
+
+    The file system is accessed in the thread pool of the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    cache = await loop.run_in_executor(None, disk_cache)
+    path = await loop.run_in_executor(None, cache.get, name)
+    if path is not None:
+        return path
+    future = _pending.get(name)
+    if future is None:
+        future = _pending[name] = loop.create_future()
+        executor = pool()
+        try:
+            data = await loop.run_in_executor(executor, render, source.path, fmt, width)
+            future.set_result(await loop.run_in_executor(None, cache.put, name, data))
+        except BrokenProcessPool as err:
+            # e.g. a worker was killed, the pool does not recover from that
+            drop_pool(executor)
+            future.set_exception(err)
+        except Exception as err:  # pylint: disable=W0703
+            future.set_exception(err)
+        finally:
+            del _pending[name]
+            # e.g. the request was cancelled, the others waiting must not hang
+            if not future.done():
+                future.set_exception(RuntimeError("The rendering was aborted."))
+    return await asyncio.shield(future)
+
+
+async def respond(
+    request: Request, country_id: int, media_type: str, width: Optional[int]
+) -> Response:
+    """Return the image of country_id as media_type scaled down to width.
+
+    Raise a 404 if there is no such image.
+    """
+    original = images.IMAGES.get((country_id, media_type))
+    if media_type not in RENDERABLE or (original and not width):
+        # SVGs scale by themselves, without Pillow only originals are available
+        if original is None:
+            raise HTTPException(status_code=404, detail="No such image")
+        return images.respond(request, original)
+    source = original or next(
+        (
+            images.IMAGES[country_id, source_type]
+            for source_type in SOURCES
+            if (country_id, source_type) in images.IMAGES
+        ),
+        None,
+    )
+    if source is None:
+        raise HTTPException(status_code=404, detail="No such image")
+    fmt = FORMATS[media_type]
+    name = file_name(country_id, source, fmt, width)
+    etag = make_etag(f"{source.etag}/{name}".encode())
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    path = await derivative(source, name, fmt, width)
+    return FileResponse(
+        path, media_type=media_type, headers={"ETag": etag}, method=request.method
+    )
@@ -0,0 +1,80 @@
+"""Detail responses of Counties and Countries with capped nested collections.
+
+A county can have any number of cities, so `CountyDetails` embeds only the
+first ``CITIES_EMBED_LIMIT`` cities, loaded with a LIMITed query, and
+links to the listing of the others (``/cities/?county_id=...&after=...``).
+The same goes for the counties of a `CountryDetails`. With ``embed=``
+clients can opt out of the nested collections entirely.
+
+The functions are blocking; call them with `run_db`.
+"""
+from typing import Dict, List, Tuple
+
+from fastapi import Request
+from sqlalchemy.orm import Session
+
+from . import crud, models, schemas
+from .config import settings
+
+COUNTRY_EMBEDDABLE = ("counties",)
+COUNTY_EMBEDDABLE = ("cities",)
+
+
+def county_details(
+    request: Request,
+    db: Session,
+    db_county: models.County,
+    embed: Tuple[str, ...] = COUNTY_EMBEDDABLE,
+) -> schemas.CountyDetails:
+    "Return the CountyDetails of db_county embedding the collections in embed."
+    return counties_details(request, db, [db_county], embed)[db_county.id]
+
+
+def counties_details(
+    request: Request,
+    db: Session,
+    db_counties: List[models.County],
+    embed: Tuple[str, ...] = COUNTY_EMBEDDABLE,
+) -> Dict[int, schemas.CountyDetails]:
+    "Return the CountyDetails of db_counties by id, their cities in one query."
+    limit = settings.embed_limit
+    county_ids = [db_county.id for db_county in db_counties]
+    cities = {}
+    if "cities" in embed:
+        cities = crud.get_cities_of_counties(db, county_ids, limit + 1)
+    return {
+        db_county.id: schemas.CountyDetails.from_model(
+            request, db_county, cities.get(db_county.id), limit
+        )
+        for db_county in db_counties
+    }
+
+
+def country_details(
+    request: Request,
+    db: Session,
+    db_country: models.Country,
+    embed: Tuple[str, ...] = COUNTRY_EMBEDDABLE,
+) -> schemas.CountryDetails:
+    "Return the CountryDetails of db_country embedding the collections in embed."
+    return countries_details(request, db, [db_country], embed)[db_country.id]
+
+
+def countries_details(
+    request: Request,
+    db: Session,
+    db_countries: List[models.Country],
+    embed: Tuple[str, ...] = COUNTRY_EMBEDDABLE,
+) -> Dict[int, schemas.CountryDetails]:
+    "Return the CountryDetails of db_countries by id, their counties in one query."
+    limit = settings.embed_limit
+    country_ids = [db_country.id for db_country in db_countries]
+    counties = {}
+    if "counties" in embed:
+        counties = crud.get_counties_of_countries(db, country_ids, limit + 1)
+    return {
+        db_country.id: schemas.CountryDetails.from_model(
+            request, db_country, counties.get(db_country.id), limit
+        )
+        for db_country in db_countries
+    }
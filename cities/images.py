@@ -0,0 +1,89 @@
+"""In-memory index of the country images in cities/data.
+
+The images are static files, so they are read once when the module is
+imported: `IMAGES` maps ``(country_id, media_type)`` to an `Image` with
+the body and the precomputed ETag, Last-Modified and Content-Length
+headers. Image requests are answered from memory without touching the
+file system, including 304 responses for conditional requests.
+"""
+import os
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Tuple
+
+from fastapi import Request, Response
+
+from .cache import etag_matches, make_etag
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "data"))
+
+# media type by file extension
+MEDIA_TYPES = {
+    "svg": "image/svg+xml",
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "gif": "image/gif",
+}
+
+
+@dataclass(frozen=True)
+class Image:
+    "A country image with the headers of its responses."
+    path: str
+    body: bytes
+    media_type: str
+    etag: str
+    last_modified: str
+    mtime: int
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        "The caching headers of responses for the image."
+        return {"ETag": self.etag, "Last-Modified": self.last_modified}
+
+
+def load_images(directory: str) -> Dict[Tuple[int, str], Image]:
+    "Return the images named ``<country_id>.<extension>`` in directory."
+    images = {}
+    for entry in os.scandir(directory):
+        stem, _, extension = entry.name.partition(".")
+        if not stem.isdigit() or extension not in MEDIA_TYPES:
+            continue
+        with open(entry.path, "rb") as file:
+            body = file.read()
+        mtime = int(entry.stat().st_mtime)
+        images[int(stem), MEDIA_TYPES[extension]] = Image(
+            path=entry.path,
+            body=body,
+            media_type=MEDIA_TYPES[extension],
+            etag=make_etag(body),
+            last_modified=formatdate(mtime, usegmt=True),
+            mtime=mtime,
+        )
+    return images
+
+
+IMAGES = load_images(DATA_DIR)
+
+
+def not_modified(request: Request, image: Image) -> bool:
+    """Return True if the client has the current version of image.
+
+    If-Modified-Since is only used without If-None-Match (RFC 7232).
+    """
+    if "if-none-match" in request.headers:
+        return etag_matches(request, image.etag)
+    since = request.headers.get("if-modified-since")
+    if since:
+        try:
+            return image.mtime <= parsedate_to_datetime(since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def respond(request: Request, image: Image) -> Response:
+    "Return the response for image, 304 Not Modified if the client has it."
+    if not_modified(request, image):
+        return Response(status_code=304, headers=image.headers)
+    return Response(image.body, media_type=image.media_type, headers=image.headers)
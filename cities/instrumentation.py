@@ -0,0 +1,163 @@
+"""Request and database metrics.
+
+`MetricsMiddleware` records latency, response size and the number of SQL
+statements of each request, labelled with the route template (like
+``/cities/{city_id}``) rather than the path, so the number of label values
+stays small. `instrument_engine` times every SQL statement of an engine and
+exports the state of its connection pool.
+
+Everything is rendered by the /metrics endpoint. The bookkeeping is a few
+dict lookups and additions per request and statement; set
+``CITIES_METRICS_ENABLED=false`` to skip it altogether.
+"""
+import contextvars
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from .config import settings
+from .metrics import REGISTRY, Gauge, Histogram
+
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+UNMATCHED = "<unmatched>"
+
+REQUEST_DURATION = REGISTRY.register(
+    Histogram(
+        "cities_http_request_duration_seconds",
+        "Time spent handling a request.",
+        ("method", "route", "status"),
+    )
+)
+RESPONSE_SIZE = REGISTRY.register(
+    Histogram(
+        "cities_http_response_size_bytes",
+        "Size of the response bodies.",
+        ("method", "route"),
+        buckets=SIZE_BUCKETS,
+    )
+)
+REQUEST_STATEMENTS = REGISTRY.register(
+    Histogram(
+        "cities_http_request_sql_statements",
+        "Number of SQL statements executed per request.",
+        ("method", "route"),
+        buckets=COUNT_BUCKETS,
+    )
+)
+STATEMENT_DURATION = REGISTRY.register(
+    Histogram(
+        "cities_db_statement_duration_seconds",
+        "Time spent executing a SQL statement.",
+        ("engine",),
+    )
+)
+
+# the number of statements of the current request, see MetricsMiddleware
+_statements: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar(
+    "statements", default=None
+)
+_pools: Dict[str, QueuePool] = {}
+
+IN_FLIGHT = REGISTRY.register(
+    Gauge("cities_http_requests_in_flight", "Number of requests currently handled.")
+)
+
+
+def _pool_connections():
+    "Return the number of connections per engine and state."
+    rv = {}
+    for name, pool in _pools.items():
+        rv[(name, "checked_out")] = pool.checkedout()
+        rv[(name, "idle")] = pool.checkedin()
+        rv[(name, "overflow")] = max(pool.overflow(), 0)
+    return rv
+
+
+REGISTRY.register(
+    Gauge(
+        "cities_db_pool_connections",
+        "Connections of the pool by state.",
+        _pool_connections,
+        ("engine", "state"),
+    )
+)
+
+
+def instrument_engine(engine: Engine, name: str):
+    "Record the statement durations and pool state of engine as `name`."
+    if isinstance(engine.pool, QueuePool):
+        _pools[name] = engine.pool
+    if not settings.metrics_enabled:
+        return
+
+    # A connection executes one statement at a time, so a single start time
+    # per connection is enough.
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, *_):
+        conn.info["statement_start"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, *_):
+        STATEMENT_DURATION.observe(
+            time.perf_counter() - conn.info["statement_start"], name
+        )
+        counter = _statements.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+class MetricsMiddleware:
+    "ASGI middleware recording the metrics of each http request."
+    # pylint: disable=R0903
+
+    def __init__(self, app):
+        self.app = app
+        self.routes = {}
+
+    def route(self, scope) -> str:
+        "Return the path template of the route which handled the request."
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED
+        path = self.routes.get(endpoint)
+        if path is None:
+            for route in scope["router"].routes:
+                self.routes.setdefault(getattr(route, "endpoint", None), route.path)
+            path = self.routes.get(endpoint, UNMATCHED)
+        return path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.metrics_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        statements = [0]
+        token = _statements.set(statements)
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            IN_FLIGHT.dec()
+            _statements.reset(token)
+            method = scope["method"]
+            route = self.route(scope)
+            REQUEST_DURATION.observe(duration, method, route, str(status))
+            RESPONSE_SIZE.observe(size, method, route)
+            REQUEST_STATEMENTS.observe(statements[0], method, route)
@@ -0,0 +1,190 @@
+"""Invalidation of the response caches of all server processes.
+
+Each server process has its own response cache (see cache.py), which the
+writes through this process invalidate. With several worker processes
+(see serve.py), a write must invalidate the caches of the others, too.
+If ``CITIES_CACHE_SYNC_INTERVAL`` is set:
+
+* Every transaction invalidating cache tags inserts them as a row into
+  `cache_invalidations`, so they are committed together with the change.
+* A thread of each process checks every ``CITIES_CACHE_SYNC_INTERVAL``
+  seconds whether another connection committed to the database. With
+  SQLite, ``PRAGMA data_version`` tells that without reading the
+  database. Only then the rows added since the last check are read and
+  their tags invalidated.
+
+The rows are read by id. Without the single writer of SQLite, a row with
+a lower id can commit after one with a higher id, so the ids skipped by a
+check are read again by the following checks for `RETENTION` / 2
+seconds; an id still missing then was rolled back.
+
+A commit without new rows is a write by another client of the database,
+so the whole cache is cleared. Rows older than `RETENTION` seconds are
+deleted now and then by the writers; a process which did not check for
+half that time clears its whole cache, too. No service besides the
+database is needed.
+"""
+import json
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import event, func, insert, or_, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from . import cache
+from .config import settings
+from .metrics import REGISTRY, Counter
+from .models import CacheInvalidation
+
+TABLE = CacheInvalidation.__table__
+RETENTION = 60.0
+# delete the expired rows with every PRUNE_EVERY-th row
+PRUNE_EVERY = 100
+
+CHECKS = REGISTRY.register(
+    Counter(
+        "cities_cache_sync_checks_total",
+        "Checks for writes of other processes by result "
+        "(unchanged, invalidated, cleared or error).",
+        ("result",),
+    )
+)
+
+
+@event.listens_for(Session, "before_commit")
+def _record_before_commit(session):
+    "Insert the tags registered by `cache.invalidate_on_commit` into TABLE."
+    if not settings.cache_sync_interval:
+        return
+    tags = session.info.get(cache.INVALIDATIONS)
+    if not tags:
+        return
+    now = time.time()
+    result = session.execute(
+        insert(TABLE).values(tags=json.dumps(sorted(tags, key=repr)), created=now)
+    )
+    if result.inserted_primary_key[0] % PRUNE_EVERY == 0:
+        session.execute(TABLE.delete().where(TABLE.c.created < now - RETENTION))
+
+
+class Poller:
+    "Apply the invalidations committed by other processes to a response cache."
+
+    def __init__(self, engine: Engine, response_cache=cache.RESPONSE_CACHE):
+        self.engine = engine
+        self.response_cache = response_cache
+        self._connection: Optional[Connection] = None
+        self._data_version = None
+        self._last_id = 0
+        # the ids below _last_id not seen yet, by the time they were skipped
+        self._gaps: Dict[int, float] = {}
+        self._last_check = 0.0
+
+    def _data_version_of(self, connection: Connection):
+        "Return the data_version of connection (None if it is not SQLite)."
+        if self.engine.dialect.name != "sqlite":
+            return None
+        return connection.exec_driver_sql("PRAGMA data_version").scalar()
+
+    def start(self):
+        "Open the connection and skip the invalidations committed so far."
+        # data_version only compares commits seen by the same connection
+        self._connection = self.engine.connect()
+        self._data_version = self._data_version_of(self._connection)
+        self._last_id = self._connection.scalar(select(func.max(TABLE.c.id))) or 0
+        self._last_check = time.monotonic()
+
+    def close(self):
+        "Close the connection."
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def check(self) -> str:
+        """Apply the invalidations committed since the last check.
+
+        Return what happened: unchanged, invalidated or cleared.
+        """
+        now = time.monotonic()
+        # rows might have been deleted since the last successful check
+        missed = now - self._last_check > RETENTION / 2
+        data_version = self._data_version_of(self._connection)
+        if not missed and data_version is not None:
+            if data_version == self._data_version:
+                self._last_check = now
+                return "unchanged"
+        condition = TABLE.c.id > self._last_id
+        if self._gaps:
+            condition = or_(condition, TABLE.c.id.in_(list(self._gaps)))
+        rows = self._connection.execute(
+            select(TABLE.c.id, TABLE.c.tags).where(condition).order_by(TABLE.c.id)
+        ).all()
+        self._data_version, self._last_check = data_version, now
+        self._skip(rows, now)
+        tags = {tuple(tag) for row in rows for tag in json.loads(row.tags)}
+        # a commit without rows was not made through the API
+        if missed or cache.ALL in tags or (not rows and data_version is not None):
+            self.response_cache.clear()
+            return "cleared"
+        if not tags:
+            return "unchanged"
+        self.response_cache.invalidate(tags)
+        return "invalidated"
+
+    def _skip(self, rows, now: float):
+        "Advance _last_id past rows and update the gaps between them."
+        for row in rows:
+            self._gaps.pop(row.id, None)
+        ids = {row.id for row in rows}
+        last_id = max(ids, default=0)
+        for missing in range(self._last_id + 1, last_id):
+            if missing not in ids:
+                self._gaps[missing] = now
+        self._last_id = max(self._last_id, last_id)
+        self._gaps = {
+            gap: skipped
+            for gap, skipped in self._gaps.items()
+            if now - skipped < RETENTION / 2
+        }
+
+
+_STOP: Optional[threading.Event] = None
+
+
+def _run(poller: Poller, interval: float, stopped: threading.Event):
+    "Check for invalidations every interval seconds until stopped is set."
+    try:
+        while not stopped.wait(interval):
+            try:
+                CHECKS.inc(poller.check())
+            except Exception:  # pylint: disable=W0703
+                # e.g. the database is locked; missed checks clear the cache
+                CHECKS.inc("error")
+    finally:
+        poller.close()
+
+
+def start(engine: Engine):
+    "Start checking for the invalidations of other processes, if configured."
+    global _STOP  # pylint: disable=W0603
+    if not settings.cache_sync_interval or _STOP is not None:
+        return
+    poller = Poller(engine)
+    poller.start()
+    _STOP = threading.Event()
+    threading.Thread(
+        target=_run,
+        args=(poller, settings.cache_sync_interval, _STOP),
+        name="cache-sync",
+        daemon=True,
+    ).start()
+
+
+def stop():
+    "Stop the checks started by `start`."
+    global _STOP  # pylint: disable=W0603
+    if _STOP is not None:
+        _STOP.set()
+        _STOP = None
@@ -0,0 +1,64 @@
+"""Cheap generation of the links in responses.
+
+``request.url_for`` searches the route table of the app for every single
+link. The listings and detail responses need one link per item, so
+`url_for` here looks up the path template of each route only once per
+router and then merely formats a string per link.
+
+The links are absolute, based on ``request.base_url`` like the links of
+``request.url_for``, so they honour ``root_path`` and the host and scheme
+set by a proxy (e.g. with ``uvicorn --proxy-headers``).
+"""
+from typing import Dict, Tuple
+
+from fastapi import Request
+
+SCOPE_KEY = "cities.links"
+
+# (router, path templates by route name) by id of the router
+_templates: Dict[int, Tuple[object, Dict[str, str]]] = {}
+
+
+def route_templates(router) -> Dict[str, str]:
+    "Return the path templates of all named routes of router by route name."
+    cached = _templates.get(id(router))
+    if cached is not None and cached[0] is router:
+        return cached[1]
+    templates = {}
+    for route in router.routes:
+        name = getattr(route, "name", None)
+        if name and hasattr(route, "path_format"):
+            templates.setdefault(name, route.path_format)
+    _templates[id(router)] = (router, templates)
+    return templates
+
+
+class LinkBuilder:
+    "Build absolute links for the routes of a router relative to a base url."
+    # pylint: disable=R0903
+
+    def __init__(self, base_url: str, templates: Dict[str, str]):
+        base_url = base_url.rstrip("/")
+        self.templates = {
+            name: base_url + template for name, template in templates.items()
+        }
+
+    def url_for(self, name: str, **path_params) -> str:
+        "Return the link to the route `name` with path_params."
+        return self.templates[name].format(**path_params)
+
+
+def link_builder(request: Request) -> LinkBuilder:
+    "Return the LinkBuilder for request, which is created once per request."
+    builder = request.scope.get(SCOPE_KEY)
+    if builder is None:
+        builder = LinkBuilder(
+            str(request.base_url), route_templates(request.scope["router"])
+        )
+        request.scope[SCOPE_KEY] = builder
+    return builder
+
+
+def url_for(request: Request, name: str, **path_params) -> str:
+    "Return the same link as ``request.url_for(name, **path_params)``."
+    return link_builder(request).url_for(name, **path_params)
@@ -2,16 +2,48 @@
 """
 from fastapi import FastAPI
 
-from . import database, models
-from .routers import cities, city, counties, countries, country, county
+from . import database, invalidation, migrations
+from .config import settings
+from .instrumentation import MetricsMiddleware, instrument_engine
+from .routers import (
+    bulk, cities, city, counties, countries, country, county, export, metrics,
+    stats,
+)
 
-models.Base.metadata.create_all(bind=database.engine)
+instrument_engine(database.engine, "primary")
+if database.replica_engine is not database.engine:
+    instrument_engine(database.replica_engine, "replica")
 
 
 app = FastAPI()
+app.add_middleware(MetricsMiddleware)
+# before the detail routers, which would take "export" for an id
+app.include_router(export.router)
 app.include_router(countries.router)
 app.include_router(country.router)
 app.include_router(counties.router)
 app.include_router(county.router)
 app.include_router(cities.router)
 app.include_router(city.router)
+app.include_router(bulk.router)
+app.include_router(stats.router)
+app.include_router(metrics.router)
+
+
+@app.on_event("startup")
+def migrate_database():
+    "Create and update the database schema, unless it was done before the start."
+    if settings.migrate_on_startup:
+        migrations.migrate(database.engine)
+
+
+@app.on_event("startup")
+def start_cache_sync():
+    "Invalidate the response cache on writes of other processes, see invalidation.py."
+    invalidation.start(database.engine)
+
+
+@app.on_event("shutdown")
+def stop_cache_sync():
+    "Stop the checks for writes of other processes."
+    invalidation.stop()
@@ -0,0 +1,190 @@
+"""Minimal Prometheus style metrics.
+
+Metrics are registered in REGISTRY, which renders them in the Prometheus
+text exposition format for the /metrics endpoint.
+"""
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds of the default histogram buckets in seconds.
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _escape(value) -> str:
+    "Escape a label value."
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Iterable[str], labelvalues: Iterable[str], extra=""):
+    "Return the label part of a sample line, e.g. '{route=\"/\",le=\"0.1\"}'."
+    labels = [
+        f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)
+    ]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+class Metric:
+    "Base class of all metrics."
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[str]:
+        "Return the sample lines of this metric."
+        raise NotImplementedError
+
+    def render(self) -> str:
+        "Return the metric in the Prometheus text format."
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    "A monotonically increasing value."
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1):
+        "Increase the counter for labelvalues by amount."
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        "Return the current value for labelvalues."
+        return self._values.get(labelvalues, 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+            for labels, value in values
+        ]
+
+
+class Gauge(Metric):
+    """A value which goes up and down.
+
+    It is either changed by `inc` and `dec` or, if `function` is given,
+    computed by it whenever the metric is rendered.
+    """
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name,
+        documentation,
+        function: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None,
+        labelnames=(),
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+        self._values: Dict[Tuple[str, ...], float] = {} if labelnames else {(): 0}
+
+    def inc(self, *labelvalues: str, amount: float = 1):
+        "Increase the gauge for labelvalues by amount."
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def dec(self, *labelvalues: str, amount: float = 1):
+        "Decrease the gauge for labelvalues by amount."
+        self.inc(*labelvalues, amount=-amount)
+
+    def samples(self):
+        if self.function is not None:
+            values = sorted(self.function().items())
+        else:
+            with self._lock:
+                values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+            for labels, value in values
+        ]
+
+
+class Histogram(Metric):
+    "Count observations (like durations) in buckets."
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # per label values: [count per bucket (the last one is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labelvalues: str):
+        "Record value for labelvalues."
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labelvalues)
+            if entry is None:
+                entry = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def count(self, *labelvalues: str) -> int:
+        "Return the number of observations for labelvalues."
+        entry = self._values.get(labelvalues)
+        return sum(entry[0]) if entry else 0
+
+    def samples(self):
+        with self._lock:
+            values = sorted(
+                (labels, (list(counts), total))
+                for labels, (counts, total) in self._values.items()
+            )
+        lines = []
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le_label = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                label_part = _format_labels(self.labelnames, labels, le_label)
+                lines.append(f"{self.name}_bucket{label_part} {cumulative}")
+            label_part = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_part} {total}")
+            lines.append(f"{self.name}_count{label_part} {cumulative}")
+        return lines
+
+
+class Registry:
+    "A collection of metrics."
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        "Add metric to the registry and return it."
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        "Return all metrics in the Prometheus text format."
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+POOL_CHECKOUT = REGISTRY.register(
+    Histogram(
+        "cities_db_pool_checkout_seconds",
+        "Time spent waiting for a connection from the pool.",
+        ("engine",),
+    )
+)
@@ -0,0 +1,24 @@
+"""Create and update the database schema.
+"""
+from sqlalchemy import exists, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import models, search, stats
+
+
+def migrate(engine: Engine):
+    "Create all missing tables and indexes in the database behind `engine`."
+    models.Base.metadata.create_all(bind=engine)
+    # create_all skips existing tables, so indexes added to a model later
+    # are created here
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    search.install(engine)
+    # fill new (or never filled) population statistics
+    with Session(engine) as db:
+        if not db.scalar(select(exists().select_from(models.PopulationBucket))):
+            if db.scalar(select(exists().select_from(models.City))):
+                stats.rebuild(db)
+                db.commit()
@@ -1,6 +1,6 @@
 """SQLAlchemy Models.
 """
-from sqlalchemy import Column, ForeignKey, Integer, String
+from sqlalchemy import Column, Float, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import relationship
 
 from .database import Base
@@ -17,6 +17,10 @@ class Country(Base):
 class County(Base):
     "A county."
     __tablename__ = 'counties'
+    __table_args__ = (
+        # listing the counties of a country ordered by name
+        Index("ix_counties_country_id_name", "country_id", "name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
@@ -29,6 +33,14 @@ class County(Base):
 class City(Base):
     "A city."
     __tablename__ = 'cities'
+    __table_args__ = (
+        # listing the cities of a county ordered by name
+        Index("ix_cities_county_id_name", "county_id", "name"),
+        # filtering by population range
+        Index("ix_cities_population_name", "population", "name"),
+        # population statistics of a county, see stats.py
+        Index("ix_cities_county_id_population", "county_id", "population"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
@@ -36,3 +48,34 @@ class City(Base):
     county_id = Column(Integer, ForeignKey("counties.id"))
 
     county = relationship("County", back_populates="cities")
+
+
+class PopulationBucket(Base):
+    """Population statistics of the cities of a county within a bucket.
+
+    A bucket covers the populations with the same number of digits, see
+    stats.py, which keeps this table up to date.
+    """
+    __tablename__ = 'population_buckets'
+
+    county_id = Column(Integer, ForeignKey("counties.id"), primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False)
+    total = Column(Integer, nullable=False)
+    minimum = Column(Integer, nullable=False)
+    maximum = Column(Integer, nullable=False)
+
+
+class CacheInvalidation(Base):
+    """The cache tags invalidated by a committed transaction.
+
+    The other server processes read the new rows to invalidate their
+    response caches, see invalidation.py.
+    """
+    __tablename__ = 'cache_invalidations'
+    # ids must never be reused, even after all rows have been deleted
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    tags = Column(String, nullable=False)  # JSON list of tags
+    created = Column(Float, nullable=False)  # time.time()
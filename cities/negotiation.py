@@ -0,0 +1,96 @@
+"""Content negotiation via the Accept header.
+
+`negotiate` picks the media type the client prefers from those an endpoint
+can produce, honouring q-values and the wildcards ``type/*`` and ``*/*``
+(RFC 7231, section 5.3.2). The q-value of a media type is taken from the
+most specific range matching it; ties go to the type the endpoint lists
+first. Browsers send ``*/*;q=0.8`` along with their preferred types, so
+they get JSON rather than an image, as JSON is always listed first.
+
+Clients send only a handful of distinct Accept headers, so both the
+parsed header and the result of each negotiation are memoized and the
+hot path is a single dict lookup.
+"""
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+JSON = "application/json"
+
+# (type, subtype, q)
+MediaRange = Tuple[str, str, float]
+
+
+@lru_cache(maxsize=256)
+def parse_accept(accept: str) -> Tuple[MediaRange, ...]:
+    "Return the media ranges of the Accept header `accept`."
+    ranges = []
+    for part in accept.split(","):
+        media_range, *params = part.split(";")
+        main, _, sub = media_range.strip().lower().partition("/")
+        if main == "*" and not sub:
+            sub = "*"  # a bare "*" is sent by some old clients
+        if not main or not sub or (main == "*" and sub != "*"):
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    quality = 0.0
+        ranges.append((main, sub, quality))
+    return tuple(ranges)
+
+
+def quality_of(ranges: Tuple[MediaRange, ...], media_type: str) -> float:
+    "Return the q-value of media_type, 0 if no range matches it."
+    main, _, sub = media_type.partition("/")
+    quality, specificity = 0.0, -1
+    for range_main, range_sub, range_quality in ranges:
+        if range_main == main and range_sub == sub:
+            match = 2
+        elif range_main == main and range_sub == "*":
+            match = 1
+        elif range_main == "*":
+            match = 0
+        else:
+            continue
+        if match > specificity:
+            quality, specificity = range_quality, match
+    return quality
+
+
+@lru_cache(maxsize=1024)
+def negotiate(accept: Optional[str], available: Tuple[str, ...]) -> Optional[str]:
+    """Return the media type of `available` the client prefers.
+
+    Without an Accept header the first type is returned, None if the
+    client accepts none of them.
+    """
+    ranges = parse_accept(accept) if accept else ()
+    if not ranges:
+        return available[0]
+    best, best_quality = None, 0.0
+    for media_type in available:
+        quality = quality_of(ranges, media_type)
+        if quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+
+def not_acceptable(available: Tuple[str, ...]) -> HTTPException:
+    "Return the exception for a request accepting none of `available`."
+    return HTTPException(
+        status_code=406, detail=f"Available media types: {', '.join(available)}"
+    )
+
+
+async def accepts_json(request: Request):
+    "Dependency answering requests which do not accept JSON with a 406."
+    if request.method != "OPTIONS" and not negotiate(
+        request.headers.get("accept"), (JSON,)
+    ):
+        raise not_acceptable((JSON,))
@@ -0,0 +1,47 @@
+"""Opaque cursors for keyset pagination.
+
+A cursor encodes the sort key ``(name, id)`` of the last item of a page.
+The next page starts right behind this key, which lets the database seek
+in the name index instead of skipping all previous rows.
+"""
+import base64
+import binascii
+import json
+from typing import Tuple
+
+from fastapi import Request, Response
+
+
+def encode_cursor(name: str, item_id: int) -> str:
+    "Return an opaque cursor pointing behind the item with `name` and `item_id`."
+    data = json.dumps([name, item_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Return the sort key ``(name, id)`` encoded in `cursor`.
+
+    Raise a ValueError if `cursor` was not created by `encode_cursor`.
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        name, item_id = json.loads(data.decode("utf-8"))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as err:
+        raise ValueError(f"Invalid cursor '{cursor}'.") from err
+    if not isinstance(name, str) or not isinstance(item_id, int):
+        raise ValueError(f"Invalid cursor '{cursor}'.")
+    return name, item_id
+
+
+def add_next_link(request: Request, response: Response, items: list, size: int):
+    """Add a Link header pointing to the next page to `response`.
+
+    A page with less than `size` `items` is the last one and gets no link.
+    Paging by `start` is replaced by a cursor behind the last item.
+    """
+    if items and len(items) >= size:
+        last = items[-1]
+        url = request.url.remove_query_params("start").include_query_params(
+            after=encode_cursor(last.name, last.id)
+        )
+        response.headers["Link"] = f'<{url}>; rel="next"'
@@ -0,0 +1,170 @@
+"""Endpoints for bulk imports (/countries:bulk, /counties:bulk and
+/cities:bulk) and batch gets (/countries:batchGet, ...).
+"""
+from typing import List
+
+import sqlalchemy.exc
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session
+
+from .. import bulk, crud, details, schemas
+from ..concurrency import run_db
+from ..config import settings
+from ..dependencies import get_db, get_read_db
+from ..negotiation import accepts_json
+
+router = APIRouter(
+    tags=["bulk"],
+    dependencies=[Depends(accepts_json)],
+    responses={
+        400: {"description": "Invalid or inconsistent data"},
+        415: {"description": "Unsupported media type"},
+    },
+)
+
+BULK_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "description": (
+            "NDJSON (one JSON object per line) or CSV (header line with field "
+            "names, then one line per entry). Every entry needs an `id`."
+        ),
+        "content": {bulk.NDJSON: {}, bulk.CSV: {}},
+    }
+}
+
+
+async def bulk_import(
+    request: Request, db: Session, schema, upsert
+) -> schemas.BulkResult:
+    """Stream the request body into the database using `upsert`.
+
+    Records are written in batches, the whole import is one transaction:
+    if a single record fails, nothing is imported.
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip()
+    try:
+        parser = bulk.RecordParser(media_type, schema)
+    except ValueError as err:
+        raise HTTPException(status_code=415, detail=f"{err}") from err
+    imported = 0
+    try:
+        async for batch in bulk.aiter_batches(
+            request.stream(), parser, settings.bulk_batch_size
+        ):
+            imported += await run_db(upsert, db, batch)
+        await run_db(db.commit)
+    except (
+        bulk.BulkImportError,
+        crud.CreationException,
+        sqlalchemy.exc.IntegrityError,
+        UnicodeDecodeError,
+    ) as err:
+        await run_db(db.rollback)
+        raise HTTPException(status_code=400, detail=f"{err}") from err
+    return schemas.BulkResult(imported=imported)
+
+
+@router.post(
+    "/countries:bulk", response_model=schemas.BulkResult, openapi_extra=BULK_REQUEST_BODY
+)
+async def bulk_countries(request: Request, db: Session = Depends(get_db)):
+    "Create or update many Countries in one request."
+    return await bulk_import(
+        request, db, schemas.CountryCreate, crud.upsert_countries
+    )
+
+
+@router.post(
+    "/counties:bulk", response_model=schemas.BulkResult, openapi_extra=BULK_REQUEST_BODY
+)
+async def bulk_counties(request: Request, db: Session = Depends(get_db)):
+    "Create or update many Counties in one request."
+    return await bulk_import(request, db, schemas.CountyCreate, crud.upsert_counties)
+
+
+@router.post(
+    "/cities:bulk", response_model=schemas.BulkResult, openapi_extra=BULK_REQUEST_BODY
+)
+async def bulk_cities(request: Request, db: Session = Depends(get_db)):
+    "Create or update many Cities in one request."
+    return await bulk_import(request, db, schemas.CityCreate, crud.upsert_cities)
+
+
+MAX_BATCH_SIZE = 100
+
+IDS_QUERY = Query(
+    default=...,
+    title="Ids",
+    description=(
+        f"Comma separated list of up to {MAX_BATCH_SIZE} ids, e.g. `1,2,3`. "
+        "The entries are returned in this order."
+    ),
+)
+
+
+def parse_ids(ids: str) -> List[int]:
+    "Return the list of ids in the comma separated string `ids`."
+    try:
+        rv = [int(item_id) for item_id in ids.split(",") if item_id.strip()]
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=f"Invalid ids: {ids}") from err
+    if not rv or len(rv) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400, detail=f"Request 1 to {MAX_BATCH_SIZE} ids."
+        )
+    return rv
+
+
+def batch_entries(item_ids, items, entry_schema):
+    "Return the batch get entries for item_ids in the requested order."
+    return [
+        entry_schema(id=item_id, found=item_id in items, item=items.get(item_id))
+        for item_id in item_ids
+    ]
+
+
+@router.get("/countries:batchGet", response_model=List[schemas.CountryBatchEntry])
+async def batch_get_countries(
+    request: Request, ids: str = IDS_QUERY, db: Session = Depends(get_read_db)
+):
+    "Get many Countries by id in one request."
+    country_ids = parse_ids(ids)
+    db_countries = await run_db(
+        crud.get_countries_by_ids, db, country_ids, options=crud.COUNTRY_DETAILS
+    )
+    countries = await run_db(
+        details.countries_details, request, db, list(db_countries.values())
+    )
+    return batch_entries(country_ids, countries, schemas.CountryBatchEntry)
+
+
+@router.get("/counties:batchGet", response_model=List[schemas.CountyBatchEntry])
+async def batch_get_counties(
+    request: Request, ids: str = IDS_QUERY, db: Session = Depends(get_read_db)
+):
+    "Get many Counties by id in one request."
+    county_ids = parse_ids(ids)
+    db_counties = await run_db(
+        crud.get_counties_by_ids, db, county_ids, options=crud.COUNTY_DETAILS
+    )
+    counties = await run_db(
+        details.counties_details, request, db, list(db_counties.values())
+    )
+    return batch_entries(county_ids, counties, schemas.CountyBatchEntry)
+
+
+@router.get("/cities:batchGet", response_model=List[schemas.CityBatchEntry])
+async def batch_get_cities(
+    request: Request, ids: str = IDS_QUERY, db: Session = Depends(get_read_db)
+):
+    "Get many Cities by id in one request."
+    city_ids = parse_ids(ids)
+    db_cities = await run_db(
+        crud.get_cities_by_ids, db, city_ids, options=crud.CITY_DETAILS
+    )
+    cities = {
+        city_id: schemas.CityDetails.from_model(request, db_city)
+        for city_id, db_city in db_cities.items()
+    }
+    return batch_entries(city_ids, cities, schemas.CityBatchEntry)
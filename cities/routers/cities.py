@@ -6,13 +6,17 @@ import sqlalchemy.exc
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 
-from .. import crud, schemas
-from ..dependencies import get_db
+from .. import crud, schemas, serialization
+from ..concurrency import run_db
+from ..config import settings
+from ..dependencies import get_db, get_read_db
+from ..negotiation import accepts_json
+from ..pagination import add_next_link, decode_cursor
 
 router = APIRouter(
     prefix="/cities",
     tags=["cities"],
-    dependencies=[Depends(get_db)],
+    dependencies=[Depends(accepts_json)],
     responses={
         404: {"description": "Not found"},
         200: {"model": schemas.CityDetails, "description": "Updated"},
@@ -33,6 +37,7 @@ async def options_cities(response: Response):
 @router.get("/", response_model=List[schemas.City])
 async def get_cities(
     request: Request,
+    response: Response,
     start: Optional[int] = Query(
         default=1,
         gt=0,
@@ -78,12 +83,41 @@ async def get_cities(
         title="Filter by country",
         description="Filter cities by country name.",
     ),
-    db: Session = Depends(get_db),
+    county_id: Union[int, None] = Query(
+        default=None,
+        title="Filter by county id",
+        description="Filter cities by the id of their county.",
+    ),
+    after: Union[str, None] = Query(
+        default=None,
+        title="Cursor",
+        description=(
+            "Opaque cursor taken from the `next` link of the previous page. "
+            "Paging by cursor is faster and more stable than paging by `start`."
+        ),
+    ),
+    fields: Union[str, None] = Query(
+        default=None,
+        title="Fields",
+        description=(
+            "Comma separated list of the fields to return for each city "
+            "(any of `name`, `id` and `link`). Default: all fields."
+        ),
+    ),
+    db: Session = Depends(get_read_db),
 ):
-    "Get an ordered list of cities."
-    # pylint: disable=R0913
-    cities = []
-    for db_city in crud.get_cities(
+    """Get an ordered list of cities.
+
+    If there might be more cities, a `Link` header points to the next page.
+    """
+    # pylint: disable=R0913,R0914
+    try:
+        after_key = decode_cursor(after) if after else None
+        selected_fields = serialization.parse_fields(fields)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=f"{err}") from err
+    db_cities = await run_db(
+        crud.get_cities,
         db=db,
         skip=start - 1,
         limit=size,
@@ -92,8 +126,20 @@ async def get_cities(
         maxpop=maxpop,
         county=county,
         country=country,
-    ):
+        after=after_key,
+        columns=crud.CITY_LIST_COLUMNS,
+        county_id=county_id,
+    )
+    if settings.fast_serializer or selected_fields:
+        response = serialization.list_response(
+            request, db_cities, "get_city_by_id", "city_id", selected_fields
+        )
+        add_next_link(request, response, db_cities, size)
+        return response
+    cities = []
+    for db_city in db_cities:
         cities.append(schemas.City.from_model(request, db_city))
+    add_next_link(request, response, cities, size)
     return cities
 
 
@@ -102,11 +148,14 @@ async def create_city(
     request: Request, city: schemas.CityCreate, db: Session = Depends(get_db)
 ):
     "Create a new City."
-    db_city = crud.get_city_by_name(db, city.name)
-    #if db_city:
-    #    raise HTTPException(status_code=400, detail="City already exists.")
     try:
-        db_city = crud.create_city(db=db, city=city, city_id=city.id)
+        db_city = await run_db(
+            crud.create_city,
+            db=db,
+            city=city,
+            city_id=city.id,
+            options=crud.CITY_DETAILS,
+        )
         return schemas.CityDetails.from_model(request, db_city)
     except (sqlalchemy.exc.IntegrityError, crud.CreationException) as err:
         raise HTTPException(status_code=400, detail=f"{err}") from err
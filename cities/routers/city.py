@@ -1,16 +1,17 @@
 """Endpointy for /cities/{id}
 """
-import sqlalchemy.exc
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 
-from .. import crud, schemas
-from ..dependencies import get_db
+from .. import cache, crud, schemas, writer
+from ..concurrency import run_db
+from ..dependencies import get_db, get_read_db
+from ..negotiation import accepts_json
 
 router = APIRouter(
     prefix="/cities",
     tags=["city"],
-    dependencies=[Depends(get_db)],
+    dependencies=[Depends(accepts_json)],
     responses={
         404: {"description": "Not found"},
         200: {"model": schemas.CityDetails, "description": "Updated"},
@@ -29,13 +30,24 @@ async def get_city_by_id(
     city_id: int = Query(
         default=..., title="City id", description="The id of the city to request."
     ),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     "Get City with id `city_id`."
-    db_city = crud.get_city(db=db, city_id=city_id)
+    key, entry, generation = cache.lookup(request)
+    if entry:
+        return cache.respond(request, entry)
+    db_city = await run_db(
+        crud.get_city, db=db, city_id=city_id, options=crud.CITY_DETAILS
+    )
     if not db_city:
         raise HTTPException(status_code=404, detail="City does not exist.")
-    return schemas.CityDetails.from_model(request, db_city)
+    tags = [
+        ("city", city_id),
+        ("county", db_city.county_id),
+        ("country", db_city.county.country_id),
+    ]
+    city = schemas.CityDetails.from_model(request, db_city)
+    return cache.store(request, key, city, tags, generation)
 
 
 @router.put(
@@ -50,37 +62,25 @@ async def create_or_update_city(
     db: Session = Depends(get_db),
 ):
     "Create a new or update an existing City."
-    db_city = crud.get_city(db, city_id=city_id)
     try:
-        if db_city:
-            if city.id and city.id != city_id:
-                raise HTTPException(
-                    status_code=422, detail="Changing the id of a City is not allowed"
-                )
-            try:
-                db_city = crud.update_city(
-                    db=db,
-                    city_id=city_id,
-                    city_name=city.name,
-                    population=city.population,
-                    county_id=city.county_id,
-                )
-                response.status_code = 200
-            except crud.UpdateException as err:
-                raise HTTPException(status_code=422, detail=f"{err}") from err
-        else:
-            db_city = crud.create_city(db=db, city_id=city_id, city=city)
-            response.status_code = 201
-        return schemas.CityDetails.from_model(request, db_city)
-    except sqlalchemy.exc.IntegrityError as err:
+        db_city, created = await run_db(
+            crud.upsert_city,
+            db=db,
+            city_id=city_id,
+            city=city,
+            options=crud.CITY_DETAILS,
+        )
+    except crud.CRUDException as err:
         raise HTTPException(status_code=422, detail=f"{err}") from err
+    response.status_code = 201 if created else 200
+    return schemas.CityDetails.from_model(request, db_city)
 
 
 @router.patch(
     "/{city_id}",
     response_model=schemas.CityDetails,
 )
-def patch_city(
+async def patch_city(
     request: Request,
     city_id: int,
     city: schemas.CityPatch,
@@ -90,15 +90,21 @@ def patch_city(
 
     Updates the city with the provided values.
     """
-    try:
+
+    def _update(db: Session, commit: bool = True):
         db_city = crud.update_city(
             db,
             city_id=city_id,
             city_name=city.name,
             population=city.population,
             county_id=city.county_id,
+            options=crud.CITY_DETAILS,
+            commit=commit,
         )
         return schemas.CityDetails.from_model(request, db_city)
+
+    try:
+        return await writer.write(db, _update)
     except crud.ItemNotFoundException as err:
         raise HTTPException(status_code=404, detail="No such City") from err
     except crud.UpdateException as err:
@@ -108,14 +114,16 @@ def patch_city(
 @router.delete("/{city_id}", response_model=schemas.CityDetails)
 async def delete_city(request: Request, city_id: int, db: Session = Depends(get_db)):
     "Delete a City."
-    db_city = crud.get_city(db, city_id=city_id)
+    db_city = await run_db(
+        crud.get_city, db, city_id=city_id, options=crud.CITY_DETAILS
+    )
     if not db_city:
         raise HTTPException(status_code=404, detail="City not found.")
     # We create the response before actually deleting because
     # we need the SQLAlchemy references to County (which is gone after deletion)
     response_data = schemas.CityDetails.from_model(request, db_city)
     response_data.link = None  # Nothing left to link to
-    crud.delete_city(db, city_id)
+    await run_db(crud.delete_city, db, city_id)
     return response_data
 
 
@@ -7,13 +7,17 @@ from fastapi import (APIRouter, Depends, HTTPException, Query, Request,
                      Response)
 from sqlalchemy.orm import Session
 
-from .. import crud, schemas
-from .. dependencies import get_db
+from .. import crud, details, schemas, serialization
+from ..concurrency import run_db
+from ..config import settings
+from .. dependencies import get_db, get_read_db
+from ..negotiation import accepts_json
+from ..pagination import add_next_link, decode_cursor
 
 router = APIRouter(
     prefix="/counties",
     tags=["counties"],
-    dependencies=[Depends(get_db)],
+    dependencies=[Depends(accepts_json)],
     responses={
         404: {"description": "Not found"},
         200: {"model": schemas.CityDetails, "description": "Updated"},
@@ -34,7 +38,8 @@ async def options_countries(response: Response):
 @router.get("/", response_model=List[schemas.County])
 async def get_counties(
     request: Request,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     start: Optional[int] = Query(
         default=1,
         gt=0,
@@ -57,14 +62,59 @@ async def get_counties(
         title="filter by country",
         description="Filter result by country name.",
     ),
+    country_id: Union[int, None] = Query(
+        default=None,
+        title="Filter by country id",
+        description="Filter result by the id of the country.",
+    ),
+    after: Union[str, None] = Query(
+        default=None,
+        title="Cursor",
+        description=(
+            "Opaque cursor taken from the `next` link of the previous page. "
+            "Paging by cursor is faster and more stable than paging by `start`."
+        ),
+    ),
+    fields: Union[str, None] = Query(
+        default=None,
+        title="Fields",
+        description=(
+            "Comma separated list of the fields to return for each county "
+            "(any of `name`, `id` and `link`). Default: all fields."
+        ),
+    ),
 ):
-    "Get an ordered list of counties."
-    # pylint: disable=R0913
+    """Get an ordered list of counties.
+
+    If there might be more counties, a `Link` header points to the next page.
+    """
+    # pylint: disable=R0913,R0914
+    try:
+        after_key = decode_cursor(after) if after else None
+        selected_fields = serialization.parse_fields(fields)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=f"{err}") from err
+    db_counties = await run_db(
+        crud.get_counties,
+        db=db,
+        skip=start - 1,
+        limit=size,
+        q=q,
+        country=country,
+        after=after_key,
+        columns=crud.COUNTY_LIST_COLUMNS,
+        country_id=country_id,
+    )
+    if settings.fast_serializer or selected_fields:
+        response = serialization.list_response(
+            request, db_counties, "get_county_by_id", "county_id", selected_fields
+        )
+        add_next_link(request, response, db_counties, size)
+        return response
     counties = []
-    for db_county in crud.get_counties(
-        db=db, skip=start - 1, limit=size, q=q, country=country
-    ):
+    for db_county in db_counties:
         counties.append(schemas.County.from_model(request, db_county))
+    add_next_link(request, response, counties, size)
     return counties
 
 
@@ -73,11 +123,17 @@ async def create_county(
     request: Request, county: schemas.CountyCreate, db: Session = Depends(get_db)
 ):
     "Create a new County."
-    db_county = crud.get_county_by_name(db, county.name)
+    db_county = await run_db(crud.get_county_by_name, db, county.name)
     if db_county:
         raise HTTPException(status_code=400, detail="County already exists.")
     try:
-        db_county = crud.create_county(db=db, county=county, county_id=county.id)
-        return schemas.CountyDetails.from_model(request, db_county)
+        db_county = await run_db(
+            crud.create_county,
+            db=db,
+            county=county,
+            county_id=county.id,
+            options=crud.COUNTY_DETAILS,
+        )
+        return await run_db(details.county_details, request, db, db_county)
     except ((sqlalchemy.exc.IntegrityError, crud.CreationException)) as err:
         raise HTTPException(status_code=400, detail=f"{err}") from err
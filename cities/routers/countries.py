@@ -6,13 +6,17 @@ import sqlalchemy.exc
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 
-from .. import crud, schemas
-from .. dependencies import get_db
+from .. import crud, details, schemas, serialization
+from ..concurrency import run_db
+from ..config import settings
+from .. dependencies import get_db, get_read_db
+from ..negotiation import accepts_json
+from ..pagination import add_next_link, decode_cursor
 
 router = APIRouter(
     prefix="/countries",
     tags=["countries"],
-    dependencies=[Depends(get_db)],
+    dependencies=[Depends(accepts_json)],
     responses={
         404: {"description": "Not found"},
         200: {"model": schemas.CityDetails, "description": "Updated"},
@@ -32,7 +36,8 @@ async def options_countries(response: Response):
 @router.get("/")#, response_model=List[schemas.Country])
 async def get_countries(
     request: Request,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     start: Optional[int] = Query(
         default=1,
         gt=0,
@@ -48,11 +53,52 @@ async def get_countries(
     q: Union[str, None] = Query(
         default=None, title="Query string", description="(Sub)String to search for."
     ),
+    after: Union[str, None] = Query(
+        default=None,
+        title="Cursor",
+        description=(
+            "Opaque cursor taken from the `next` link of the previous page. "
+            "Paging by cursor is faster and more stable than paging by `start`."
+        ),
+    ),
+    fields: Union[str, None] = Query(
+        default=None,
+        title="Fields",
+        description=(
+            "Comma separated list of the fields to return for each country "
+            "(any of `name`, `id` and `link`). Default: all fields."
+        ),
+    ),
 ):
-    "Get an alphabetically ordered list of countries."
+    """Get an alphabetically ordered list of countries.
+
+    If there might be more countries, a `Link` header points to the next page.
+    """
+    # pylint: disable=R0913
+    try:
+        after_key = decode_cursor(after) if after else None
+        selected_fields = serialization.parse_fields(fields)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=f"{err}") from err
+    db_countries = await run_db(
+        crud.get_countries,
+        db=db,
+        skip=start - 1,
+        limit=size,
+        q=q,
+        after=after_key,
+        columns=crud.COUNTRY_LIST_COLUMNS,
+    )
+    if settings.fast_serializer or selected_fields:
+        response = serialization.list_response(
+            request, db_countries, "get_country_by_id", "country_id", selected_fields
+        )
+        add_next_link(request, response, db_countries, size)
+        return response
     countries = []
-    for country in crud.get_countries(db=db, skip=start - 1, limit=size, q=q):
+    for country in db_countries:
         countries.append(schemas.Country.from_model(request, country))
+    add_next_link(request, response, countries, size)
     return countries
 
 @router.post("/", response_model=schemas.CountryDetails, status_code=201)
@@ -60,14 +106,18 @@ async def create_country(
     request: Request, country: schemas.CountryCreate, db: Session = Depends(get_db)
 ):
     "Create a new Country."
-    db_country = crud.get_country_by_name(db, country.name)
+    db_country = await run_db(crud.get_country_by_name, db, country.name)
     if db_country:
         raise HTTPException(status_code=400, detail="Country already exists.")
     try:
-        db_country = crud.create_country(
-            db=db, country=country, country_id=country.id
+        db_country = await run_db(
+            crud.create_country,
+            db=db,
+            country=country,
+            country_id=country.id,
+            options=crud.COUNTRY_DETAILS,
         )
-        return schemas.CountryDetails.from_model(request, db_country)
+        return await run_db(details.country_details, request, db, db_country)
     except (sqlalchemy.exc.IntegrityError, crud.CreationException) as err:
         raise HTTPException(
             status_code=400,
@@ -1,18 +1,19 @@
 """Endpointy for /counties/{country__id}.
 """
-import os
+from typing import Union
 
-from fastapi import APIRouter, Depends, HTTPException, Path, Request, Response
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, Response
 from sqlalchemy.orm import Session
 
-from .. import crud, schemas
-from ..dependencies import get_db
+from .. import (
+    cache, crud, derivatives, details, negotiation, schemas, serialization, writer
+)
+from ..concurrency import run_db
+from ..dependencies import get_db, get_read_db
 
 router = APIRouter(
     prefix="/countries",
     tags=["country"],
-    dependencies=[Depends(get_db)],
     responses={
         404: {"description": "Not found"},
         200: {"model": schemas.CityDetails, "description": "Updated"},
@@ -20,6 +21,8 @@ router = APIRouter(
     },
 )
 
+MAX_IMAGE_WIDTH = 1024
+
 AVAILABLE_IMAGES = {
     "image/svg+xml": "svg",
     "image/png": "png",
@@ -28,25 +31,13 @@ AVAILABLE_IMAGES = {
 }
 
 
-def get_image_file_for(country_id, img_type):
-    "Return path to file for requested image format."
-    img_dir = os.path.dirname(__file__)
-    return os.path.abspath(
-        os.path.join(
-            img_dir, "..", "data", f"{country_id}.{AVAILABLE_IMAGES[img_type]}"
-        )
-    )
-
-
-def parse_accept_header(accept):
-    "Return the first available image format requested via accept or None."
-    rv = None
-    if accept:
-        for media_type in accept.split(","):
-            media_type = media_type.split(";")[0].strip()
-            if media_type in AVAILABLE_IMAGES:
-                rv = media_type
-    return rv
+# Browsers accept images (even image/webp explicitly) along with text/html,
+# which I want to avoid for didactic reasons: text/html is answered with
+# JSON, too, and it is listed before the images, so it is preferred on ties.
+HTML = "text/html"
+MEDIA_TYPES = (
+    negotiation.JSON, HTML, *AVAILABLE_IMAGES, *derivatives.TRANSCODED
+)
 
 
 @router.head(
@@ -62,6 +53,7 @@ def parse_accept_header(accept):
                 "image/jpeg": {},
                 "image/gif": {},
                 "image/svg+xml": {},
+                **{media_type: {} for media_type in derivatives.TRANSCODED},
             },
             "description": "Return the JSON item or an image.",
         }
@@ -69,31 +61,79 @@ def parse_accept_header(accept):
 )
 async def get_country_by_id(
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     country_id: int = Path(
         default=..., title="Country id", description="The id of the country to request."
     ),
+    width: Union[int, None] = Query(
+        default=None,
+        alias="w",
+        gt=0,
+        le=MAX_IMAGE_WIDTH,
+        title="Image width",
+        description=(
+            "Scale a requested image down to this width in pixels, keeping "
+            "its aspect ratio."
+        ),
+    ),
+    embed: Union[str, None] = Query(
+        default=None,
+        title="Embedded collections",
+        description=(
+            "Comma separated list of the collections to embed (`counties`). "
+            "Default: all. With `embed=`, only `counties_next` links to the "
+            "counties."
+        ),
+    ),
 ):
     "Get a single Country with id `country_id`."
     # For demonstration purposes we support requesting some image types
-    accept = request.headers.get("accept", "")
-    # checking for text/html is dirty hack, because browsers accept some image
-    # types by default, which I want to avoid for didactic reasons
-    if "image/" in accept and not "text/html" in accept:
-        supported_img_type = request.headers.get("accept", "")
-        if supported_img_type:
-            img_file = get_image_file_for(country_id, supported_img_type)
-            if not os.path.exists(img_file):
-                raise HTTPException(status_code=404, detail="No such image")
-            return FileResponse(img_file, media_type=supported_img_type)
-        raise HTTPException(status_code=404, detail="No such image")
+    media_type = negotiation.negotiate(request.headers.get("accept"), MEDIA_TYPES)
+    if media_type is None:
+        raise negotiation.not_acceptable(
+            tuple(media_type for media_type in MEDIA_TYPES if media_type != HTML)
+        )
+    if media_type not in (negotiation.JSON, HTML):
+        response = await derivatives.respond(request, country_id, media_type, width)
+        response.headers["Vary"] = "Accept"
+        return response
 
     # non image
-    db_country = crud.get_country(db=db, country_id=country_id)
+    try:
+        embedded = serialization.parse_embed(embed, details.COUNTRY_EMBEDDABLE)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=f"{err}") from err
+    key, entry, generation = cache.lookup(request, media_type)
+    if entry:
+        return cache.respond(request, entry)
+    db_country = await run_db(
+        crud.get_country, db=db, country_id=country_id, options=crud.COUNTRY_DETAILS
+    )
+    if not db_country:
+        raise HTTPException(status_code=404, detail="Country does not exist.")
+    country = await run_db(
+        details.country_details, request, db, db_country, embedded
+    )
+    tags = [("country", country_id), ("country_counties", country_id)]
+    return cache.store(request, key, country, tags, generation)
+
+
+@router.get(
+    "/{country_id}/stats",
+    response_model=schemas.PopulationStats,
+    dependencies=[Depends(negotiation.accepts_json)],
+)
+async def get_country_stats(
+    db: Session = Depends(get_read_db),
+    country_id: int = Path(
+        default=..., title="Country id", description="The id of the country."
+    ),
+):
+    "Get population statistics of the cities of Country with id `country_id`."
+    db_country = await run_db(crud.get_country, db=db, country_id=country_id)
     if not db_country:
         raise HTTPException(status_code=404, detail="Country does not exist.")
-    country = schemas.CountryDetails.from_model(request, db_country)
-    return country
+    return await run_db(crud.get_population_stats, db=db, country_id=country_id)
 
 
 @router.options("/{country_id}", status_code=204, response_class=Response)
@@ -108,6 +148,7 @@ async def options_countries_with_id(country_id: int, response: Response):
 @router.put(
     "/{country_id}",
     response_model=schemas.CountryDetails,
+    dependencies=[Depends(negotiation.accepts_json)],
 )
 async def create_or_update_country(
     response: Response,
@@ -117,28 +158,26 @@ async def create_or_update_country(
     db: Session = Depends(get_db),
 ):
     "Create a new or update an existing country."
-    db_country = crud.get_country(db, country_id=country_id)
-    if db_country:
-        # `id` is ignored anyhow, but I think it's more clear to raise a 400
-        if country.id and country.id != country_id:
-            raise HTTPException(
-                status_code=400, detail="Changing the id of a Country is not allowed"
-            )
-        db_country = crud.update_country(
-            db=db, country_id=country_id, country_name=country.name
+    try:
+        db_country, created = await run_db(
+            crud.upsert_country,
+            db=db,
+            country_id=country_id,
+            country=country,
+            options=crud.COUNTRY_DETAILS,
         )
-        response.status_code = 200
-    else:
-        db_country = crud.create_country(db=db, country_id=country_id, country=country)
-        response.status_code = 201
-    return schemas.CountryDetails.from_model(request, db_country)
+    except crud.CRUDException as err:
+        raise HTTPException(status_code=400, detail=f"{err}") from err
+    response.status_code = 201 if created else 200
+    return await run_db(details.country_details, request, db, db_country)
 
 
 @router.patch(
     "/{country_id}",
     response_model=schemas.CountryDetails,
+    dependencies=[Depends(negotiation.accepts_json)],
 )
-def patch_country(
+async def patch_country(
     request: Request,
     country_id: int,
     country: schemas.CountryPatch,
@@ -148,12 +187,18 @@ def patch_country(
 
     Updates the country with the provided value.
     """
-    try:
+
+    def _update(db: Session, commit: bool = True):
         db_country = crud.update_country(
             db,
             country_id=country_id,
             country_name=country.name,
+            options=crud.COUNTRY_DETAILS,
+            commit=commit,
         )
-        return schemas.CountryDetails.from_model(request, db_country)
+        return details.country_details(request, db, db_country)
+
+    try:
+        return await writer.write(db, _update)
     except crud.ItemNotFoundException as err:
         raise HTTPException(status_code=404, detail="No such County") from err
@@ -1,18 +1,20 @@
 """Endpoints for /county/{county_id}.
 """
+from typing import Union
 
-import sqlalchemy.exc
 from fastapi import (APIRouter, Depends, HTTPException, Query, Request,
                      Response)
 from sqlalchemy.orm import Session
 
-from .. import crud, schemas
-from ..dependencies import get_db
+from .. import cache, crud, details, schemas, serialization, writer
+from ..concurrency import run_db
+from ..dependencies import get_db, get_read_db
+from ..negotiation import accepts_json
 
 router = APIRouter(
     prefix="/counties",
     tags=["county"],
-    dependencies=[Depends(get_db)],
+    dependencies=[Depends(accepts_json)],
     responses={
         404: {"description": "Not found"},
         200: {"model": schemas.CityDetails, "description": "Updated"},
@@ -30,13 +32,50 @@ async def get_county_by_id(
     county_id: int = Query(
         default=..., title="County id", description="The id of the county to request."
     ),
-    db: Session = Depends(get_db),
+    embed: Union[str, None] = Query(
+        default=None,
+        title="Embedded collections",
+        description=(
+            "Comma separated list of the collections to embed (`cities`). "
+            "Default: all. With `embed=`, only `cities_next` links to the cities."
+        ),
+    ),
+    db: Session = Depends(get_read_db),
 ):
     "Get County with id `county_id`."
-    db_county = crud.get_county(db=db, county_id=county_id)
+    try:
+        embedded = serialization.parse_embed(embed, details.COUNTY_EMBEDDABLE)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=f"{err}") from err
+    key, entry, generation = cache.lookup(request)
+    if entry:
+        return cache.respond(request, entry)
+    db_county = await run_db(
+        crud.get_county, db=db, county_id=county_id, options=crud.COUNTY_DETAILS
+    )
     if not db_county:
         raise HTTPException(status_code=404, detail="County does not exist.")
-    return schemas.CountyDetails.from_model(request, db_county)
+    tags = [
+        ("county", county_id),
+        ("county_cities", county_id),
+        ("country", db_county.country_id),
+    ]
+    county = await run_db(details.county_details, request, db, db_county, embedded)
+    return cache.store(request, key, county, tags, generation)
+
+
+@router.get("/{county_id}/stats", response_model=schemas.PopulationStats)
+async def get_county_stats(
+    county_id: int = Query(
+        default=..., title="County id", description="The id of the county."
+    ),
+    db: Session = Depends(get_read_db),
+):
+    "Get population statistics of the cities of County with id `county_id`."
+    db_county = await run_db(crud.get_county, db=db, county_id=county_id)
+    if not db_county:
+        raise HTTPException(status_code=404, detail="County does not exist.")
+    return await run_db(crud.get_population_stats, db=db, county_id=county_id)
 
 
 @router.options("/{county_id}", status_code=204, response_class=Response)
@@ -59,30 +98,18 @@ async def create_or_update_county(
     db: Session = Depends(get_db),
 ):
     "Create a new or update an existing County."
-    db_county = crud.get_county(db, county_id=county_id)
     try:
-        if db_county:
-            # `id` is ignored anyhow, but I think it's more clear to raise a 400
-            if county.id and county.id != county_id:
-                raise HTTPException(
-                    status_code=400, detail="Changing the id of a County is not allowed"
-                )
-            try:
-                db_county = crud.update_county(
-                    db=db,
-                    county_id=county_id,
-                    county_name=county.name,
-                    country_id=county.country_id,
-                )
-                response.status_code = 200
-            except crud.UpdateException as err:
-                raise HTTPException(status_code=400, detail=f"{err}") from err
-        else:
-            db_county = crud.create_county(db=db, county_id=county_id, county=county)
-            response.status_code = 201
-        return schemas.CountyDetails.from_model(request, db_county)
-    except sqlalchemy.exc.IntegrityError as err:
+        db_county, created = await run_db(
+            crud.upsert_county,
+            db=db,
+            county_id=county_id,
+            county=county,
+            options=crud.COUNTY_DETAILS,
+        )
+    except crud.CRUDException as err:
         raise HTTPException(status_code=400, detail=f"{err}") from err
+    response.status_code = 201 if created else 200
+    return await run_db(details.county_details, request, db, db_county)
 
 
 @router.patch(
@@ -90,7 +117,7 @@ async def create_or_update_county(
     response_model=schemas.CountyDetails,
     #responses={404: {"model": schemas.Message}},
 )
-def patch_county(
+async def patch_county(
     request: Request,
     county_id: int,
     county: schemas.CountyPatch,
@@ -100,14 +127,20 @@ def patch_county(
 
     Updates the county with the provided values.
     """
-    try:
+
+    def _update(db: Session, commit: bool = True):
         db_county = crud.update_county(
             db,
             county_id=county_id,
             county_name=county.name,
             country_id=county.country_id,
+            options=crud.COUNTY_DETAILS,
+            commit=commit,
         )
-        return schemas.CountyDetails.from_model(request, db_county)
+        return details.county_details(request, db, db_county)
+
+    try:
+        return await writer.write(db, _update)
     except crud.ItemNotFoundException as err:
         raise HTTPException(status_code=404, detail="No such County") from err
     except crud.UpdateException as err:
@@ -0,0 +1,64 @@
+"""Endpoints for exports of whole tables: /countries/export, /counties/export
+and /cities/export.
+
+The response format is negotiated via the Accept header: NDJSON (default)
+or CSV, both in the format of the bulk import endpoints.
+"""
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from .. import bulk, crud, negotiation
+from ..config import settings
+from ..dependencies import get_read_db
+
+router = APIRouter(
+    tags=["export"],
+    responses={
+        200: {
+            "content": {bulk.NDJSON: {}, bulk.CSV: {}},
+            "description": "All entries as NDJSON or CSV.",
+        },
+        406: {"description": "Requested media type is not available"},
+    },
+)
+
+
+def negotiate_media_type(accept):
+    "Return the export format preferred via accept, NDJSON by default."
+    return negotiation.negotiate(accept, bulk.MEDIA_TYPES)
+
+
+def export(request: Request, db: Session, columns, name: str) -> StreamingResponse:
+    "Return a response streaming all rows of `columns`."
+    media_type = negotiate_media_type(request.headers.get("accept"))
+    if media_type is None:
+        raise negotiation.not_acceptable(bulk.MEDIA_TYPES)
+    rows = crud.iter_rows(db, columns, settings.bulk_batch_size)
+    fieldnames = [column.key for column in columns]
+    extension = "csv" if media_type == bulk.CSV else "ndjson"
+    return StreamingResponse(
+        bulk.iter_export(rows, fieldnames, media_type, settings.bulk_batch_size),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{name}.{extension}"'
+        },
+    )
+
+
+@router.get("/countries/export", response_class=StreamingResponse)
+async def export_countries(request: Request, db: Session = Depends(get_read_db)):
+    "Export all Countries."
+    return export(request, db, crud.COUNTRY_EXPORT_COLUMNS, "countries")
+
+
+@router.get("/counties/export", response_class=StreamingResponse)
+async def export_counties(request: Request, db: Session = Depends(get_read_db)):
+    "Export all Counties."
+    return export(request, db, crud.COUNTY_EXPORT_COLUMNS, "counties")
+
+
+@router.get("/cities/export", response_class=StreamingResponse)
+async def export_cities(request: Request, db: Session = Depends(get_read_db)):
+    "Export all Cities."
+    return export(request, db, crud.CITY_EXPORT_COLUMNS, "cities")
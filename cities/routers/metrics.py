@@ -0,0 +1,16 @@
+"""Endpoint /metrics exposing the metrics in the Prometheus text format.
+"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..metrics import REGISTRY
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    "Return all metrics in the Prometheus text exposition format."
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,19 @@
+"""Endpoint /stats/population with population statistics of all cities.
+"""
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from .. import crud, schemas
+from ..concurrency import run_db
+from ..dependencies import get_read_db
+from ..negotiation import accepts_json
+
+router = APIRouter(
+    prefix="/stats", tags=["stats"], dependencies=[Depends(accepts_json)]
+)
+
+
+@router.get("/population", response_model=schemas.PopulationStats)
+async def get_population_stats(db: Session = Depends(get_read_db)):
+    "Get population statistics of all cities."
+    return await run_db(crud.get_population_stats, db=db)
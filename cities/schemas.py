@@ -2,12 +2,32 @@
 # pylint: disable=R0903
 
 
-from typing import List, TypeVar, Union
+from typing import List, Sequence, TypeVar, Union
+from urllib.parse import urlencode
 
 from fastapi import Request
 from pydantic import BaseModel, Field
 
-from cities import models
+from cities import links, models
+from cities.pagination import encode_cursor
+
+
+def _embed(request: Request, schema, items, limit, listing: str, **params):
+    """Return the embedded items and the link to the listing of the others.
+
+    Without items, nothing is embedded and the link points to the whole
+    listing filtered by `params`.
+    """
+    # pylint: disable=R0913
+    url = links.url_for(request, listing)
+    if items is None:
+        return None, f"{url}?{urlencode(params)}"
+    next_link = None
+    if limit is not None and len(items) > limit:
+        items = items[:limit]
+        params["after"] = encode_cursor(items[-1].name, items[-1].id)
+        next_link = f"{url}?{urlencode(params)}"
+    return [schema.from_model(request, item) for item in items], next_link
 
 
 class CountryBase(BaseModel):
@@ -54,7 +74,9 @@ class Country(CountryBase):
         return Country(
             id=db_country.id,
             name=db_country.name,
-            link=request.url_for("get_country_by_id", country_id=db_country.id),
+            link=links.url_for(
+                request, "get_country_by_id", country_id=db_country.id
+            ),
         )
 
 
@@ -78,7 +100,7 @@ class County(CountyBase):
         return County(
             id=db_county.id,
             name=db_county.name,
-            link=request.url_for("get_county_by_id", county_id=db_county.id),
+            link=links.url_for(request, "get_county_by_id", county_id=db_county.id),
         )
 
 
@@ -90,20 +112,37 @@ class CountryDetails(CountryBase):
     "The Schema Class for detailed Country data in responses."
     id: int
     link: Union[str, None] = Field(description="Link to country details.")
-    counties: List[County] = []
+    counties: Union[List[County], None] = Field(
+        default=[], description="The first counties, null if not embedded."
+    )
+    counties_next: Union[str, None] = Field(
+        default=None,
+        description="Link to the listing of the counties missing in `counties`.",
+    )
 
     @classmethod
     def from_model(
-        cls: CountryDetails_, request: Request, db_country: models.Country
+        cls: CountryDetails_,
+        request: Request,
+        db_country: models.Country,
+        counties: Sequence = None,
+        limit: int = None,
     ) -> CountryDetails_:
-        "Return a CountryDetail Object constructed from a models.Country object."
+        """Return a CountryDetail Object constructed from a models.Country object.
+
+        `counties` are the first counties of the country, None if they are not
+        embedded. If there are more than `limit`, only `limit` are embedded.
+        """
         country = CountryDetails(
             id=db_country.id,
             name=db_country.name,
-            link=request.url_for("get_country_by_id", country_id=db_country.id),
+            link=links.url_for(
+                request, "get_country_by_id", country_id=db_country.id
+            ),
+        )
+        country.counties, country.counties_next = _embed(
+            request, County, counties, limit, "get_counties", country_id=db_country.id
         )
-        for county in db_country.counties:
-            country.counties.append(County.from_model(request, county))
         return country
 
 
@@ -156,12 +195,14 @@ class City(CityBase):
 
     @classmethod
     def from_model(cls: City_, request: Request, db_city: models.City):
-        "Create a schemas.City object from the ORM object."
+        """Create a schemas.City object from the ORM object.
+
+        `db_city` may also be a row with the columns id and name.
+        """
         return City(
             id=db_city.id,
             name=db_city.name,
-            population=db_city.population,
-            link=request.url_for("get_city_by_id", city_id=db_city.id),
+            link=links.url_for(request, "get_city_by_id", city_id=db_city.id),
         )
 
 
@@ -175,7 +216,13 @@ class CountyDetails(CountyBase):
     name: str
     link: Union[str, None] = Field(description="Link to county details.")
     country: Union[Country, None]
-    cities: List[City] = []
+    cities: Union[List[City], None] = Field(
+        default=[], description="The first cities, null if not embedded."
+    )
+    cities_next: Union[str, None] = Field(
+        default=None,
+        description="Link to the listing of the cities missing in `cities`.",
+    )
 
     class Config:
         "Enable to read data from orm object"
@@ -183,17 +230,26 @@ class CountyDetails(CountyBase):
 
     @classmethod
     def from_model(
-        cls: CountyDetails_, request: Request, db_county: models.County
+        cls: CountyDetails_,
+        request: Request,
+        db_county: models.County,
+        cities: Sequence = None,
+        limit: int = None,
     ) -> CountyDetails_:
-        "Return a CountyDetail Object constructed from a models.County object."
+        """Return a CountyDetail Object constructed from a models.County object.
+
+        `cities` are the first cities of the county, None if they are not
+        embedded. If there are more than `limit`, only `limit` are embedded.
+        """
         county = CountyDetails(
             id=db_county.id,
             name=db_county.name,
-            link=request.url_for("get_county_by_id", county_id=db_county.id),
+            link=links.url_for(request, "get_county_by_id", county_id=db_county.id),
         )
         county.country = Country.from_model(request, db_county.country)
-        for city in db_county.cities:
-            county.cities.append(City.from_model(request, city))
+        county.cities, county.cities_next = _embed(
+            request, City, cities, limit, "get_cities", county_id=db_county.id
+        )
         return county
 
 
@@ -249,7 +305,52 @@ class CityDetails(CityBase):
             id=db_city.id,
             name=db_city.name,
             population=db_city.population,
-            link=request.url_for("get_city_by_id", city_id=db_city.id),
+            link=links.url_for(request, "get_city_by_id", city_id=db_city.id),
             county=County.from_model(request, db_city.county),
             country=Country.from_model(request, db_city.county.country),
         )
+
+
+class BulkResult(BaseModel):
+    "Schema class for the result of a bulk import."
+    imported: int = Field(description="Number of created or updated entries.")
+
+
+class CountryBatchEntry(BaseModel):
+    "Result for one id of a batch get of Countries."
+    id: int
+    found: bool = Field(description="False if there is no Country with `id`.")
+    item: Union[CountryDetails, None] = None
+
+
+class CountyBatchEntry(BaseModel):
+    "Result for one id of a batch get of Counties."
+    id: int
+    found: bool = Field(description="False if there is no County with `id`.")
+    item: Union[CountyDetails, None] = None
+
+
+class CityBatchEntry(BaseModel):
+    "Result for one id of a batch get of Cities."
+    id: int
+    found: bool = Field(description="False if there is no City with `id`.")
+    item: Union[CityDetails, None] = None
+
+
+class PopulationBucket(BaseModel):
+    "Schema class for one bucket of a population histogram."
+    lower: int = Field(description="Lower bound (inclusive) of the population.")
+    upper: int = Field(description="Upper bound (exclusive) of the population.")
+    count: int = Field(description="Number of cities in the bucket.")
+
+
+class PopulationStats(BaseModel):
+    "Schema class for population statistics."
+    count: int = Field(description="Number of cities.")
+    sum: int = Field(description="Total population of all cities.")
+    min: Union[int, None] = Field(description="Smallest population of a city.")
+    max: Union[int, None] = Field(description="Largest population of a city.")
+    median: Union[float, None] = Field(description="Median population of the cities.")
+    buckets: List[PopulationBucket] = Field(
+        description="Number of cities by population, one bucket per power of ten."
+    )
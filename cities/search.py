@@ -0,0 +1,132 @@
+"""Indexed substring search on the `name` columns.
+
+`name_contains` returns the filter condition used for the `q` parameter of
+the list endpoints. A plain ``name ILIKE '%q%'`` cannot use the B-tree
+indexes on `name`, so every search would scan the whole table. Instead:
+
+* On SQLite (with FTS5, version >= 3.34) each table gets an external
+  content FTS5 shadow table with the trigram tokenizer, kept in sync by
+  triggers. A trigram phrase query matches exactly the names containing
+  `q`, case folding non-ASCII characters too ("MÖD" finds "Mödling").
+* On PostgreSQL a ``pg_trgm`` GIN index accelerates the ILIKE condition.
+* Otherwise, and for queries the trigram index cannot answer (less than
+  three characters or containing the LIKE wildcards ``%`` and ``_``),
+  the condition falls back to a case insensitive LIKE.
+
+`install` creates the indexes and must be called after the tables exist.
+"""
+import sqlite3
+
+from sqlalchemy import event, func, literal_column, select, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .models import City, Country, County
+
+SEARCHABLE = (Country, County, City)
+
+
+def _has_fts5_trigram() -> bool:
+    "Return True if sqlite3 supports FTS5 with the trigram tokenizer."
+    if sqlite3.sqlite_version_info < (3, 34, 0):
+        return False
+    conn = sqlite3.connect(":memory:")
+    try:
+        options = {row[0] for row in conn.execute("PRAGMA compile_options")}
+    finally:
+        conn.close()
+    return "ENABLE_FTS5" in options
+
+
+FTS5_TRIGRAM = _has_fts5_trigram()
+
+SQLITE_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+    name, content='{table}', content_rowid='id', tokenize='trigram'
+)
+"""
+
+SQLITE_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+        INSERT INTO {table}_fts(rowid, name) VALUES (new.id, new.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+        INSERT INTO {table}_fts({table}_fts, rowid, name)
+        VALUES ('delete', old.id, old.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF name ON {table}
+    BEGIN
+        INSERT INTO {table}_fts({table}_fts, rowid, name)
+        VALUES ('delete', old.id, old.name);
+        INSERT INTO {table}_fts(rowid, name) VALUES (new.id, new.name);
+    END
+    """,
+)
+
+POSTGRES_TRIGRAM_INDEX = """
+CREATE INDEX IF NOT EXISTS ix_{table}_name_trgm ON {table} USING gin (name gin_trgm_ops)
+"""
+
+
+def install(engine: Engine):
+    """Create the search indexes for all SEARCHABLE tables.
+
+    Existing indexes are left alone, new SQLite shadow tables are filled
+    from their content table.
+    """
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite" and FTS5_TRIGRAM:
+            for model in SEARCHABLE:
+                name = model.__tablename__
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE name = :name"),
+                    {"name": f"{name}_fts"},
+                ).first()
+                conn.execute(text(SQLITE_FTS.format(table=name)))
+                for trigger in SQLITE_TRIGGERS:
+                    conn.execute(text(trigger.format(table=name)))
+                if not exists:
+                    conn.execute(
+                        text(f"INSERT INTO {name}_fts({name}_fts) VALUES ('rebuild')")
+                    )
+        elif engine.dialect.name == "postgresql":
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for model in SEARCHABLE:
+                conn.execute(
+                    text(POSTGRES_TRIGRAM_INDEX.format(table=model.__tablename__))
+                )
+
+
+def name_contains(db: Session, model, q: str):
+    "Return a condition matching items of `model` whose name contains `q`."
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        if FTS5_TRIGRAM and len(q) >= 3 and not set(q) & {"%", "_"}:
+            fts = f"{model.__tablename__}_fts"
+            phrase = '"' + q.replace('"', '""') + '"'
+            return model.id.in_(
+                select(literal_column("rowid"))
+                .select_from(table(fts))
+                .where(literal_column(fts).op("MATCH")(phrase))
+            )
+        return func.unicode_lower(model.name).like(f"%{q.lower()}%")
+    return model.name.ilike(f"%{q}%")
+
+
+def _unicode_lower(value):
+    "Lower case `value` like Python does, not just ASCII like SQLite's lower()."
+    return value.lower() if isinstance(value, str) else value
+
+
+@event.listens_for(Engine, "connect")
+def register_unicode_lower(dbapi_connection, _):
+    "Event listener for connect, which adds the unicode_lower() function to sqlite3."
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function(
+            "unicode_lower", 1, _unicode_lower, deterministic=True
+        )
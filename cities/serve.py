@@ -0,0 +1,52 @@
+"""Run the server with several worker processes.
+
+    python -m cities.serve --workers 4 --port 8000
+
+The number of workers defaults to ``CITIES_WORKERS`` (1; 0 starts one
+per CPU core). The database schema is migrated once before the workers
+start. With more than one worker, the response caches of the workers
+are kept consistent via the database (see cities.invalidation):
+``CITIES_CACHE_SYNC_INTERVAL`` defaults to `SYNC_INTERVAL` then, and
+``CITIES_SQLITE_PROFILE`` to ``production``, as in WAL mode the readers
+of one worker do not wait for the writes of another.
+"""
+import argparse
+import os
+
+import uvicorn
+
+from . import database, migrations
+from .config import settings
+
+SYNC_INTERVAL = 0.1
+
+
+def main(argv=None):
+    "Parse the arguments and run the server."
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.workers,
+        help="number of worker processes, 0: one per CPU core "
+        "(default: CITIES_WORKERS)",
+    )
+    args = parser.parse_args(argv)
+    workers = args.workers or os.cpu_count() or 1
+    # the workers would migrate at the same time otherwise
+    migrations.migrate(database.engine)
+    settings.migrate_on_startup = False  # a single worker runs in this process
+    os.environ["CITIES_MIGRATE_ON_STARTUP"] = "false"
+    if workers > 1:
+        # read by the workers, which are started as new processes
+        if not settings.cache_sync_interval:
+            os.environ["CITIES_CACHE_SYNC_INTERVAL"] = str(SYNC_INTERVAL)
+        if settings.sqlite_profile == "default":
+            os.environ["CITIES_SQLITE_PROFILE"] = "production"
+    uvicorn.run("cities.main:app", host=args.host, port=args.port, workers=workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Population statistics kept in a summary table.
+
+The table `population_buckets` holds, per county and decade bucket of the
+population (1-9, 10-99, 100-999, ...), the number of cities and the sum,
+minimum and maximum of their population. The crud functions keep it up to
+date in the same transaction as the cities they change:
+
+* `add_city` and `remove_city` adjust a single row. Only if a removed city
+  was the smallest or largest of its bucket, the minimum or maximum is
+  recomputed from the cities of that county and bucket (an index range on
+  ``(county_id, population)``).
+* The bulk imports mark the table as stale with `rebuild_on_commit`; it is
+  recomputed with a single ``GROUP BY`` right before the session commits.
+
+The crud functions read the old values of a changed city with the row
+locked (on SQLite: the database), so concurrent changes of the same city
+cannot subtract the same old values twice.
+
+`population_stats` sums up the bucket rows of a county, a country or all
+cities, so count, sum, minimum, maximum and the histogram need no scan of
+the cities. The exact median is not O(1), though: it is the row (two for
+an even count) at an offset within the bucket containing it, and the
+database steps through the index up to that offset. This is linear in
+the number of cities of that bucket (of the county, the country or all
+cities), which is a fraction of the cities, but up to all of them.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import String, and_, case, cast, delete, event, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .models import City, County, PopulationBucket
+
+BUCKETS = PopulationBucket.__table__
+STALE = "population_stats_stale"
+
+
+def bucket_of(population: int) -> int:
+    "Return the bucket of population: the number of its digits minus one."
+    return len(str(population)) - 1 if population >= 1 else 0
+
+
+def bucket_bounds(bucket: int) -> Tuple[Optional[int], int]:
+    """Return the lower (inclusive) and upper (exclusive) bound of bucket.
+
+    The lower bound of the first bucket is None, as it also contains
+    populations less than 1.
+    """
+    return (10**bucket if bucket else None), 10 ** (bucket + 1)
+
+
+def _bucket_expression():
+    "Return the SQL expression computing `bucket_of` for City.population."
+    return case(
+        (City.population < 1, 0),
+        else_=func.length(cast(City.population, String)) - 1,
+    )
+
+
+def _in_bucket(bucket: int):
+    "Return the condition on City.population for the cities in bucket."
+    lower, upper = bucket_bounds(bucket)
+    if lower is None:
+        return City.population < upper
+    return and_(City.population >= lower, City.population < upper)
+
+
+def _key(county_id: int, bucket: int):
+    "Return the condition selecting the bucket row of county_id and bucket."
+    return and_(BUCKETS.c.county_id == county_id, BUCKETS.c.bucket == bucket)
+
+
+def add_city(db: Session, county_id: Optional[int], population: Optional[int]):
+    "Add a city of county_id with population to the statistics."
+    if county_id is None or population is None:
+        return
+    postgres = db.get_bind().dialect.name == "postgresql"
+    dialect = postgresql if postgres else sqlite
+    # the two argument min() and max() of SQLite are least() and greatest()
+    least, greatest = (func.least, func.greatest) if postgres else (func.min, func.max)
+    stmt = dialect.insert(BUCKETS).values(
+        county_id=county_id,
+        bucket=bucket_of(population),
+        count=1,
+        total=population,
+        minimum=population,
+        maximum=population,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[BUCKETS.c.county_id, BUCKETS.c.bucket],
+        set_={
+            "count": BUCKETS.c.count + 1,
+            "total": BUCKETS.c.total + population,
+            "minimum": least(BUCKETS.c.minimum, population),
+            "maximum": greatest(BUCKETS.c.maximum, population),
+        },
+    )
+    db.execute(stmt)
+
+
+def remove_city(db: Session, county_id: Optional[int], population: Optional[int]):
+    """Remove a city of county_id with population from the statistics.
+
+    The city must be deleted or changed in the database (flushed) already.
+    """
+    if county_id is None or population is None:
+        return
+    bucket = bucket_of(population)
+    key = _key(county_id, bucket)
+    db.execute(
+        update(BUCKETS)
+        .where(key)
+        .values(count=BUCKETS.c.count - 1, total=BUCKETS.c.total - population)
+    )
+    db.execute(delete(BUCKETS).where(key, BUCKETS.c.count <= 0))
+    remaining = and_(City.county_id == county_id, _in_bucket(bucket))
+    db.execute(
+        update(BUCKETS)
+        .where(
+            key,
+            (BUCKETS.c.minimum == population) | (BUCKETS.c.maximum == population),
+        )
+        .values(
+            minimum=select(func.min(City.population))
+            .where(remaining)
+            .scalar_subquery(),
+            maximum=select(func.max(City.population))
+            .where(remaining)
+            .scalar_subquery(),
+        )
+    )
+
+
+def rebuild(db: Session):
+    "Recompute the whole summary table from the cities."
+    bucket = _bucket_expression()
+    db.execute(delete(BUCKETS))
+    db.execute(
+        BUCKETS.insert().from_select(
+            ["county_id", "bucket", "count", "total", "minimum", "maximum"],
+            select(
+                City.county_id,
+                bucket,
+                func.count(),
+                func.sum(City.population),
+                func.min(City.population),
+                func.max(City.population),
+            )
+            .where(City.county_id.is_not(None), City.population.is_not(None))
+            .group_by(City.county_id, bucket),
+        )
+    )
+
+
+def rebuild_on_commit(db: Session):
+    "Recompute the summary table right before db commits."
+    db.info[STALE] = True
+
+
+@event.listens_for(Session, "before_commit")
+def _rebuild_before_commit(session):
+    "Apply `rebuild_on_commit`."
+    if session.info.pop(STALE, False):
+        rebuild(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session, *_):
+    "Nothing changed, so the summary table is up to date."
+    session.info.pop(STALE, None)
+
+
+def _locate(counts: Dict[int, int], position: int) -> Tuple[int, int]:
+    """Return the bucket of the city at position (ordered by population).
+
+    Return it with the offset of the city within the bucket. Raise a
+    ValueError if position is past the cities counted.
+    """
+    offset = position
+    for bucket in sorted(counts):
+        if offset < counts[bucket]:
+            return bucket, offset
+        offset -= counts[bucket]
+    raise ValueError(f"No city at position {position}")
+
+
+def _median(db: Session, counts: Dict[int, int], condition) -> Optional[float]:
+    """Return the median population of the cities matching condition.
+
+    condition must select the cities counted in counts. Linear in the
+    number of these cities in the bucket of the median.
+    """
+    total = sum(counts.values())
+    if not total:
+        return None
+    values = []
+    for position in sorted({(total - 1) // 2, total // 2}):
+        bucket, offset = _locate(counts, position)
+        query = select(City.population).where(_in_bucket(bucket), condition)
+        values.append(
+            db.execute(
+                query.order_by(City.population).offset(offset).limit(1)
+            ).scalar_one()
+        )
+    return sum(values) / len(values)
+
+
+def population_stats(
+    db: Session, county_id: int = None, country_id: int = None
+) -> dict:
+    """Return the population statistics of a county, a country or all cities.
+
+    The result has the keys count, sum, min, max, median and buckets, a
+    list of dicts with the keys lower, upper and count.
+    """
+    query = select(
+        BUCKETS.c.bucket,
+        func.sum(BUCKETS.c.count),
+        func.sum(BUCKETS.c.total),
+        func.min(BUCKETS.c.minimum),
+        func.max(BUCKETS.c.maximum),
+    ).group_by(BUCKETS.c.bucket)
+    # cities without a county are not in the summary table
+    condition = City.county_id.is_not(None)
+    if county_id is not None:
+        query = query.where(BUCKETS.c.county_id == county_id)
+        condition = City.county_id == county_id
+    elif country_id is not None:
+        county_ids = select(County.id).where(County.country_id == country_id)
+        query = query.where(BUCKETS.c.county_id.in_(county_ids))
+        condition = City.county_id.in_(county_ids)
+    rows = db.execute(query.order_by(BUCKETS.c.bucket)).all()
+    buckets: List[dict] = []
+    for bucket, count, _, _, _ in rows:
+        lower, upper = bucket_bounds(bucket)
+        buckets.append({"lower": lower or 0, "upper": upper, "count": count})
+    return {
+        "count": sum(row[1] for row in rows),
+        "sum": sum(row[2] for row in rows),
+        "min": min((row[3] for row in rows), default=None),
+        "max": max((row[4] for row in rows), default=None),
+        "median": _median(db, {row[0]: row[1] for row in rows}, condition),
+        "buckets": buckets,
+    }
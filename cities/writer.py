@@ -0,0 +1,186 @@
+"""Group commit of concurrent write requests.
+
+Every update commits its own transaction, so under a steady stream of
+small writes (e.g. population feeds PATCHing ``/cities/{id}``) SQLite
+spends its time waiting for the disk and handing over its write lock.
+With ``CITIES_GROUP_COMMIT=true`` the PATCH endpoints hand their update to
+`WRITER` instead, which collects the updates arriving within
+``CITIES_GROUP_COMMIT_DELAY`` seconds (at most ``CITIES_GROUP_COMMIT_MAX_SIZE``)
+and applies them in a single transaction with a single commit.
+
+Each update still gets its own result: if one of them fails, the
+transaction is rolled back, the failing update gets its exception and the
+others are applied again without it. If the commit itself fails, all
+updates of the batch fail. Batches are written one at a time; the next
+batch is collected while the previous one commits.
+
+A batch runs in a task and a session of its own, bound like the session
+of the request which opened it, so a cancelled request (e.g. the client
+disconnected) cannot take the others down with it. The sessions of the
+requests are not used.
+"""
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Set, TypeVar
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .concurrency import run_db
+from .config import settings
+from .metrics import REGISTRY, Histogram
+
+T = TypeVar("T")
+
+BATCH_SIZES = REGISTRY.register(
+    Histogram(
+        "cities_group_commit_batch_size",
+        "Number of updates committed together by the group commit writer.",
+        buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+    )
+)
+
+
+@dataclass(eq=False)
+class Job:
+    "An update waiting to be committed, and its outcome."
+    func: Callable[..., Any]
+    future: "asyncio.Future[Any]"
+    result: Any = None
+    error: Optional[BaseException] = None
+
+
+@dataclass(eq=False)
+class Batch:
+    "The updates committed together, in a session bound to bind."
+    bind: Any  # Engine or Connection
+    jobs: List[Job] = field(default_factory=list)
+    full: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+def apply_batch(db: Session, jobs: List[Job]):
+    """Apply the updates of jobs in one transaction of db and commit it.
+
+    The outcome of each update is stored in its job.
+    """
+    pending = list(jobs)
+    while pending:
+        failed = None
+        for job in pending:
+            try:
+                job.result = job.func(db, commit=False)
+            except Exception as err:  # pylint: disable=W0703
+                job.error, failed = err, job
+                break
+        if failed is None:
+            try:
+                db.commit()
+            except Exception as err:  # pylint: disable=W0703
+                db.rollback()
+                for job in pending:
+                    job.error = err
+            return
+        # the failed update might have left the transaction unusable
+        db.rollback()
+        pending.remove(failed)
+
+
+def _apply_in_new_session(bind, jobs: List[Job]):
+    "Run `apply_batch` in a new session bound to bind."
+    with Session(bind=bind, autoflush=False) as db:
+        apply_batch(db, jobs)
+
+
+def _deliver(batch: Batch):
+    "Set the result or exception of each job of the written batch."
+    for job in batch.jobs:
+        if job.future.done():  # the request was cancelled
+            continue
+        if job.error is not None:
+            job.future.set_exception(job.error)
+        else:
+            job.future.set_result(job.result)
+
+
+class GroupCommitWriter:
+    """Commit the updates submitted within `delay` seconds together.
+
+    The first update submitted opens a batch and waits for the others;
+    a batch is closed early when it has `max_size` updates.
+    """
+    # pylint: disable=R0903
+
+    def __init__(self, delay: float, max_size: int):
+        self.delay = delay
+        self.max_size = max_size
+        self._batch: Optional[Batch] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # the tasks writing batches, referenced until they are done
+        self._tasks: Set["asyncio.Task[None]"] = set()
+
+    async def submit(self, db: Session, func: Callable[..., T]) -> T:
+        """Call func(session, commit=False) in a batch and return its result.
+
+        The session is the one of the batch, bound like db. func must not
+        commit. Its exception is raised if it fails.
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # the state belongs to the event loop it was created in
+            self._loop, self._lock, self._batch = loop, asyncio.Lock(), None
+        job = Job(func, loop.create_future())
+        batch = self._batch
+        if batch is not None and len(batch.jobs) < self.max_size:
+            batch.jobs.append(job)
+            if len(batch.jobs) >= self.max_size:
+                batch.full.set()
+        else:
+            batch = self._batch = Batch(db.get_bind(), [job])
+            task = loop.create_task(self._write(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return await job.future
+
+    async def _write(self, batch: Batch):
+        "Close batch after the delay and write it."
+        try:
+            try:
+                await asyncio.wait_for(batch.full.wait(), self.delay)
+            except asyncio.TimeoutError:
+                pass
+            if self._batch is batch:
+                self._batch = None
+            async with self._lock:
+                try:
+                    await run_in_threadpool(
+                        _apply_in_new_session, batch.bind, batch.jobs
+                    )
+                except Exception as err:  # pylint: disable=W0703
+                    for job in batch.jobs:
+                        job.error = job.error or err
+            BATCH_SIZES.observe(len(batch.jobs))
+            _deliver(batch)
+        finally:
+            if self._batch is batch:
+                self._batch = None
+            # e.g. this task was cancelled when the event loop shut down
+            for job in batch.jobs:
+                if not job.future.done():
+                    job.future.set_exception(
+                        RuntimeError("The group commit was aborted.")
+                    )
+
+
+WRITER = GroupCommitWriter(settings.group_commit_delay, settings.group_commit_max_size)
+
+
+async def write(db: Session, func: Callable[..., T]) -> T:
+    """Call the update func(db, commit=...) and return its result.
+
+    With ``CITIES_GROUP_COMMIT`` the update is committed together with
+    others by `WRITER`, otherwise func commits itself.
+    """
+    if settings.group_commit:
+        return await WRITER.submit(db, func)
+    return await run_db(func, db)
@@ -1,4 +1,4 @@
 :: avtivate venv and start the restexample server
 @ECHO OFF 
 
-call venv\Scripts\python.exe  venv\Scripts\uvicorn.exe cities.main:app
+call venv\Scripts\python.exe -m cities.serve
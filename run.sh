@@ -2,4 +2,4 @@
 
 ## avticate venv and run the cities server on port 8080
 
-source venv/bin/activate && uvicorn cities.main:app
\ No newline at end of file
+source venv/bin/activate && python -m cities.serve
\ No newline at end of file
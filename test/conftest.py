@@ -1,11 +1,12 @@
 """Test fixtures.
 """
+import contextlib
+
 import pytest
 import sqlalchemy_utils
-from cities import crud, schemas
-from cities.database import Base
+from cities import cache, crud, migrations, schemas
 from cities.main import app
-from cities.dependencies import get_db
+from cities.dependencies import get_db, get_read_db
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine, event
 from sqlalchemy.orm import Session, sessionmaker
@@ -33,7 +34,7 @@ def db_engine():
     if not sqlalchemy_utils.database_exists:
         sqlalchemy_utils.create_database(engine.url)
 
-    Base.metadata.create_all(bind=engine)
+    migrations.migrate(engine)
     yield engine
 
 
@@ -57,10 +58,78 @@ def db(db_engine):
     connection.close()
 
 
+@pytest.fixture(scope="function")
+def assert_num_queries(db_engine):
+    """Return a context manager asserting the number of SQL statements.
+
+    Use it to make sure that no lazy loads slip in::
+
+        with assert_num_queries(1):
+            client.get("/cities/1")
+
+    The context manager yields the list of executed statements.
+    """
+
+    @contextlib.contextmanager
+    def _assert_num_queries(expected: int):
+        statements = []
+
+        def _record(conn, cursor, statement, *_):
+            statements.append(statement)
+
+        event.listen(db_engine, "before_cursor_execute", _record)
+        try:
+            yield statements
+        finally:
+            event.remove(db_engine, "before_cursor_execute", _record)
+        assert len(statements) == expected, (
+            f"Expected {expected} statements, got {len(statements)}:\n"
+            + "\n".join(statements)
+        )
+
+    return _assert_num_queries
+
+
+@pytest.fixture(scope="function")
+def query_plan(db_engine, db):
+    """Return a function returning the query plans of the statements of a call.
+
+    ``query_plan(crud.get_cities, db, county="County 1")`` calls the function
+    and returns the output of EXPLAIN QUERY PLAN for each executed statement
+    as a single string per statement.
+    """
+
+    def _query_plan(func, *args, **kwargs):
+        statements = []
+
+        def _record(conn, cursor, statement, parameters, *_):
+            statements.append((statement, parameters))
+
+        event.listen(db_engine, "before_cursor_execute", _record)
+        try:
+            func(*args, **kwargs)
+        finally:
+            event.remove(db_engine, "before_cursor_execute", _record)
+        connection = db.connection()
+        return [
+            "\n".join(
+                row[-1]
+                for row in connection.exec_driver_sql(
+                    f"EXPLAIN QUERY PLAN {statement}", parameters
+                )
+            )
+            for statement, parameters in statements
+        ]
+
+    return _query_plan
+
+
 @pytest.fixture(scope="function")
 def client(db):
     "Return a test client for app."
     app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_read_db] = lambda: db
+    cache.RESPONSE_CACHE.clear()
 
     with TestClient(app) as testclient:
         yield testclient
@@ -13,6 +13,14 @@ def test_get_city(db, cities):
     assert crud.get_city(db, 99).name == "City 99"
 
 
+def test_get_city_with_details(db, cities, assert_num_queries):
+    "CITY_DETAILS must load County and Country with the City."
+    with assert_num_queries(1):
+        city = crud.get_city(db, 1, options=crud.CITY_DETAILS)
+        assert city.county.name == "County 1"
+        assert city.county.country.name == "Country 1"
+
+
 def test_get_cities(db, cities):
     """Get all cities."""
     # Limit is 100 by default; we do not set a limit.
@@ -36,6 +44,13 @@ def test_get_cities(db, cities):
     assert result[0].id == 36
 
 
+def test_get_cities_after(db, cities):
+    "The list must start behind the sort key `after`."
+    result = crud.get_cities(db, after=("City 1", 1), limit=2)
+    assert [city.id for city in result] == [10, 100]
+    assert crud.get_cities(db, after=("City 99", 99)) == []
+
+
 def test_get_cities_with_q(db, cities):
     "Get all cities containing value of q"
     result = crud.get_cities(db, q="ty 9")
@@ -125,6 +140,35 @@ def test_update_city(db, cities):
     assert city.county_id == 2
 
 
+def test_upsert_city(db, cities):
+    "Create a new and update an existing city with upsert_city."
+    city, created = crud.upsert_city(
+        db, 9876, CityCreate(name="bar", population=999, county_id=1)
+    )
+    assert created
+    assert (city.id, city.name, city.population) == (9876, "bar", 999)
+
+    city, created = crud.upsert_city(
+        db, 1, CityCreate(name="foo", population=50, county_id=2)
+    )
+    assert not created
+    assert (city.name, city.population, city.county_id) == ("foo", 50, 2)
+    assert crud.get_population_stats(db, county_id=2)["min"] == 50
+
+
+def test_upsert_city_fail(db, cities):
+    "upsert_city must neither change the id nor accept unknown counties."
+    with pytest.raises(crud.UpdateException):
+        crud.upsert_city(db, 1, CityCreate(id=2, name="foo", population=1, county_id=1))
+    with pytest.raises(crud.UpdateException):
+        crud.upsert_city(db, 1, CityCreate(name="foo", population=1, county_id=9999))
+    with pytest.raises(crud.CreationException):
+        crud.upsert_city(
+            db, 9876, CityCreate(name="foo", population=1, county_id=9999)
+        )
+    assert crud.get_city(db, 1).name == "City 1"
+
+
 def test_delete_city(db, cities):
     "Delete a city."
     city = crud.delete_city(db, 50)
@@ -132,3 +176,77 @@ def test_delete_city(db, cities):
     assert city.id == 50
     # check if delete city is really gone
     assert crud.get_city(db, 50) is None
+
+
+def test_upsert_cities(db, cities):
+    "Create new and update existing cities in one batch."
+    count = crud.upsert_cities(
+        db,
+        [
+            CityCreate(id=1, name="Foo", population=1, county_id=2),
+            CityCreate(id=9999, name="Bar", population=2, county_id=1),
+        ],
+    )
+    db.commit()
+    assert count == 2
+    assert crud.get_city(db, 1).name == "Foo"
+    assert crud.get_city(db, 1).county_id == 2
+    assert crud.get_city(db, 9999).name == "Bar"
+
+    with pytest.raises(crud.CreationException):
+        crud.upsert_cities(db, [CityCreate(name="Baz", population=1, county_id=1)])
+
+
+def test_get_cities_columns(db, cities):
+    "With columns, rows of these columns must be returned."
+    rows = crud.get_cities(
+        db, limit=3, county="County 1", columns=crud.CITY_LIST_COLUMNS
+    )
+    assert [tuple(row) for row in rows] == [(1, "City 1"), (2, "City 2"), (3, "City 3")]
+
+
+def test_get_cities_without_joins(db, cities, query_plan):
+    "Without filters, only the cities table must be read."
+    plan, = query_plan(crud.get_cities, db, columns=crud.CITY_LIST_COLUMNS)
+    assert "counties" not in plan and "countries" not in plan
+    assert "COVERING INDEX ix_cities_name" in plan
+
+
+def test_get_cities_by_county_uses_index(db, cities, query_plan):
+    "Filtering by county must use the (county_id, name) index."
+    plan, = query_plan(
+        crud.get_cities, db, county="County 1", columns=crud.CITY_LIST_COLUMNS
+    )
+    assert "ix_cities_county_id_name (county_id=?)" in plan
+
+
+def test_get_cities_by_country_uses_index(db, cities, query_plan):
+    "Filtering by country must use the indexes of counties and cities."
+    plan, = query_plan(
+        crud.get_cities, db, country="Country 1", columns=crud.CITY_LIST_COLUMNS
+    )
+    assert "ix_cities_county_id_name (county_id=?)" in plan
+    assert "ix_counties_country_id_name (country_id=?)" in plan
+
+
+def test_get_cities_by_population_uses_index(db, cities, query_plan):
+    "Filtering by population must be able to use the (population, name) index."
+    plan, = query_plan(
+        crud.get_cities, db, minpop=100, maxpop=200, columns=crud.CITY_LIST_COLUMNS
+    )
+    assert "ix_cities_population_name (population>? AND population<?)" in plan
+
+
+def test_get_cities_by_county_and_country(db, cities):
+    "County and country filters must be combined."
+    assert len(crud.get_cities(db, county="County 2", country="Country 1")) == 10
+    assert not crud.get_cities(db, county="County 2", country="Country 2")
+
+
+def test_get_cities_of_counties_uses_limit(db, cities, query_plan):
+    "Each county must be read with a LIMITed index search."
+    result = crud.get_cities_of_counties(db, [3, 2], 2)
+    assert [row.id for row in result[2]] == [10, 11]
+    assert [row.id for row in result[3]] == [20, 21]
+    plan, = query_plan(crud.get_cities_of_counties, db, [3, 2], 2)
+    assert plan.count("ix_cities_county_id_name (county_id=?)") == 2
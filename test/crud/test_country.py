@@ -70,3 +70,20 @@ def test_update_country(db, countries):
     "Update an existing country."
     country = crud.update_country(db, 1, country_name="FooBar 1")
     assert country.name == "FooBar 1"
+
+
+def test_upsert_country(db, countries):
+    "Create a new and update an existing country with upsert_country."
+    country, created = crud.upsert_country(db, 1000, CountryCreate(name="bar"))
+    assert created
+    assert (country.id, country.name) == (1000, "bar")
+
+    country, created = crud.upsert_country(db, 1, CountryCreate(name="foo"))
+    assert not created
+    assert country.name == "foo"
+
+    # names are unique
+    with pytest.raises(crud.UpdateException):
+        crud.upsert_country(db, 2, CountryCreate(name="foo"))
+    with pytest.raises(crud.UpdateException):
+        crud.upsert_country(db, 2, CountryCreate(name="baz", id=3))
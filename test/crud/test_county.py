@@ -79,3 +79,42 @@ def test_update_county(db, counties):
     "Update an existing county."
     county = crud.update_county(db, 1, county_name="FooBar 1", country_id=1)
     assert county.name == "FooBar 1"
+
+
+def test_upsert_county(db, counties):
+    "Create a new and update an existing county with upsert_county."
+    county, created = crud.upsert_county(db, 9876, CountyCreate(name="bar", country_id=1))
+    assert created
+    assert (county.id, county.name, county.country.name) == (9876, "bar", "Country 1")
+
+    county, created = crud.upsert_county(db, 1, CountyCreate(name="foo", country_id=2))
+    assert not created
+    assert (county.name, county.country_id) == ("foo", 2)
+
+    with pytest.raises(crud.UpdateException):
+        crud.upsert_county(db, 1, CountyCreate(name="foo", country_id=9999))
+
+
+def test_get_counties_by_country_uses_index(db, counties, query_plan):
+    "Filtering by country must not join but use the (country_id, name) index."
+    plan, = query_plan(crud.get_counties, db, country="Country 1")
+    assert "ix_counties_country_id_name (country_id=?)" in plan
+    assert "SCAN countries" not in plan
+    assert [county.id for county in crud.get_counties(db, country="Country 2")] == [
+        10, 11, 12, 13, 14, 15, 16, 17, 18, 19
+    ]
+
+
+def test_get_counties_of_countries(db, counties):
+    "The first counties of each country must be returned in listing order."
+    result = crud.get_counties_of_countries(db, [2, 1, 999], 3)
+    assert [row.id for row in result[1]] == [1, 2, 3]
+    assert [row.name for row in result[2]] == ["County 10", "County 11", "County 12"]
+    assert result[999] == []
+    assert crud.get_counties_of_countries(db, [], 3) == {}
+
+
+def test_get_counties_by_country_id(db, counties):
+    "Counties can be filtered by the id of their country."
+    result = crud.get_counties(db, country_id=1, columns=crud.COUNTY_LIST_COLUMNS)
+    assert [row.id for row in result] == list(range(1, 10))
@@ -0,0 +1,107 @@
+"""Test endpoints defined in routers/bulk.
+"""
+# pylint: disable=W0613
+import json
+
+import pytest
+
+NDJSON = {"Content-Type": "application/x-ndjson"}
+CSV = {"Content-Type": "text/csv"}
+
+
+def test_bulk_countries_ndjson(client):
+    "Import countries from NDJSON."
+    data = "\n".join(json.dumps({"id": i, "name": f"Land {i}"}) for i in range(1, 11))
+    response = client.post("/countries:bulk", data=data.encode(), headers=NDJSON)
+    assert response.status_code == 200
+    assert response.json() == {"imported": 10}
+    assert client.get("/countries/10").json()["name"] == "Land 10"
+
+
+def test_bulk_cities_csv(client, counties):
+    "Import cities from CSV, including an update of an existing city."
+    data = "id,name,population,county_id\r\n1,Mödling,20000,1\r\n2,Baden,25000,1\r\n"
+    response = client.post("/cities:bulk", data=data.encode(), headers=CSV)
+    assert response.status_code == 200
+    assert response.json() == {"imported": 2}
+
+    data = "id,name,population,county_id\n2,Baden bei Wien,26000,2\n"
+    response = client.post("/cities:bulk", data=data.encode(), headers=CSV)
+    assert response.status_code == 200
+    city = client.get("/cities/2").json()
+    assert city["name"] == "Baden bei Wien"
+    assert city["population"] == 26000
+    assert city["county"]["id"] == 2
+    assert client.get("/cities/1").json()["name"] == "Mödling"
+
+
+def test_bulk_counties_is_atomic(client, countries):
+    "A single invalid record must prevent the whole import."
+    data = "id,name,country_id\n1,Zwettl,1\n2,Baden,notanumber\n"
+    response = client.post("/counties:bulk", data=data.encode(), headers=CSV)
+    assert response.status_code == 400
+    assert "Line 3" in response.json()["detail"]
+    assert client.get("/counties/1").status_code == 404
+
+
+def test_bulk_cities_unknown_county(client, counties):
+    "Referencing a non existing county must fail."
+    data = json.dumps({"id": 1, "name": "Foo", "population": 1, "county_id": 98765})
+    response = client.post("/cities:bulk", data=data.encode(), headers=NDJSON)
+    assert response.status_code == 400
+
+
+def test_bulk_without_id(client):
+    "Bulk imports need explicit ids."
+    data = json.dumps({"name": "Foo"})
+    response = client.post("/countries:bulk", data=data.encode(), headers=NDJSON)
+    assert response.status_code == 400
+
+
+def test_bulk_unsupported_media_type(client):
+    "Only NDJSON and CSV are accepted."
+    response = client.post("/countries:bulk", json=[{"id": 1, "name": "Foo"}])
+    assert response.status_code == 415
+
+
+def test_bulk_clears_cache(client, cities):
+    "A bulk import must clear the response cache."
+    assert client.get("/cities/1").json()["name"] == "City 1"
+    data = "id,name,population,county_id\n1,Mödling,20000,1\n"
+    assert client.post("/cities:bulk", data=data.encode(), headers=CSV).status_code == 200
+    assert client.get("/cities/1").json()["name"] == "Mödling"
+
+
+def test_batch_get_cities(client, cities, assert_num_queries):
+    "Cities must be returned in request order with a single query."
+    with assert_num_queries(1):
+        response = client.get("/cities:batchGet?ids=5,987654,1,5")
+    assert response.status_code == 200
+    entries = response.json()
+    assert [entry["id"] for entry in entries] == [5, 987654, 1, 5]
+    assert [entry["found"] for entry in entries] == [True, False, True, True]
+    assert entries[1]["item"] is None
+    assert entries[0]["item"] == client.get("/cities/5").json()
+    assert entries[2]["item"]["country"]["name"] == "Country 1"
+
+
+def test_batch_get_counties(client, cities, assert_num_queries):
+    "Counties must be loaded with their country and cities without lazy loads."
+    with assert_num_queries(2):
+        response = client.get("/counties:batchGet?ids=2,1")
+    entries = response.json()
+    assert [entry["item"]["name"] for entry in entries] == ["County 2", "County 1"]
+    assert len(entries[0]["item"]["cities"]) == 10
+
+
+def test_batch_get_countries(client, counties):
+    "Countries must be returned with their counties."
+    entries = client.get("/countries:batchGet?ids=3").json()
+    assert entries[0]["found"]
+    assert len(entries[0]["item"]["counties"]) == 10
+
+
+@pytest.mark.parametrize("ids", ["", "1,a", ",".join(["1"] * 101)])
+def test_batch_get_invalid_ids(client, ids):
+    "Invalid or too many ids must be rejected."
+    assert client.get(f"/cities:batchGet?ids={ids}").status_code == 400
@@ -138,3 +138,56 @@ def test_post_with_non_existing_county_id(client, cities):
         "/cities/", json={"name": "FooBar", "population": 77, "county_id": 9999}
     )
     assert response.status_code == 400
+
+
+def test_get_with_cursor(client, cities):
+    "Following the next links must return all cities exactly once."
+    response = client.get("/cities?size=30")
+    ids = [city["id"] for city in response.json()]
+    while "next" in response.links:
+        assert "start=" not in response.links["next"]["url"]
+        response = client.get(response.links["next"]["url"])
+        assert response.status_code == 200
+        ids.extend(city["id"] for city in response.json())
+    assert len(ids) == 110
+    assert len(set(ids)) == 110
+    # same order as paging by start
+    offset_ids = [
+        city["id"]
+        for start in range(1, 111, 30)
+        for city in client.get(f"/cities?start={start}&size=30").json()
+    ]
+    assert ids == offset_ids
+
+
+def test_get_with_invalid_cursor(client, cities):
+    "An invalid cursor must lead to 400."
+    response = client.get("/cities?after=foo")
+    assert response.status_code == 400
+
+
+def test_get_with_fields(client, cities):
+    "With `fields`, only these fields must be returned."
+    response = client.get("/cities/?size=2&fields=link,name")
+    assert response.status_code == 200
+    assert response.json() == [
+        {"name": "City 1", "link": "http://testserver/cities/1"},
+        {"name": "City 10", "link": "http://testserver/cities/10"},
+    ]
+    assert 'rel="next"' in response.headers["Link"]
+    assert "fields=link%2Cname" in response.headers["Link"]
+
+
+def test_get_with_invalid_fields(client, cities):
+    "Unknown fields must be rejected."
+    response = client.get("/cities/?fields=name,population")
+    assert response.status_code == 400
+    assert "population" in response.json()["detail"]
+
+
+def test_not_acceptable(client, cities):
+    "Clients which do not accept JSON must get a 406."
+    response = client.get("/cities/", headers={"Accept": "text/html"})
+    assert response.status_code == 406
+    response = client.get("/cities/", headers={"Accept": "text/html,*/*;q=0.1"})
+    assert response.status_code == 200
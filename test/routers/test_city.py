@@ -21,6 +21,13 @@ def test_get_with_id(client, cities):
     assert result["country"]["link"] == "http://testserver/countries/1"
 
 
+def test_get_with_id_query_count(client, cities, assert_num_queries):
+    "County and Country must be loaded together with the City."
+    with assert_num_queries(1):
+        response = client.get("/cities/1")
+    assert response.status_code == 200
+
+
 def test_get_for_non_exisiting_id(client, cities):
     "Request to non exsiting city must return 404."
     response = client.get("/cities/987654")
@@ -57,6 +64,26 @@ def test_put_update(client, cities):
     assert response.json()["country"]["link"] == "http://testserver/countries/1"
 
 
+def test_put_update_query_count(client, cities, assert_num_queries):
+    "The response of an update must not trigger lazy loads."
+    # select, upsert, 4 for the population statistics, reload
+    with assert_num_queries(7):
+        response = client.put(
+            "/cities/1", json={"name": "BarFoo", "population": 77, "county_id": 1}
+        )
+    assert response.json()["country"]["id"] == 1
+
+
+def test_put_rename_query_count(client, cities, assert_num_queries):
+    "A PUT changing only the name must not touch the population statistics."
+    city = client.get("/cities/1").json()
+    body = {"name": "BarFoo", "population": city["population"], "county_id": 1}
+    # select, upsert, reload
+    with assert_num_queries(3):
+        response = client.put("/cities/1", json=body)
+    assert response.status_code == 200
+
+
 def test_put_update_new_id_must_fail(client, cities):
     "Updates must not replace the id."
     response = client.put(
@@ -167,3 +194,50 @@ def test_patch_non_existing_county(client, cities):
     "Patching a non existing cities leads to 404."
     response = client.patch("/cities/1", json={"county_id": 987654})
     assert response.status_code == 422
+
+
+def test_get_cached(client, cities, assert_num_queries):
+    "A second request must be answered from the cache with the same ETag."
+    response = client.get("/cities/1")
+    etag = response.headers["ETag"]
+    with assert_num_queries(0):
+        cached = client.get("/cities/1")
+    assert cached.status_code == 200
+    assert cached.headers["ETag"] == etag
+    assert cached.json() == response.json()
+
+
+def test_get_not_modified(client, cities):
+    "A matching If-None-Match must return 304 without body."
+    etag = client.get("/cities/1").headers["ETag"]
+    response = client.get("/cities/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert not response.content
+    response = client.get("/cities/1", headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
+
+
+def test_cache_invalidated_by_writes(client, cities):
+    "PUT, PATCH and DELETE must never leave stale responses in the cache."
+    etag = client.get("/cities/1").headers["ETag"]
+    client.put("/cities/1", json={"name": "BarFoo", "population": 77, "county_id": 2})
+    response = client.get("/cities/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["name"] == "BarFoo"
+    assert response.json()["county"]["id"] == 2
+
+    client.patch("/cities/1", json={"population": 78})
+    assert client.get("/cities/1").json()["population"] == 78
+
+    client.delete("/cities/1")
+    assert client.get("/cities/1").status_code == 404
+
+
+def test_cache_invalidated_by_parent(client, cities):
+    "Renaming the county or country must invalidate the City."
+    client.get("/cities/1")
+    client.patch("/counties/1", json={"name": "New County"})
+    assert client.get("/cities/1").json()["county"]["name"] == "New County"
+    client.patch("/countries/1", json={"name": "New Country"})
+    assert client.get("/cities/1").json()["country"]["name"] == "New Country"
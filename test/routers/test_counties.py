@@ -116,3 +116,13 @@ def test_post_with_non_exisiting_country_id(client, counties):
     "POST with country_id without country must raise Error."
     response = client.post("/counties/", json={"name": "FooBar", "country_id": 9999})
     assert response.status_code == 400
+
+
+def test_get_with_cursor(client, counties):
+    "Following the next links must return all counties exactly once."
+    response = client.get("/counties?size=50")
+    ids = [county["id"] for county in response.json()]
+    while "next" in response.links:
+        response = client.get(response.links["next"]["url"])
+        ids.extend(county["id"] for county in response.json())
+    assert len(set(ids)) == len(ids) == 110
@@ -81,3 +81,20 @@ def test_post_with_existing_id(client, countries):
     "POST with an exisiting id must raise Error."
     response = client.post("/countries/", json={"id": 1, "name": "FooBar"})
     assert response.status_code == 400
+
+
+def test_get_with_cursor(client, countries):
+    "Following the next links must return all countries exactly once."
+    response = client.get("/countries?size=50")
+    ids = [country["id"] for country in response.json()]
+    while "next" in response.links:
+        response = client.get(response.links["next"]["url"])
+        ids.extend(country["id"] for country in response.json())
+    assert len(set(ids)) == len(ids) == 110
+
+
+def test_get_with_fields(client, countries):
+    "With `fields`, only these fields must be returned."
+    response = client.get("/countries/?size=3&fields=id")
+    assert response.status_code == 200
+    assert response.json() == [{"id": 1}, {"id": 10}, {"id": 100}]
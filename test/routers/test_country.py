@@ -1,6 +1,7 @@
 """Test endpoints defined in routers/country.
 """
-from cities.routers.country import get_image_file_for, parse_accept_header
+from cities import images
+from cities.config import settings
 # pylint: disable=W0613
 
 
@@ -18,6 +19,13 @@ def test_get_with_id(client, counties):
     assert result["counties"][0]["link"] == "http://testserver/counties/1"
 
 
+def test_get_with_id_query_count(client, counties, assert_num_queries):
+    "The Counties must be loaded with a fixed number of queries."
+    with assert_num_queries(2):
+        response = client.get("/countries/1")
+    assert len(response.json()["counties"]) == 9
+
+
 def test_get_with_non_existing_id(client, counties):
     "Requesting a non existing country must return 404."
     response = client.get("/countries/98765")
@@ -95,22 +103,112 @@ def test_patch_non_existing(client, counties):
     assert response.status_code == 404
 
 
-def test_parse_accept_header():
-    "Function should return the first matching content type."
-    result = parse_accept_header(
-        "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8"
+def test_get_image_types(client, countries):
+    "Each original image must be served as the type requested."
+    for (country_id, media_type), image in images.IMAGES.items():
+        response = client.get(
+            f"/countries/{country_id}", headers={"Accept": media_type}
+        )
+        assert response.headers["content-type"] == media_type
+        with open(image.path, "rb") as file:
+            assert response.content == file.read()
+
+
+def test_cache_invalidated_by_counties(client, counties):
+    "Adding and moving counties must update the cached Country."
+    response = client.get("/countries/1")
+    etag = response.headers["ETag"]
+    assert len(response.json()["counties"]) == 9
+    client.put("/counties/500", json={"name": "New", "country_id": 1})
+    response = client.get("/countries/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()["counties"]) == 10
+    client.patch("/counties/500", json={"country_id": 2})
+    assert len(client.get("/countries/1").json()["counties"]) == 9
+    assert len(client.get("/countries/2").json()["counties"]) == 11
+
+
+def test_get_image(client, countries):
+    "Images are served with caching headers."
+    response = client.get("/countries/1", headers={"Accept": "image/png"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["content-length"] == str(len(response.content))
+    assert response.content.startswith(b"\x89PNG")
+    assert "etag" in response.headers
+    assert "last-modified" in response.headers
+
+
+def test_get_image_not_modified(client, countries):
+    "Conditional requests for unchanged images must get a 304."
+    response = client.get("/countries/1", headers={"Accept": "image/gif"})
+    response = client.get(
+        "/countries/1",
+        headers={"Accept": "image/gif", "If-None-Match": response.headers["etag"]},
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+    response = client.get(
+        "/countries/1",
+        headers={"Accept": "image/gif", "If-None-Match": '"other"'},
     )
-    assert result is None
+    assert response.status_code == 200
 
-    assert parse_accept_header("image/svg+xml") == "image/svg+xml"
-    assert parse_accept_header("image/png") == "image/png"
-    assert parse_accept_header("image/jpeg") == "image/jpeg"
-    assert parse_accept_header("image/gif") == "image/gif"
 
+def test_get_image_not_modified_since(client, countries):
+    "If-Modified-Since must be compared with the modification time."
+    last_modified = client.get(
+        "/countries/1", headers={"Accept": "image/jpeg"}
+    ).headers["last-modified"]
+    response = client.get(
+        "/countries/1",
+        headers={"Accept": "image/jpeg", "If-Modified-Since": last_modified},
+    )
+    assert response.status_code == 304
+    response = client.get(
+        "/countries/1",
+        headers={
+            "Accept": "image/jpeg",
+            "If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT",
+        },
+    )
+    assert response.status_code == 200
+
+
+def test_get_image_not_found(client, countries):
+    "Missing images lead to 404."
+    response = client.get("/countries/9999", headers={"Accept": "image/png"})
+    assert response.status_code == 404
 
-def test_get_image_file_for():
-    "Should return path to the image file."
-    assert "1.png" in get_image_file_for(1, "image/png")
-    assert "2.jpg" in get_image_file_for(2, "image/jpeg")
-    assert "3.gif" in get_image_file_for(3, "image/gif")
-    assert "4.svg" in get_image_file_for(4, "image/svg+xml")
+
+def test_get_image_negotiation(client, countries):
+    "The preferred available type must be served, 406 if there is none."
+    response = client.get(
+        "/countries/1", headers={"Accept": "image/png,image/*;q=0.8"}
+    )
+    assert response.headers["content-type"] == "image/png"
+    response = client.get(
+        "/countries/1", headers={"Accept": "image/gif;q=0.5, image/jpeg"}
+    )
+    assert response.headers["content-type"] == "image/jpeg"
+    response = client.get(
+        "/countries/1",
+        headers={"Accept": "text/html,image/avif,image/webp,*/*;q=0.8"},
+    )
+    assert response.json()["id"] == 1
+    response = client.get("/countries/1", headers={"Accept": "text/html"})
+    assert response.json()["id"] == 1
+    response = client.get("/countries/1", headers={"Accept": "image/bmp"})
+    assert response.status_code == 406
+
+
+def test_get_country_caps_counties(client, counties, monkeypatch):
+    "Only the first counties are embedded, a link points to the others."
+    monkeypatch.setattr(settings, "embed_limit", 5)
+    result = client.get("/countries/2").json()
+    assert [county["id"] for county in result["counties"]] == [10, 11, 12, 13, 14]
+    rest = client.get(result["counties_next"]).json()
+    assert [county["id"] for county in rest] == [15, 16, 17, 18, 19]
+    result = client.get("/countries/2?embed=").json()
+    assert result["counties"] is None
+    assert result["counties_next"] == "http://testserver/counties/?country_id=2"
@@ -1,5 +1,6 @@
 """Test endpoints defined in routers/county.
 """
+from cities.config import settings
 # pylint: disable=W0613
 
 
@@ -17,6 +18,14 @@ def test_get_with_id(client, cities):
     assert result["cities"][0]["link"] == "http://testserver/cities/1"
 
 
+def test_get_with_id_query_count(client, cities, assert_num_queries):
+    "Country and Cities must be loaded with a fixed number of queries."
+    with assert_num_queries(2):
+        response = client.get("/counties/1")
+    assert response.json()["country"]["id"] == 1
+    assert len(response.json()["cities"]) == 9
+
+
 def test_get_with_non_existing_id(client, counties):
     "Requesting a non existing county must return 404."
     response = client.get("/counties/98765")
@@ -127,3 +136,45 @@ def test_patch_non_existing_country(client, counties):
     "Patching a non existing county leads to 404."
     response = client.patch("/counties/1", json={"country_id": 987654})
     assert response.status_code == 422
+
+
+def test_cache_invalidated_by_cities(client, cities):
+    "Adding, moving and deleting cities must update the cached County."
+    assert len(client.get("/counties/1").json()["cities"]) == 9
+    client.put("/cities/500", json={"name": "New", "population": 1, "county_id": 1})
+    assert len(client.get("/counties/1").json()["cities"]) == 10
+    client.patch("/cities/500", json={"county_id": 2})
+    assert len(client.get("/counties/1").json()["cities"]) == 9
+    assert 500 in [city["id"] for city in client.get("/counties/2").json()["cities"]]
+    client.delete("/cities/500")
+    assert 500 not in [
+        city["id"] for city in client.get("/counties/2").json()["cities"]
+    ]
+
+
+def test_get_county_caps_cities(client, cities, monkeypatch):
+    "Only the first cities are embedded, a link points to the others."
+    monkeypatch.setattr(settings, "embed_limit", 4)
+    result = client.get("/counties/2").json()
+    assert [city["id"] for city in result["cities"]] == [10, 11, 12, 13]
+    rest = client.get(result["cities_next"]).json()
+    assert [city["id"] for city in rest] == [14, 15, 16, 17, 18, 19]
+    result = client.get("/counties/1?embed=cities").json()
+    assert len(result["cities"]) == 4
+
+
+def test_get_county_all_cities_embedded(client, cities):
+    "Without more cities than the limit, there is no link."
+    result = client.get("/counties/2").json()
+    assert len(result["cities"]) == 10
+    assert result["cities_next"] is None
+
+
+def test_get_county_without_cities(client, cities):
+    "With embed=, no cities are embedded but linked."
+    result = client.get("/counties/2?embed=").json()
+    assert result["cities"] is None
+    cities = client.get(result["cities_next"]).json()
+    assert [city["id"] for city in cities] == list(range(10, 20))
+    response = client.get("/counties/2?embed=counties")
+    assert response.status_code == 400
@@ -0,0 +1,65 @@
+"""Test endpoints defined in routers/export.
+"""
+# pylint: disable=W0613
+import csv
+import io
+import json
+
+import pytest
+
+
+def test_export_cities_ndjson(client, cities):
+    "Cities must be exported as NDJSON by default."
+    response = client.get("/cities/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = response.text.splitlines()
+    assert len(lines) == 110
+    assert json.loads(lines[0]) == {
+        "id": 1, "name": "City 1", "population": 10, "county_id": 1
+    }
+    assert [json.loads(line)["id"] for line in lines] == list(range(1, 111))
+
+
+def test_export_cities_csv(client, cities):
+    "Cities must be exported as CSV if requested."
+    response = client.get("/cities/export", headers={"Accept": "text/csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="cities.csv"' in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 110
+    assert rows[-1] == {
+        "id": "110", "name": "City 110", "population": "1100", "county_id": "12"
+    }
+
+
+@pytest.mark.parametrize(
+    "accept,media_type",
+    [
+        ("*/*", "application/x-ndjson"),
+        ("text/html, text/csv;q=0.9", "text/csv"),
+        ("text/*", "text/csv"),
+    ],
+)
+def test_export_negotiation(client, countries, accept, media_type):
+    "The format must be negotiated via the Accept header."
+    response = client.get("/countries/export", headers={"Accept": accept})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(media_type)
+
+
+def test_export_not_acceptable(client, countries):
+    "Unsupported media types must be answered with 406."
+    response = client.get("/countries/export", headers={"Accept": "image/png"})
+    assert response.status_code == 406
+
+
+def test_export_import_roundtrip(client, counties):
+    "An export must be importable by the bulk endpoint."
+    exported = client.get("/counties/export", headers={"Accept": "text/csv"}).content
+    assert exported.startswith(b"id,name,country_id\n")
+    response = client.post(
+        "/counties:bulk", data=exported, headers={"Content-Type": "text/csv"}
+    )
+    assert response.json() == {"imported": 110}
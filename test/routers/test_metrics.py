@@ -0,0 +1,24 @@
+"""Test the /metrics endpoint.
+"""
+from cities.metrics import POOL_CHECKOUT
+
+
+def test_get_metrics(client):
+    "Metrics must be rendered in the Prometheus text format."
+    POOL_CHECKOUT.observe(0.002, "primary")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE cities_db_pool_checkout_seconds histogram" in response.text
+    assert 'cities_db_pool_checkout_seconds_bucket{engine="primary",le="0.0025"}' in (
+        response.text
+    )
+
+
+def test_cache_metrics(client, cities):
+    "Hits and misses of the response cache must be exported."
+    client.get("/cities/1")
+    client.get("/cities/1")
+    text = client.get("/metrics").text
+    assert 'cities_response_cache_requests_total{result="hit"}' in text
+    assert 'cities_response_cache_requests_total{result="miss"}' in text
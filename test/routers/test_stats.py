@@ -0,0 +1,44 @@
+"""Test the population statistics endpoints.
+"""
+
+
+def test_get_population_stats(client, cities):
+    "Statistics of all cities."
+    response = client.get("/stats/population")
+    assert response.status_code == 200
+    assert response.json()["count"] == 110
+    assert response.json()["min"] == 10
+    assert response.json()["max"] == 1100
+    assert response.json()["median"] == 555
+
+
+def test_get_county_stats(client, cities):
+    "Statistics of the cities of a county."
+    response = client.get("/counties/1/stats")
+    assert response.status_code == 200
+    assert response.json() == {
+        "count": 9,
+        "sum": 450,
+        "min": 10,
+        "max": 90,
+        "median": 50,
+        "buckets": [{"lower": 10, "upper": 100, "count": 9}],
+    }
+
+
+def test_get_county_stats_not_found(client, cities):
+    "Statistics of an unknown county."
+    assert client.get("/counties/9999/stats").status_code == 404
+
+
+def test_get_country_stats(client, cities):
+    "Statistics of the cities of a country."
+    response = client.get("/countries/2/stats")
+    assert response.status_code == 200
+    assert response.json()["count"] == 21
+    assert response.json()["min"] == 900
+
+
+def test_get_country_stats_not_found(client, cities):
+    "Statistics of an unknown country."
+    assert client.get("/countries/9999/stats").status_code == 404
@@ -0,0 +1,93 @@
+"""Test the parsers and writers in cities.bulk.
+"""
+import asyncio
+import io
+import json
+
+import pytest
+from cities import bulk
+from cities.schemas import CountryCreate
+
+
+async def _chunks(data: bytes, size: int):
+    "Yield data in chunks of size bytes."
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+async def _collect(data: bytes, size: int, parser, batch_size: int):
+    "Return all batches parsed from data, streamed in chunks of size bytes."
+    batches = bulk.aiter_batches(_chunks(data, size), parser, batch_size)
+    return [batch async for batch in batches]
+
+
+@pytest.mark.parametrize("size", [1, 3, 1000])
+def test_aiter_batches_csv(size):
+    "Lines and multi byte characters must survive any chunk boundaries."
+    data = "\ufeffid,name\n1,Niederösterreich\n2,Wien\n3,Tirol".encode()
+    parser = bulk.RecordParser(bulk.CSV, CountryCreate)
+    batches = asyncio.run(_collect(data, size, parser, 2))
+    assert [[country.name for country in batch] for batch in batches] == [
+        ["Niederösterreich", "Wien"],
+        ["Tirol"],
+    ]
+
+
+def test_iter_batches_ndjson():
+    "Empty lines are skipped."
+    lines = ['{"id": 1, "name": "Wien"}\n', "\n", '{"id": 2, "name": "Tirol"}\n']
+    parser = bulk.RecordParser(bulk.NDJSON, CountryCreate)
+    batches = list(bulk.iter_batches(lines, parser, 10))
+    assert [country.id for country in batches[0]] == [1, 2]
+
+
+@pytest.mark.parametrize(
+    "media_type, lines, line",
+    [
+        (bulk.NDJSON, ['{"id": 1, "name": "Wien"}', "[1, 2]"], 2),
+        (bulk.NDJSON, ["{"], 1),
+        (bulk.CSV, ["id,name", "1,Wien,too much"], 2),
+        (bulk.CSV, ["id,name", "x,Wien"], 2),
+        (bulk.CSV, ["id,name", '1,"Wien', "und Umgebung"], 2),
+    ],
+)
+def test_invalid_records(media_type, lines, line):
+    "Invalid records must raise a BulkImportError with the line number."
+    parser = bulk.RecordParser(media_type, CountryCreate)
+    with pytest.raises(bulk.BulkImportError) as err:
+        list(bulk.iter_batches(lines, parser, 10))
+    assert err.value.line == line
+
+
+@pytest.mark.parametrize("size", [1, 1000])
+def test_csv_round_trip(size):
+    "Exported CSV must be imported again, even with line breaks in the fields."
+    names = ["Wien", 'Der "Wald"', "Nieder\nösterreich", "Ober\r\nösterreich", "\n"]
+    rows = [(i, name) for i, name in enumerate(names, 1)]
+    data = b"".join(bulk.iter_export(rows, ["id", "name"], bulk.CSV, 2))
+    parser = bulk.RecordParser(bulk.CSV, CountryCreate)
+    batches = asyncio.run(_collect(data, size, parser, 10))
+    assert [(country.id, country.name) for country in batches[0]] == rows
+    lines = io.StringIO(data.decode(), newline="")
+    parser = bulk.RecordParser(bulk.CSV, CountryCreate)
+    batches = list(bulk.iter_batches(lines, parser, 10))
+    assert [(country.id, country.name) for country in batches[0]] == rows
+
+
+def test_unsupported_media_type():
+    "Unknown media types must be rejected."
+    with pytest.raises(ValueError):
+        bulk.RecordParser("application/json", CountryCreate)
+
+
+def test_iter_export_batches():
+    "Exports must be written in chunks of batch_size lines."
+    rows = [(i, f"City {i}") for i in range(5)]
+    chunks = list(bulk.iter_export(rows, ["id", "name"], bulk.CSV, 2))
+    assert chunks == [
+        b"id,name\n0,City 0\n1,City 1\n",
+        b"2,City 2\n3,City 3\n",
+        b"4,City 4\n",
+    ]
+    chunks = list(bulk.iter_export(rows[:1], ["id", "name"], bulk.NDJSON, 2))
+    assert [json.loads(chunk) for chunk in chunks] == [{"id": 0, "name": "City 0"}]
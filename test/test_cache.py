@@ -0,0 +1,107 @@
+"""Test the response cache.
+"""
+# pylint: disable=W0212
+from cities.cache import EVICTIONS, REQUESTS, ResponseCache, make_etag
+from cities.config import settings
+from cities.crud import create_country, update_country
+from cities.schemas import CountryCreate
+from cities import cache
+
+
+def test_get_put():
+    "Stored entries must be returned with a strong ETag."
+    response_cache = ResponseCache(10, 60)
+    misses = REQUESTS.value("miss")
+    hits = REQUESTS.value("hit")
+    assert response_cache.get("a") is None
+    entry = response_cache.put("a", b"{}", [("city", 1)], response_cache.generation)
+    assert entry.etag == make_etag(b"{}")
+    assert entry.etag.startswith('"') and entry.etag.endswith('"')
+    assert response_cache.get("a") is entry
+    assert REQUESTS.value("miss") == misses + 1
+    assert REQUESTS.value("hit") == hits + 1
+
+
+def test_lru_eviction():
+    "The least recently used entry must be evicted first."
+    response_cache = ResponseCache(2, 60)
+    evictions = EVICTIONS.value("size")
+    for key in "ab":
+        response_cache.put(key, b"1", [], response_cache.generation)
+    response_cache.get("a")
+    response_cache.put("c", b"1", [], response_cache.generation)
+    assert response_cache.get("b") is None
+    assert response_cache.get("a") and response_cache.get("c")
+    assert EVICTIONS.value("size") == evictions + 1
+
+
+def test_ttl(monkeypatch):
+    "Entries must expire after ttl seconds."
+    now = 1000.0
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now)
+    response_cache = ResponseCache(10, 5)
+    response_cache.put("a", b"1", [], response_cache.generation)
+    now += 4
+    assert response_cache.get("a")
+    now += 1
+    assert response_cache.get("a") is None
+    assert not response_cache._entries
+
+
+def test_invalidate():
+    "Only entries with one of the tags must be removed."
+    response_cache = ResponseCache(10, 60)
+    response_cache.put("a", b"1", [("city", 1), ("county", 1)], 0)
+    response_cache.put("b", b"1", [("city", 2), ("county", 1)], 0)
+    response_cache.put("c", b"1", [("city", 3), ("county", 2)], 0)
+    response_cache.invalidate([("county", 1)])
+    assert response_cache.get("a") is None
+    assert response_cache.get("b") is None
+    assert response_cache.get("c")
+    assert set(response_cache._keys_by_tag) == {("city", 3), ("county", 2)}
+
+
+def test_no_put_after_invalidation():
+    "Data read before an invalidation must not be stored."
+    response_cache = ResponseCache(10, 60)
+    generation = response_cache.generation
+    response_cache.invalidate([("city", 1)])
+    response_cache.put("a", b"1", [("city", 1)], generation)
+    assert response_cache.get("a") is None
+
+
+def test_invalidate_on_commit(db):
+    "Invalidations must wait for the commit and be dropped on rollback."
+    response_cache = cache.RESPONSE_CACHE
+    response_cache.put("a", b"1", [("country", 1)], response_cache.generation)
+    cache.invalidate_on_commit(db, [("country", 1)])
+    db.rollback()
+    assert response_cache.get("a")
+    create_country(db, CountryCreate(name="Austria"), 1)
+    assert response_cache.get("a") is None
+    response_cache.put("a", b"1", [("country", 1)], response_cache.generation)
+    update_country(db, 1, "Österreich")
+    assert response_cache.get("a") is None
+
+
+def test_key_contains_media_type(client, countries):
+    "Responses negotiated to different media types must be cached apart."
+    for accept in ("application/json", "text/html"):
+        response = client.get("/countries/1", headers={"Accept": accept})
+        assert response.headers["vary"] == "Accept"
+    assert len(cache.RESPONSE_CACHE) == 2
+    response = client.get("/countries/1", headers={"Accept": "application/json"})
+    assert response.headers["vary"] == "Accept"
+    assert len(cache.RESPONSE_CACHE) == 2
+
+
+def test_no_put_within_replica_lag(client, countries, monkeypatch):
+    "Responses read from a replica right after an invalidation must not be cached."
+    monkeypatch.setattr(settings, "replica_url", "sqlite://")
+    monkeypatch.setattr(settings, "replica_max_lag", 60)
+    cache.RESPONSE_CACHE.invalidate([("country", 1)])
+    assert client.get("/countries/1").status_code == 200
+    assert len(cache.RESPONSE_CACHE) == 0
+    monkeypatch.setattr(cache.RESPONSE_CACHE, "invalidated", float("-inf"))
+    assert client.get("/countries/1").status_code == 200
+    assert len(cache.RESPONSE_CACHE) == 1
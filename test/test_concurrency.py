@@ -0,0 +1,38 @@
+"""Test the helpers in cities.concurrency.
+"""
+# pylint: disable=W0613
+import asyncio
+import threading
+
+from cities.concurrency import run_db
+from cities.config import settings
+
+
+def test_run_db_offloads(monkeypatch):
+    "With db_offload set, the function must run in a worker thread."
+    monkeypatch.setattr(settings, "db_offload", True)
+    loop_thread = threading.get_ident()
+    assert asyncio.run(run_db(threading.get_ident)) != loop_thread
+
+
+def test_run_db_inline(monkeypatch):
+    "Without db_offload, the function must run on the event loop."
+    monkeypatch.setattr(settings, "db_offload", False)
+    loop_thread = threading.get_ident()
+    assert asyncio.run(run_db(threading.get_ident)) == loop_thread
+
+
+def test_run_db_passes_arguments(monkeypatch):
+    "Positional and keyword arguments must be passed through."
+    monkeypatch.setattr(settings, "db_offload", True)
+    assert asyncio.run(run_db(max, 1, 3, key=lambda x: -x)) == 1
+
+
+def test_endpoints_without_offload(client, cities, monkeypatch):
+    "The endpoints must work the same with db_offload disabled."
+    monkeypatch.setattr(settings, "db_offload", False)
+    response = client.get("/cities/1")
+    assert response.status_code == 200
+    assert response.json()["name"] == "City 1"
+    response = client.get("/cities/?size=5")
+    assert len(response.json()) == 5
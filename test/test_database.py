@@ -0,0 +1,95 @@
+"""Test the database configuration in cities.database.
+"""
+import pytest
+from cities.config import Settings, settings
+from cities.database import TimedQueuePool, make_engine
+from cities.metrics import POOL_CHECKOUT
+from pydantic import ValidationError
+from sqlalchemy import create_engine, text
+
+
+def _pragma(engine, name):
+    "Return the value of PRAGMA name for a new connection of engine."
+    with engine.connect() as conn:
+        return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+
+def test_default_profile(tmp_path, monkeypatch):
+    "The default profile must only enable foreign keys."
+    monkeypatch.setattr(settings, "sqlite_profile", "default")
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    assert _pragma(engine, "foreign_keys") == 1
+    assert _pragma(engine, "journal_mode") == "delete"
+
+
+def test_production_profile(tmp_path, monkeypatch):
+    "The production profile must be applied on connect."
+    monkeypatch.setattr(settings, "sqlite_profile", "production")
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    assert _pragma(engine, "foreign_keys") == 1
+    assert _pragma(engine, "journal_mode") == "wal"
+    assert _pragma(engine, "synchronous") == 1  # NORMAL
+    assert _pragma(engine, "busy_timeout") == 5000
+    assert _pragma(engine, "temp_store") == 2  # MEMORY
+
+
+def test_pragma_overrides(tmp_path, monkeypatch):
+    "Single PRAGMAs of the profile can be overridden."
+    monkeypatch.setattr(settings, "sqlite_profile", "production")
+    monkeypatch.setattr(settings, "sqlite_pragmas", {"busy_timeout": 100})
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    assert _pragma(engine, "busy_timeout") == 100
+    assert _pragma(engine, "journal_mode") == "wal"
+
+
+def test_invalid_pragmas():
+    "PRAGMA names and values must be validated."
+    with pytest.raises(ValidationError):
+        Settings(sqlite_pragmas={"cache_size; DROP TABLE cities": 1})
+    with pytest.raises(ValidationError):
+        Settings(sqlite_profile="fast")
+
+
+def test_settings_from_environment(monkeypatch):
+    "Database url and pool sizes must be read from the environment."
+    monkeypatch.setenv("CITIES_DATABASE_URL", "postgresql://user:pw@db/cities")
+    monkeypatch.setenv("CITIES_POOL_SIZE", "20")
+    monkeypatch.setenv("CITIES_POOL_PRE_PING", "true")
+    config = Settings()
+    assert config.database_url == "postgresql://user:pw@db/cities"
+    assert config.replica_url is None
+    assert config.pool_size == 20
+    assert config.pool_pre_ping
+
+
+def test_make_engine_pool(tmp_path, monkeypatch):
+    "The pool must be configured by settings."
+    monkeypatch.setattr(settings, "pool_size", 3)
+    monkeypatch.setattr(settings, "max_overflow", 1)
+    monkeypatch.setattr(settings, "pool_recycle", 600)
+    monkeypatch.setattr(settings, "pool_pre_ping", True)
+    engine = make_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    assert isinstance(engine.pool, TimedQueuePool)
+    assert engine.pool.size() == 3
+    assert engine.pool._max_overflow == 1  # pylint: disable=W0212
+    assert engine.pool._recycle == 600  # pylint: disable=W0212
+    assert engine.pool._pre_ping  # pylint: disable=W0212
+
+
+def test_make_engine_memory():
+    "In-memory databases must keep the default pool."
+    engine = make_engine("sqlite://")
+    assert not isinstance(engine.pool, TimedQueuePool)
+
+
+def test_pool_checkout_metric(tmp_path):
+    "Checking out a connection must be recorded per engine."
+    engine = make_engine(f"sqlite:///{tmp_path / 'test.db'}", "test")
+    before = POOL_CHECKOUT.count("test")
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert POOL_CHECKOUT.count("test") == before + 1
+    engine.pool = engine.pool.recreate()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert POOL_CHECKOUT.count("test") == before + 2
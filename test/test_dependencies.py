@@ -0,0 +1,66 @@
+"""Test the dependency injection functions.
+"""
+# pylint: disable=W0613
+import pytest
+from cities.dependencies import get_db, get_read_db
+from cities.main import app
+
+
+@pytest.fixture(name="session_counter")
+def fixture_session_counter(client, db):
+    "Count the sessions handed out by get_db during a request."
+    calls = []
+
+    def _get_db():
+        calls.append(db)
+        yield db
+
+    app.dependency_overrides[get_db] = _get_db
+    app.dependency_overrides[get_read_db] = _get_db
+    return calls
+
+
+def test_get_db_is_lazy():
+    "A new session must not hold a connection before its first query."
+    dependency = get_db()
+    session = next(dependency)
+    try:
+        assert not session.in_transaction()
+    finally:
+        dependency.close()
+
+
+def test_one_session_per_request(client, cities, session_counter):
+    "A request must use exactly one session."
+    assert client.get("/cities/1").status_code == 200
+    assert len(session_counter) == 1
+
+
+@pytest.mark.parametrize(
+    "url",
+    ["/cities/", "/cities/1", "/counties/", "/counties/1", "/countries/", "/countries/1"],
+)
+def test_options_without_session(client, session_counter, url):
+    "OPTIONS requests must not create a session."
+    assert client.options(url).status_code == 204
+    assert not session_counter
+
+
+def test_get_read_db_for_reads(client, db):
+    "GET requests must use the read session, writes the primary session."
+    calls = []
+
+    def _get_read_db():
+        calls.append("read")
+        yield db
+
+    def _get_db():
+        calls.append("write")
+        yield db
+
+    app.dependency_overrides[get_read_db] = _get_read_db
+    app.dependency_overrides[get_db] = _get_db
+    assert client.get("/countries/").status_code == 200
+    assert calls == ["read"]
+    assert client.put("/countries/1", json={"name": "Austria"}).status_code == 201
+    assert calls == ["read", "write"]
@@ -0,0 +1,160 @@
+"""Test the resized and transcoded country images.
+"""
+import asyncio
+import dataclasses
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from cities import derivatives, images
+
+PIL = pytest.importorskip("PIL.Image")
+
+
+@pytest.fixture
+def disk_cache(tmp_path, monkeypatch):
+    "Use an empty cache of derivatives in a temporary directory."
+    cache = derivatives.DiskCache(str(tmp_path), 1024 * 1024)
+    monkeypatch.setattr(derivatives, "CACHE", cache)
+    return cache
+
+
+def test_render_resizes():
+    "The image must be scaled down keeping the aspect ratio."
+    source = images.IMAGES[1, "image/png"]
+    with PIL.open(source.path) as original:
+        width, height = original.size
+    data = derivatives.render(source.path, "PNG", 32)
+    with PIL.open(io.BytesIO(data)) as image:
+        assert image.format == "PNG"
+        assert image.size == (32, round(height * 32 / width))
+
+
+def test_render_does_not_scale_up():
+    "Images must never be scaled up."
+    source = images.IMAGES[1, "image/gif"]
+    data = derivatives.render(source.path, "JPEG", 100_000)
+    with PIL.open(io.BytesIO(data)) as image, PIL.open(source.path) as original:
+        assert image.format == "JPEG"
+        assert image.size == original.size
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    "The cache must stay within its size, removing the oldest files first."
+    cache = derivatives.DiskCache(str(tmp_path), 25)
+    cache.put("a", b"x" * 10)
+    cache.put("b", b"x" * 10)
+    assert cache.get("a")
+    cache.put("c", b"x" * 10)
+    assert cache.get("b") is None
+    assert not os.path.exists(tmp_path / "b")
+    assert cache.get("a") and cache.get("c")
+    assert cache.size == 20
+    # files of an earlier run are taken over
+    assert derivatives.DiskCache(str(tmp_path), 25).size == 20
+
+
+def test_disk_cache_drops_removed_files(tmp_path):
+    "Files removed by another process must be missing, so they are rendered again."
+    cache = derivatives.DiskCache(str(tmp_path), 25)
+    cache.put("a", b"x" * 10)
+    os.remove(tmp_path / "a")
+    assert cache.get("a") is None
+    assert cache.size == 0
+
+
+def test_file_name_depends_on_original():
+    "A replaced original must not be served from the derivatives of the old one."
+    source = images.IMAGES[1, "image/png"]
+    replaced = dataclasses.replace(source, etag='"0123456789abcdef0"')
+    assert derivatives.file_name(1, source, "PNG", 16) != derivatives.file_name(
+        1, replaced, "PNG", 16
+    )
+
+
+def test_cancelled_rendering(disk_cache, monkeypatch):
+    "Requests waiting for a rendering must fail if the one rendering is cancelled."
+    started, release = threading.Event(), threading.Event()
+
+    def render(*_):
+        started.set()
+        release.wait(5)
+        return b"x"
+
+    source = images.IMAGES[1, "image/png"]
+    executor = ThreadPoolExecutor(1)
+    monkeypatch.setattr(derivatives, "render", render)
+    monkeypatch.setattr(derivatives, "pool", lambda: executor)
+
+    async def run():
+        first = asyncio.create_task(derivatives.derivative(source, "a", "PNG", 16))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        second = asyncio.create_task(derivatives.derivative(source, "a", "PNG", 16))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(second, 1)
+        assert not derivatives._pending  # pylint: disable=W0212
+
+    try:
+        asyncio.run(run())
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_broken_pool_is_replaced(disk_cache, monkeypatch):
+    "A pool broken by a crashed worker must not be used for later renderings."
+
+    class BrokenPool(ThreadPoolExecutor):
+        "An executor like a process pool whose worker was killed."
+
+        def submit(self, *args, **kwargs):  # pylint: disable=W0221
+            raise BrokenProcessPool("A worker was killed.")
+
+    broken = BrokenPool(1)
+    monkeypatch.setattr(derivatives, "_POOL", broken)
+    source = images.IMAGES[1, "image/png"]
+    with pytest.raises(BrokenProcessPool):
+        asyncio.run(derivatives.derivative(source, "a", "PNG", 16))
+    assert derivatives._POOL is None  # pylint: disable=W0212
+
+
+def test_get_resized_image(client, countries, disk_cache):
+    "?w must return a scaled down image, which is cached on disk."
+    response = client.get("/countries/1?w=16", headers={"Accept": "image/png"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    with PIL.open(io.BytesIO(response.content)) as image:
+        assert image.width == 16
+    source = images.IMAGES[1, "image/png"]
+    assert disk_cache.get(derivatives.file_name(1, source, "PNG", 16))
+    etag = response.headers["etag"]
+    response = client.get(
+        "/countries/1?w=16", headers={"Accept": "image/png", "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+
+def test_get_transcoded_image(client, countries, disk_cache):
+    "WebP images must be rendered from the originals."
+    if "image/webp" not in derivatives.RENDERABLE:
+        pytest.skip("Pillow without WebP support")
+    response = client.get("/countries/2", headers={"Accept": "image/webp"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    with PIL.open(io.BytesIO(response.content)) as image:
+        assert image.format == "WEBP"
+    source = images.IMAGES[2, "image/png"]
+    assert disk_cache.get(derivatives.file_name(2, source, "WEBP", None))
+
+
+def test_get_resized_svg(client, countries, disk_cache):
+    "SVGs scale by themselves, so the original is returned."
+    response = client.get("/countries/1?w=16", headers={"Accept": "image/svg+xml"})
+    assert response.content == images.IMAGES[1, "image/svg+xml"].body
+    assert disk_cache.size == 0
@@ -0,0 +1,24 @@
+"""Test the in-memory index of country images.
+"""
+import os
+
+from cities import images
+
+
+def test_load_images():
+    "All images in the data directory must be indexed by id and media type."
+    files = os.listdir(images.DATA_DIR)
+    assert len(images.IMAGES) == len(files)
+    image = images.IMAGES[1, "image/png"]
+    with open(os.path.join(images.DATA_DIR, "1.png"), "rb") as file:
+        assert image.body == file.read()
+    assert image.etag.startswith('"')
+    assert image.last_modified.endswith("GMT")
+
+
+def test_load_images_ignores_other_files(tmp_path):
+    "Only files named <id>.<known extension> are images."
+    (tmp_path / "1.svg").write_bytes(b"<svg/>")
+    (tmp_path / "README.txt").write_bytes(b"")
+    (tmp_path / "x.png").write_bytes(b"")
+    assert list(images.load_images(str(tmp_path))) == [(1, "image/svg+xml")]
@@ -0,0 +1,96 @@
+"""Test the request and database metrics.
+"""
+# pylint: disable=W0613
+import pytest
+from cities import instrumentation
+from cities.config import settings
+from cities.database import make_engine
+from cities.instrumentation import (
+    REQUEST_DURATION, REQUEST_STATEMENTS, RESPONSE_SIZE, STATEMENT_DURATION,
+    instrument_engine,
+)
+from sqlalchemy import text
+
+
+@pytest.fixture(name="instrumented", scope="module")
+def fixture_instrumented(db_engine):
+    "Instrument the engine of the tests."
+    instrument_engine(db_engine, "test")
+
+
+def test_route_label(client, cities):
+    "Requests must be recorded per route template, method and status."
+    before = REQUEST_DURATION.count("GET", "/cities/{city_id}", "200")
+    before_404 = REQUEST_DURATION.count("GET", "/cities/{city_id}", "404")
+    client.get("/cities/1")
+    client.get("/cities/2")
+    client.get("/cities/987654")
+    assert REQUEST_DURATION.count("GET", "/cities/{city_id}", "200") == before + 2
+    assert REQUEST_DURATION.count("GET", "/cities/{city_id}", "404") == before_404 + 1
+
+
+def test_unmatched_route(client):
+    "Unknown paths must share one label."
+    before = REQUEST_DURATION.count("GET", instrumentation.UNMATCHED, "404")
+    client.get("/no/such/path")
+    assert REQUEST_DURATION.count("GET", instrumentation.UNMATCHED, "404") == before + 1
+
+
+def test_response_size(client, cities):
+    "The size of the response body must be recorded."
+    response = client.get("/countries/")
+    _, total = RESPONSE_SIZE._values[("GET", "/countries/")]  # pylint: disable=W0212
+    assert total >= len(response.content)
+
+
+def test_statement_count(client, cities, instrumented):
+    "The SQL statements of a request must be counted."
+    labels = ("GET", "/cities/{city_id}")
+    count = REQUEST_STATEMENTS.count(*labels)
+    statements = STATEMENT_DURATION.count("test")
+    client.get("/cities/1")
+    assert REQUEST_STATEMENTS.count(*labels) == count + 1
+    # one statement on a cache miss
+    assert STATEMENT_DURATION.count("test") == statements + 1
+    counts, _ = REQUEST_STATEMENTS._values[labels]  # pylint: disable=W0212
+    assert counts[1] >= 1  # bucket for exactly one statement
+
+
+def test_pool_gauge(tmp_path):
+    "The state of the pool must be exported."
+    engine = make_engine(f"sqlite:///{tmp_path / 'test.db'}", "gauge")
+    instrument_engine(engine, "gauge")
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        assert instrumentation._pool_connections()[("gauge", "checked_out")] == 1
+    assert instrumentation._pool_connections()[("gauge", "idle")] == 1
+
+
+def test_disabled(client, cities, monkeypatch):
+    "Nothing must be recorded if metrics are disabled."
+    monkeypatch.setattr(settings, "metrics_enabled", False)
+    before = REQUEST_DURATION.count("GET", "/cities/{city_id}", "200")
+    client.get("/cities/1")
+    assert REQUEST_DURATION.count("GET", "/cities/{city_id}", "200") == before
+
+
+def test_engine_not_instrumented_if_disabled(tmp_path, monkeypatch):
+    "Without metrics, the statements of an engine must not be timed."
+    monkeypatch.setattr(settings, "metrics_enabled", False)
+    engine = make_engine(f"sqlite:///{tmp_path / 'test.db'}", "disabled")
+    instrument_engine(engine, "disabled")
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        assert "statement_start" not in conn.info
+    assert STATEMENT_DURATION.count("disabled") == 0
+
+
+def test_metrics_endpoint(client, cities):
+    "The request metrics must be rendered by /metrics."
+    client.get("/cities/1")
+    body = client.get("/metrics").text
+    assert "cities_http_requests_in_flight 1" in body
+    assert (
+        'cities_http_request_duration_seconds_count{method="GET",'
+        'route="/cities/{city_id}",status="200"}'
+    ) in body
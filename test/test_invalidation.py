@@ -0,0 +1,170 @@
+"""Test the invalidation of the response caches of other processes.
+"""
+# pylint: disable=W0613
+import os
+import time
+
+import pytest
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import Session
+
+from cities import crud, invalidation, migrations, serve
+from cities.cache import ResponseCache
+from cities.config import settings
+from cities.schemas import CityCreate, CountryCreate, CountyCreate
+
+
+@pytest.fixture(name="engine")
+def fixture_engine(tmp_path, monkeypatch):
+    """Return the engine of a database file with one country, county and 2 cities.
+
+    Other processes are simulated by other connections to the file.
+    """
+    monkeypatch.setattr(settings, "cache_sync_interval", 0.1)
+    engine = create_engine(f"sqlite:///{tmp_path / 'cities.db'}")
+    migrations.migrate(engine)
+    with Session(engine) as db:
+        crud.create_country(db, CountryCreate(name="Country 1"))
+        crud.create_county(db, CountyCreate(name="County 1", country_id=1))
+        for i in (1, 2):
+            city = CityCreate(name=f"City {i}", population=i, county_id=1)
+            crud.create_city(db, city)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(name="poller")
+def fixture_poller(engine):
+    "Return a started Poller of a new response cache with entries for both cities."
+    response_cache = ResponseCache(10, 60)
+    for i in (1, 2):
+        response_cache.put(f"/cities/{i}", b"{}", [("city", i)], 0)
+    poller = invalidation.Poller(engine, response_cache)
+    poller.start()
+    yield poller
+    poller.close()
+
+
+def test_check_unchanged(poller):
+    "Without writes, nothing must be invalidated."
+    assert poller.check() == "unchanged"
+    assert len(poller.response_cache) == 2
+
+
+def test_check_invalidates_tags(engine, poller):
+    "The entries invalidated by a write of another process must be removed."
+    with Session(engine) as db:
+        crud.update_city(db, 1, city_name="Foo")
+    assert poller.check() == "invalidated"
+    assert poller.response_cache.get("/cities/1") is None
+    assert poller.response_cache.get("/cities/2") is not None
+    assert poller.check() == "unchanged"
+
+
+def test_check_reads_rows_committed_out_of_order(engine, poller):
+    "A row with a lower id committed after one with a higher id must be read."
+    last_id = poller._last_id  # pylint: disable=W0212
+    with engine.begin() as conn:
+        conn.execute(
+            invalidation.TABLE.insert().values(
+                id=last_id + 2, tags='[["city", 1]]', created=time.time()
+            )
+        )
+    assert poller.check() == "invalidated"
+    assert poller.response_cache.get("/cities/2") is not None
+    with engine.begin() as conn:
+        conn.execute(
+            invalidation.TABLE.insert().values(
+                id=last_id + 1, tags='[["city", 2]]', created=time.time()
+            )
+        )
+    assert poller.check() == "invalidated"
+    assert poller.response_cache.get("/cities/2") is None
+
+
+def test_gaps_expire(poller):
+    "Ids which never appear (rolled back) must not be read forever."
+    # pylint: disable=W0212
+    poller._gaps = {poller._last_id - 1: time.monotonic() - invalidation.RETENTION}
+    poller._skip([], time.monotonic())
+    assert not poller._gaps
+
+
+def test_check_clears_on_direct_writes(engine, poller):
+    "Writes which are not made through the API must clear the cache."
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE cities SET name = 'Foo' WHERE id = 2"))
+    assert poller.check() == "cleared"
+    assert len(poller.response_cache) == 0
+
+
+def test_check_clears_after_missed_checks(poller):
+    "A process which did not check for long might have missed rows."
+    # pylint: disable=W0212
+    poller._last_check = time.monotonic() - invalidation.RETENTION
+    assert poller.check() == "cleared"
+
+
+def test_nothing_recorded_without_sync(engine, monkeypatch):
+    "A single process must not record its invalidations."
+    monkeypatch.setattr(settings, "cache_sync_interval", 0)
+    with Session(engine) as db:
+        count = db.scalar(select(func.count()).select_from(invalidation.TABLE))
+        crud.update_city(db, 1, city_name="Foo")
+        assert db.scalar(select(func.count()).select_from(invalidation.TABLE)) == count
+
+
+def test_expired_rows_are_deleted(engine, monkeypatch):
+    "Old rows must be deleted by the writers."
+    monkeypatch.setattr(invalidation, "PRUNE_EVERY", 1)
+    with engine.begin() as conn:
+        conn.execute(invalidation.TABLE.insert().values(tags="[]", created=0))
+    with Session(engine) as db:
+        crud.update_city(db, 1, city_name="Foo")
+        assert db.scalar(select(func.min(invalidation.TABLE.c.created))) > 0
+
+
+def test_serve(monkeypatch):
+    "The launcher must migrate once and configure several workers for each other."
+    calls = []
+    monkeypatch.setattr(serve.migrations, "migrate", calls.append)
+    monkeypatch.setattr(serve.uvicorn, "run", lambda app, **kwargs: calls.append(kwargs))
+    monkeypatch.setenv("CITIES_CACHE_SYNC_INTERVAL", "")
+    monkeypatch.setenv("CITIES_SQLITE_PROFILE", "")
+    monkeypatch.setenv("CITIES_MIGRATE_ON_STARTUP", "")
+    monkeypatch.setattr(settings, "migrate_on_startup", True)
+    serve.main(["--workers", "3", "--port", "8123"])
+    assert calls[1] == {"host": "127.0.0.1", "port": 8123, "workers": 3}
+    assert os.environ["CITIES_MIGRATE_ON_STARTUP"] == "false"
+    assert os.environ["CITIES_CACHE_SYNC_INTERVAL"] == str(serve.SYNC_INTERVAL)
+    assert os.environ["CITIES_SQLITE_PROFILE"] == "production"
+
+
+def test_serve_worker_per_core(monkeypatch):
+    "With --workers 0, the launcher must start and configure one worker per core."
+    calls = []
+    monkeypatch.setattr(serve.migrations, "migrate", calls.append)
+    monkeypatch.setattr(serve.uvicorn, "run", lambda app, **kwargs: calls.append(kwargs))
+    monkeypatch.setattr(serve.os, "cpu_count", lambda: 4)
+    monkeypatch.setenv("CITIES_CACHE_SYNC_INTERVAL", "")
+    monkeypatch.setenv("CITIES_SQLITE_PROFILE", "")
+    monkeypatch.setenv("CITIES_MIGRATE_ON_STARTUP", "")
+    monkeypatch.setattr(settings, "migrate_on_startup", True)
+    serve.main(["--workers", "0"])
+    assert calls[1]["workers"] == 4
+    assert os.environ["CITIES_CACHE_SYNC_INTERVAL"] == str(serve.SYNC_INTERVAL)
+    assert os.environ["CITIES_SQLITE_PROFILE"] == "production"
+
+
+def test_serve_single_worker(monkeypatch):
+    "By default, the launcher must start a single worker as configured before."
+    calls = []
+    monkeypatch.setattr(serve.migrations, "migrate", calls.append)
+    monkeypatch.setattr(serve.uvicorn, "run", lambda app, **kwargs: calls.append(kwargs))
+    monkeypatch.setenv("CITIES_SQLITE_PROFILE", "")
+    monkeypatch.setenv("CITIES_MIGRATE_ON_STARTUP", "")
+    monkeypatch.setattr(settings, "migrate_on_startup", True)
+    serve.main([])
+    assert calls[1]["workers"] == 1
+    assert not settings.migrate_on_startup
+    assert os.environ["CITIES_SQLITE_PROFILE"] == ""
@@ -0,0 +1,70 @@
+"""Test the link generation in cities.links.
+"""
+# pylint: disable=W0613
+import pytest
+from cities import links
+from cities.main import app
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+
+def _request(**scope) -> Request:
+    "Return a request for app with the given scope values."
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "scheme": "http",
+            "server": ("testserver", 80),
+            "path": "/",
+            "root_path": "",
+            "query_string": b"",
+            "headers": [],
+            "router": app.router,
+            **scope,
+        }
+    )
+
+
+@pytest.mark.parametrize(
+    "scope",
+    [
+        {},
+        {"root_path": "/api"},
+        {"scheme": "https", "headers": [(b"host", b"example.com")]},
+        {"server": ("localhost", 8000)},
+    ],
+)
+@pytest.mark.parametrize(
+    "name,params",
+    [
+        ("get_city_by_id", {"city_id": 1}),
+        ("get_county_by_id", {"county_id": 22}),
+        ("get_country_by_id", {"country_id": 333}),
+    ],
+)
+def test_same_as_url_for(scope, name, params):
+    "Links must be the same as those of request.url_for."
+    request = _request(**scope)
+    assert links.url_for(request, name, **params) == request.url_for(name, **params)
+
+
+def test_builder_per_request():
+    "The builder must be created once per request."
+    request = _request()
+    assert links.link_builder(request) is links.link_builder(request)
+    assert links.link_builder(_request()) is not links.link_builder(request)
+
+
+def test_root_path(client, cities):
+    "Links in responses must contain the root_path."
+    with TestClient(app, root_path="/api") as api_client:
+        city = api_client.get("/cities/1").json()
+    assert city["link"] == "http://testserver/api/cities/1"
+    assert city["county"]["link"] == "http://testserver/api/counties/1"
+
+
+def test_proxy_host(client, cities):
+    "Links must follow the Host header."
+    city = client.get("/cities/2", headers={"Host": "cities.example.com"}).json()
+    assert city["link"] == "http://cities.example.com/cities/2"
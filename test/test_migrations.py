@@ -0,0 +1,32 @@
+"""Test the schema migrations.
+"""
+from cities import migrations
+from sqlalchemy import create_engine, inspect, text
+
+
+def test_migrate_adds_indexes(tmp_path):
+    "Indexes missing in an existing database must be created."
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    migrations.migrate(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_cities_county_id_name"))
+    migrations.migrate(engine)
+    indexes = {index["name"] for index in inspect(engine).get_indexes("cities")}
+    assert {"ix_cities_county_id_name", "ix_cities_population_name"} <= indexes
+
+
+def test_migrate_fills_population_stats(tmp_path):
+    "A new summary table must be filled from the existing cities."
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    migrations.migrate(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE population_buckets"))
+        conn.execute(text("INSERT INTO countries (id, name) VALUES (1, 'A')"))
+        conn.execute(text("INSERT INTO counties (id, name, country_id) VALUES (1, 'B', 1)"))
+        conn.execute(
+            text("INSERT INTO cities (id, name, population, county_id) VALUES (1, 'C', 42, 1)")
+        )
+    migrations.migrate(engine)
+    with engine.begin() as conn:
+        rows = conn.execute(text("SELECT * FROM population_buckets")).all()
+    assert [tuple(row) for row in rows] == [(1, 1, 1, 42, 42, 42)]
@@ -0,0 +1,41 @@
+"""Test the content negotiation.
+"""
+import pytest
+from cities import negotiation
+from cities.negotiation import JSON
+
+IMAGES = ("image/svg+xml", "image/png")
+
+
+def test_parse_accept():
+    "Media ranges must be parsed with their q-values."
+    assert negotiation.parse_accept("text/html, image/*;q=0.5;level=1, *") == (
+        ("text", "html", 1.0),
+        ("image", "*", 0.5),
+        ("*", "*", 1.0),
+    )
+    assert negotiation.parse_accept("image/png;q=x, , foo, */png") == (
+        ("image", "png", 0.0),
+    )
+
+
+@pytest.mark.parametrize(
+    "accept,available,expected",
+    [
+        (None, (JSON,), JSON),
+        ("", (JSON,), JSON),
+        ("*/*", (JSON, *IMAGES), JSON),
+        ("application/json", (JSON,), JSON),
+        ("Application/JSON; charset=utf-8", (JSON,), JSON),
+        ("image/png,image/*;q=0.8", (JSON, *IMAGES), "image/png"),
+        ("image/*", (JSON, *IMAGES), "image/svg+xml"),
+        ("image/*;q=0.9, application/json;q=0.5", (JSON, *IMAGES), "image/svg+xml"),
+        ("image/*, image/svg+xml;q=0", IMAGES, "image/png"),
+        ("text/html,*/*;q=0.8", (JSON, *IMAGES), JSON),
+        ("text/html", (JSON,), None),
+        ("application/json;q=0", (JSON,), None),
+    ],
+)
+def test_negotiate(accept, available, expected):
+    "The most preferred available type must be chosen."
+    assert negotiation.negotiate(accept, available) == expected
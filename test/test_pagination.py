@@ -0,0 +1,17 @@
+"""Test the cursor functions in cities.pagination.
+"""
+import pytest
+from cities.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_roundtrip():
+    "A decoded cursor must return the encoded sort key."
+    assert decode_cursor(encode_cursor("Mödling", 42)) == ("Mödling", 42)
+    assert "=" not in encode_cursor("a", 1)
+
+
+@pytest.mark.parametrize("cursor", ["foo", "", "WzFd", encode_cursor("a", 1)[:-2]])
+def test_decode_invalid_cursor(cursor):
+    "Invalid cursors must raise a ValueError."
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
@@ -0,0 +1,65 @@
+"""Test the search index in cities.search.
+"""
+# pylint: disable=W0613
+import pytest
+from cities import crud, search
+from cities.models import City
+from cities.schemas import CityCreate
+
+
+@pytest.fixture(name="umlaut_cities")
+def fixture_umlaut_cities(db, counties):
+    "Add some cities with non ASCII names."
+    for i, name in enumerate(["Mödling", "Gföhl", "Übelbach", "Straß", "Wien"], 1):
+        crud.create_city(db, CityCreate(name=name, population=i, county_id=1))
+
+
+@pytest.mark.parametrize(
+    "q, expected",
+    [
+        ("möd", ["Mödling"]),
+        ("MÖD", ["Mödling"]),
+        ("mÖdLiNg", ["Mödling"]),
+        ("übel", ["Übelbach"]),
+        ("ÜBEL", ["Übelbach"]),
+        ("Ö", ["Gföhl", "Mödling"]),  # too short for the trigram index
+        ("ieN", ["Wien"]),
+        ("raß", ["Straß"]),
+        ("xyz", []),
+    ],
+)
+def test_search_case_insensitive(db, umlaut_cities, q, expected):
+    "Search must be case insensitive for non ASCII characters, too."
+    assert [city.name for city in crud.get_cities(db, q=q)] == expected
+
+
+def test_search_uses_index(db):
+    "Queries with at least 3 characters must use the trigram index."
+    condition = search.name_contains(db, City, "möd")
+    assert "cities_fts MATCH" in str(condition.compile(db.get_bind()))
+
+
+@pytest.mark.parametrize("q", ["ty 1", "ity", "y 10", "City 1", "1", "%", "y_1", '"'])
+def test_search_like_semantics(db, cities, q):
+    "Results must be the same as with LIKE '%q%', including its wildcards."
+    expected = [
+        city.id
+        for city in db.query(City)
+        .filter(City.name.like(f"%{q}%"))
+        .order_by(City.name, City.id)
+        .limit(100)
+    ]
+    assert [city.id for city in crud.get_cities(db, q=q)] == expected
+
+
+def test_search_index_follows_changes(db, cities):
+    "The index must be updated on insert, update and delete."
+    crud.create_city(db, CityCreate(name="Neustadt", population=1, county_id=1))
+    assert [city.name for city in crud.get_cities(db, q="neust")] == ["Neustadt"]
+
+    crud.update_city(db, crud.get_cities(db, q="neust")[0].id, city_name="Altstadt")
+    assert not crud.get_cities(db, q="neust")
+    assert [city.name for city in crud.get_cities(db, q="altst")] == ["Altstadt"]
+
+    crud.delete_city(db, crud.get_cities(db, q="altst")[0].id)
+    assert not crud.get_cities(db, q="altst")
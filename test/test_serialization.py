@@ -0,0 +1,68 @@
+"""Test the fast serializer of the list endpoints.
+"""
+# pylint: disable=W0613
+import json
+
+import pytest
+from cities import serialization
+from cities.config import settings
+from cities.main import app
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/countries/?size=15",
+        "/countries/?q=country 1",
+        "/counties/?size=50&country=Country 2",
+        "/cities/?size=100",
+        "/cities/?minpop=500&maxpop=700&county=County 6",
+        "/cities/?q=City 1&start=3",
+    ],
+)
+def test_same_response(client, cities, monkeypatch, url):
+    "The fast serializer must return the same body and Link header."
+    expected = client.get(url)
+    monkeypatch.setattr(settings, "fast_serializer", True)
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == expected.json()
+    assert response.headers.get("Link") == expected.headers.get("Link")
+
+
+def test_same_openapi(monkeypatch):
+    "The OpenAPI schema must not depend on the serializer."
+    expected = app.openapi()
+    monkeypatch.setattr(settings, "fast_serializer", True)
+    app.openapi_schema = None
+    try:
+        assert app.openapi() == expected
+    finally:
+        app.openapi_schema = None
+
+
+def test_dumps_without_orjson(monkeypatch):
+    "The json module must be used if orjson is not installed."
+    data = [{"name": "Mödling", "id": 1, "link": None}]
+    expected = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert serialization.dumps(data) == expected.encode("utf-8")
+
+
+def test_parse_fields():
+    "Fields must be returned in the order of the schema."
+    assert serialization.parse_fields(None) is None
+    assert serialization.parse_fields("") is None
+    assert serialization.parse_fields("link, id") == ("id", "link")
+    with pytest.raises(ValueError):
+        serialization.parse_fields("id,county")
+
+
+def test_parse_embed():
+    "Without embed, all collections are embedded, with an empty one none."
+    assert serialization.parse_embed(None, ("cities",)) == ("cities",)
+    assert serialization.parse_embed("", ("cities",)) == ()
+    assert serialization.parse_embed(" cities ", ("cities",)) == ("cities",)
+    with pytest.raises(ValueError):
+        serialization.parse_embed("counties", ("cities",))
@@ -0,0 +1,154 @@
+"""Test the population statistics.
+"""
+import statistics
+
+import pytest
+import sqlalchemy.exc
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from cities import crud, migrations, schemas, stats
+from cities.models import City, PopulationBucket
+
+
+def expected_stats(db, county_id=None):
+    "Compute the statistics from the cities themselves."
+    query = db.query(City.population)
+    if county_id is not None:
+        query = query.filter(City.county_id == county_id)
+    populations = [population for population, in query]
+    return {
+        "count": len(populations),
+        "sum": sum(populations),
+        "min": min(populations, default=None),
+        "max": max(populations, default=None),
+        "median": statistics.median(populations) if populations else None,
+    }
+
+
+def summary(db):
+    "Return the rows of the summary table."
+    return sorted(
+        (row.county_id, row.bucket, row.count, row.total, row.minimum, row.maximum)
+        for row in db.query(PopulationBucket)
+    )
+
+
+def test_bucket_of():
+    "Buckets are powers of ten."
+    assert [stats.bucket_of(value) for value in (0, 1, 9, 10, 99, 100, 12345)] == [
+        0, 0, 0, 1, 1, 2, 4
+    ]
+    assert stats.bucket_bounds(0) == (None, 10)
+    assert stats.bucket_bounds(3) == (1000, 10000)
+
+
+def test_population_stats(db, cities):
+    "The statistics must match the cities."
+    result = crud.get_population_stats(db)
+    assert {key: result[key] for key in expected_stats(db)} == expected_stats(db)
+    assert result["buckets"] == [
+        {"lower": 10, "upper": 100, "count": 9},
+        {"lower": 100, "upper": 1000, "count": 90},
+        {"lower": 1000, "upper": 10000, "count": 11},
+    ]
+
+
+def test_population_stats_of_county(db, cities):
+    "The statistics of a county contain only its cities."
+    result = crud.get_population_stats(db, county_id=2)
+    assert {key: result[key] for key in expected_stats(db, 2)} == expected_stats(db, 2)
+    assert result["count"] == 10
+
+
+def test_population_stats_of_country(db, cities):
+    "The statistics of a country contain the cities of all its counties."
+    result = crud.get_population_stats(db, country_id=1)
+    # counties 1 to 9 with cities 1 to 89
+    assert result["count"] == 89
+    assert result["median"] == 450
+
+
+def test_population_stats_without_county(db, cities):
+    "Cities without a county are neither counted nor taken as median."
+    db.add_all(City(name=f"Nowhere {i}", population=100) for i in range(20))
+    db.flush()
+    result = crud.get_population_stats(db)
+    assert result["count"] == 110
+    assert result["median"] == statistics.median(
+        population
+        for population, in db.query(City.population).filter(
+            City.county_id.is_not(None)
+        )
+    )
+
+
+def test_locate():
+    "The bucket and offset of a position must be found, or a ValueError raised."
+    counts = {1: 9, 2: 90}
+    assert stats._locate(counts, 0) == (1, 0)  # pylint: disable=W0212
+    assert stats._locate(counts, 9) == (2, 0)  # pylint: disable=W0212
+    with pytest.raises(ValueError):
+        stats._locate(counts, 99)  # pylint: disable=W0212
+
+
+def test_population_stats_empty(db, counties):
+    "Without cities, there is nothing to aggregate."
+    result = crud.get_population_stats(db, county_id=1)
+    assert result == {
+        "count": 0, "sum": 0, "min": None, "max": None, "median": None, "buckets": []
+    }
+
+
+def test_writes_keep_summary_up_to_date(db, cities):
+    "Creating, updating and deleting cities must update the summary table."
+    crud.create_city(
+        db, schemas.CityCreate(name="New", population=5, county_id=3), city_id=500
+    )
+    # move the largest city of a bucket to another county and bucket
+    crud.update_city(db, 29, population=12, county_id=4)
+    # delete the smallest city of a bucket
+    crud.delete_city(db, 10)
+    crud.delete_city(db, 1)
+    incremental = summary(db)
+    stats.rebuild(db)
+    assert incremental == summary(db)
+    result = crud.get_population_stats(db, county_id=3)
+    assert {key: result[key] for key in expected_stats(db, 3)} == expected_stats(db, 3)
+
+
+def test_bulk_import_rebuilds_summary(db, counties):
+    "A bulk import must recompute the summary table when it commits."
+    crud.upsert_cities(
+        db,
+        [
+            schemas.CityCreate(id=i, name=f"City {i}", population=i, county_id=1)
+            for i in range(1, 21)
+        ],
+    )
+    db.commit()
+    assert summary(db) == [(1, 0, 9, 45, 1, 9), (1, 1, 11, 165, 10, 20)]
+
+
+def test_old_values_are_locked(tmp_path):
+    "Another connection must not change a city while its old values are in use."
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'cities.db'}", connect_args={"timeout": 0.1}
+    )
+    migrations.migrate(engine)
+    with Session(engine) as db:
+        crud.create_country(db, schemas.CountryCreate(name="Country 1"))
+        crud.create_county(db, schemas.CountyCreate(name="County 1", country_id=1))
+        crud.create_city(
+            db, schemas.CityCreate(name="City 1", population=100, county_id=1)
+        )
+    with Session(engine) as db, Session(engine) as other:
+        # pylint: disable=W0212
+        assert crud._get_for_update(db, City, 1).population == 100
+        with pytest.raises(sqlalchemy.exc.OperationalError):
+            crud.update_city(other, 1, population=200)
+        other.rollback()
+        crud.update_city(db, 1, population=300)
+        crud.update_city(other, 1, population=400)
+        assert summary(other) == [(1, 2, 1, 400, 400, 400)]
+    engine.dispose()
@@ -0,0 +1,173 @@
+"""Test the group commit writer in cities.writer.
+"""
+# pylint: disable=W0613
+import asyncio
+import functools
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from cities import crud, migrations, writer
+from cities.config import settings
+from cities.schemas import CityCreate, CountryCreate, CountyCreate
+
+
+def _rename(city_id, name, db, commit=True):
+    "Rename city city_id and return its name and population."
+    db_city = crud.update_city(db, city_id, city_name=name, commit=commit)
+    return db_city.name, db_city.population
+
+
+def _move(city_id, county_id, db, commit=True):
+    "Move city city_id to county_id."
+    return crud.update_city(db, city_id, county_id=county_id, commit=commit).county_id
+
+
+@pytest.fixture(name="own_db")
+def fixture_own_db():
+    """Yield a session of a new database with 2 counties and 5 cities.
+
+    The `db` fixture of conftest cannot be used, as it rolls back the whole
+    test when the writer rolls back a batch.
+    """
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    migrations.migrate(engine)
+    db = Session(bind=engine)
+    crud.create_country(db, CountryCreate(name="Country 1"))
+    for i in (1, 2):
+        crud.create_county(db, CountyCreate(name=f"County {i}", country_id=1))
+    for i in range(1, 6):
+        crud.create_city(
+            db, CityCreate(name=f"City {i}", population=i * 10, county_id=1)
+        )
+    yield db
+    db.close()
+    engine.dispose()
+
+
+@pytest.fixture(name="commits")
+def fixture_commits(own_db):
+    "Count the commits to the database of db."
+    commits = []
+
+    def _record(connection):
+        commits.append(connection)
+
+    engine = own_db.get_bind()
+    event.listen(engine, "commit", _record)
+    yield commits
+    event.remove(engine, "commit", _record)
+
+
+def test_apply_batch(own_db):
+    "Failing updates must not keep the others from being committed."
+    jobs = [
+        writer.Job(functools.partial(_rename, 1, "Foo"), None),
+        writer.Job(functools.partial(_move, 2, 9999), None),
+        writer.Job(functools.partial(_rename, 98765, "Bar"), None),
+        writer.Job(functools.partial(_move, 3, 2), None),
+    ]
+    writer.apply_batch(own_db, jobs)
+    assert jobs[0].result == ("Foo", 10) and jobs[0].error is None
+    assert isinstance(jobs[1].error, crud.UpdateException)
+    assert isinstance(jobs[2].error, crud.ItemNotFoundException)
+    assert jobs[3].result == 2 and jobs[3].error is None
+    assert crud.get_city(own_db, 1).name == "Foo"
+    assert crud.get_city(own_db, 2).county_id == 1
+    assert crud.get_city(own_db, 3).county_id == 2
+
+
+def test_writer_commits_once(own_db, commits):
+    "Updates submitted together must be committed in a single transaction."
+    group_writer = writer.GroupCommitWriter(delay=0.05, max_size=100)
+
+    async def _submit_all():
+        return await asyncio.gather(
+            *(
+                group_writer.submit(own_db, functools.partial(_rename, i, f"Foo {i}"))
+                for i in range(1, 6)
+            ),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(_submit_all())
+    assert results == [(f"Foo {i}", i * 10) for i in range(1, 6)]
+    assert len(commits) == 1
+
+
+def test_writer_reports_errors(own_db, commits):
+    "Each request must get the outcome of its own update."
+    group_writer = writer.GroupCommitWriter(delay=0.05, max_size=100)
+
+    async def _submit_all():
+        return await asyncio.gather(
+            group_writer.submit(own_db, functools.partial(_rename, 1, "Foo")),
+            group_writer.submit(own_db, functools.partial(_move, 2, 9999)),
+            return_exceptions=True,
+        )
+
+    renamed, moved = asyncio.run(_submit_all())
+    assert renamed == ("Foo", 10)
+    assert isinstance(moved, crud.UpdateException)
+    assert len(commits) == 1
+
+
+def test_writer_max_size(own_db, commits):
+    "A batch must not hold more than max_size updates."
+    group_writer = writer.GroupCommitWriter(delay=0.05, max_size=2)
+
+    async def _submit_all():
+        return await asyncio.gather(
+            *(
+                group_writer.submit(own_db, functools.partial(_rename, i, f"Foo {i}"))
+                for i in range(1, 6)
+            )
+        )
+
+    asyncio.run(_submit_all())
+    assert len(commits) == 3
+
+
+def test_writer_survives_cancelled_requests(own_db, commits):
+    "Cancelling the request which opened a batch must not affect the others."
+    group_writer = writer.GroupCommitWriter(delay=0.05, max_size=100)
+
+    async def _submit_all():
+        first = asyncio.ensure_future(
+            group_writer.submit(own_db, functools.partial(_rename, 1, "Foo"))
+        )
+        second = asyncio.ensure_future(
+            group_writer.submit(own_db, functools.partial(_rename, 2, "Bar"))
+        )
+        await asyncio.sleep(0)
+        first.cancel()
+        return await asyncio.wait_for(second, 5)
+
+    assert asyncio.run(_submit_all()) == ("Bar", 20)
+    assert len(commits) == 1
+
+
+def test_patch_with_group_commit(client, cities, monkeypatch):
+    "The PATCH endpoints must work the same with group commit."
+    monkeypatch.setattr(settings, "group_commit", True)
+    response = client.patch("/cities/1", json={"name": "Foo", "county_id": 2})
+    assert response.status_code == 200
+    assert response.json()["name"] == "Foo"
+    assert response.json()["county"]["id"] == 2
+    assert client.get("/cities/1").json()["name"] == "Foo"
+    response = client.patch("/counties/1", json={"name": "Bar"})
+    assert response.json()["name"] == "Bar"
+    response = client.patch("/countries/1", json={"name": "Baz"})
+    assert response.json()["name"] == "Baz"
+
+
+# the batch session rolls back the transaction of the test, which db then warns of
+@pytest.mark.filterwarnings("ignore:transaction already deassociated")
+def test_patch_missing_with_group_commit(client, cities, monkeypatch):
+    "Failed updates must be reported as with a commit per request."
+    monkeypatch.setattr(settings, "group_commit", True)
+    assert client.patch("/cities/98765", json={"name": "Foo"}).status_code == 404